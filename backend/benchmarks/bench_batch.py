@@ -0,0 +1,87 @@
+"""Per-task requests versus the batch endpoint for creating, completing and
+deleting N tasks.
+
+    python -m backend.benchmarks.bench_batch --tasks 1000
+"""
+import argparse
+import datetime
+import os
+import tempfile
+import time
+import uuid
+
+
+def timed(label: str, n: int, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<22} {elapsed * 1000:9.1f} ms total  {elapsed / n * 1e6:8.1f} us/task")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=1000)
+    args = parser.parse_args()
+    n = args.tasks
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp.name, 'bench.db')}"
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    os.environ["SCHEMA_ON_STARTUP"] = "migrate"
+    # All the load comes from one address, which the rate limiter would throttle
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+    from fastapi.testclient import TestClient
+    from sqlmodel import Session
+    from ..database import get_engine
+    from ..main import app
+    from ..models.user import User
+    from ..utils.token import generate_jwt_token
+
+    with TestClient(app) as client:
+        with Session(get_engine()) as session:
+            user = User(uuid=uuid.uuid4(), email="bench@example.com", password="x", first_name="Bench",
+                        last_name="User", created_at=datetime.datetime.now())
+            session.add(user)
+            session.commit()
+            session.refresh(user)
+        headers = {"Authorization": f"Bearer {generate_jwt_token(user, datetime.timedelta(hours=1), 'access')}"}
+        due = datetime.datetime(2025, 1, 1).isoformat()
+
+        def new_list():
+            return client.post("/api/list/create", json={"title": "Bench", "description": ""}, headers=headers).json()["uuid"]
+
+        # Per-task loop, as the frontend does today
+        loop_list = new_list()
+        created = []
+        loop = {}
+        loop["create"] = timed("loop create", n, lambda: created.extend(
+            client.post(f"/api/list/{loop_list}/task/", json={"title": f"T{i}", "description": "", "due_date": due},
+                        headers=headers).json()["uuid"] for i in range(n)))
+        loop["update"] = timed("loop mark done", n, lambda: [
+            client.put(f"/api/list/{loop_list}/task/{t}", json={"done": True}, headers=headers) for t in created])
+        loop["delete"] = timed("loop delete", n, lambda: [
+            client.delete(f"/api/list/{loop_list}/task/{t}", headers=headers) for t in created])
+
+        # One batch request per action
+        batch_list = new_list()
+        url = f"/api/list/{batch_list}/task/batch"
+        created = []
+        batch = {}
+        batch["create"] = timed("batch create", n, lambda: created.extend(
+            r["task"]["uuid"] for r in client.post(url, json={"operations": [
+                {"op": "create", "title": f"T{i}", "description": "", "due_date": due} for i in range(n)]},
+                headers=headers).json()["results"]))
+        batch["update"] = timed("batch mark done", n, lambda: client.post(url, json={"operations": [
+            {"op": "update", "uuid": t, "done": True} for t in created]}, headers=headers))
+        batch["delete"] = timed("batch delete", n, lambda: client.post(url, json={"operations": [
+            {"op": "delete", "uuid": t} for t in created]}, headers=headers))
+
+        for action in ("create", "update", "delete"):
+            print(f"{action:<8} speedup {loop[action] / batch[action]:6.1f}x")
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
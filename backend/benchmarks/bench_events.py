@@ -0,0 +1,118 @@
+"""Soak test for the list change feed: memory per idle subscriber and fan-out time.
+
+Starts the app under uvicorn, opens N idle SSE connections to one list's event
+stream, and reads the server's RSS before and after. Then creates a task and
+times how long it takes for the event to reach every subscriber.
+
+    python -m backend.benchmarks.bench_events --subscribers 5000
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from .bench_async import SECRET_KEY, free_port, seed, wait_for_port
+
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError("VmRSS not found")
+
+
+async def subscribe(port: int, path: str, received: list, ready: list):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\nAccept: text/event-stream\r\n\r\n".encode())
+    await writer.drain()
+    await reader.readuntil(b"retry: 3000")
+    ready.append(1)
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        if line.startswith(b"data:") and b"task.created" in line:
+            received.append(time.perf_counter())
+    writer.close()
+
+
+async def soak(port: int, pid: int, token: str, list_uuid: str, n: int, hold: float):
+    import httpx
+
+    path = f"/api/list/{list_uuid}/events/?access_token={token}"
+    base_rss = rss_mb(pid)
+    received, ready = [], []
+    clients = []
+    start = time.perf_counter()
+    # Connect in waves so the listen backlog does not overflow
+    for i in range(0, n, 200):
+        clients += [asyncio.create_task(subscribe(port, path, received, ready)) for _ in range(min(200, n - i))]
+        while len(ready) < len(clients):
+            await asyncio.sleep(0.01)
+    connect_seconds = time.perf_counter() - start
+
+    # Let the server settle with every stream idle
+    await asyncio.sleep(hold)
+    idle_rss = rss_mb(pid)
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as client:
+        metrics = (await client.get("/metrics/events")).json()
+        published = time.perf_counter()
+        response = await client.post(f"/api/list/{list_uuid}/task/", headers={"Authorization": f"Bearer {token}"},
+                                     json={"title": "ping", "description": "", "due_date": datetime.datetime.now().isoformat()})
+        response.raise_for_status()
+    deadline = time.time() + 60
+    while len(received) < n and time.time() < deadline:
+        await asyncio.sleep(0.01)
+    fanout = max(received) - published if received else float("nan")
+
+    for client in clients:
+        client.cancel()
+    await asyncio.gather(*clients, return_exceptions=True)
+
+    print(f"subscribers {metrics['subscribers']} (connected in {connect_seconds:.1f}s)")
+    print(f"server RSS: {base_rss:.1f} MB -> {idle_rss:.1f} MB  "
+          f"({(idle_rss - base_rss) * 1024 / n:.1f} KB per idle connection)")
+    print(f"fan-out: {len(received)}/{n} received the event, last after {fanout * 1000:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=5000)
+    parser.add_argument("--hold", type=float, default=5, help="seconds to hold the idle connections before measuring")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    database_url = f"sqlite:///{os.path.join(tmp.name, 'bench.db')}"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["SECRET_KEY"] = SECRET_KEY
+    # All the load comes from one address, which the rate limiter would throttle
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+    from ..models.user import User
+    from ..utils.token import generate_jwt_token
+
+    user, list_uuids = seed(database_url, 1, 1)
+    token = generate_jwt_token(User(**user), datetime.timedelta(hours=1), "access")
+
+    port = free_port()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port),
+                               "--log-level", "warning", "--backlog", "4096"], env=dict(os.environ))
+    try:
+        wait_for_port(port)
+        # Warm up so imports and the first request's allocations are in the baseline
+        subprocess.run([sys.executable, "-c", f"import httpx; httpx.get('http://127.0.0.1:{port}/')"], check=True)
+        asyncio.run(soak(port, server.pid, token, str(list_uuids[0]), args.subscribers, args.hold))
+    finally:
+        server.terminate()
+        server.wait()
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Peak RSS of exporting an account with many tasks.
+
+Compares the streaming export endpoint with what a client has to do without
+it: GET /api/list/ followed by GET /api/list/{uuid}/task for every list. Each
+mode runs in a fresh interpreter so ru_maxrss reflects only that mode.
+
+    python -m backend.benchmarks.bench_export --tasks 100000
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+SECRET_KEY = "benchmark-secret"
+
+
+def seed(database_url: str, n_lists: int, n_tasks: int) -> uuid.UUID:
+    from sqlmodel import SQLModel, create_engine
+    from ..models.user import User
+    from ..models.list import List
+    from ..models.list_access import ListAccess
+    from ..models.task import Task
+
+    engine = create_engine(database_url)
+    SQLModel.metadata.create_all(engine)
+    now = datetime.datetime.now()
+    user_uuid = uuid.uuid4()
+    list_uuids = [uuid.uuid4() for _ in range(n_lists)]
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [{
+            "uuid": user_uuid, "email": "bench@example.com", "password": "x",
+            "first_name": "Bench", "last_name": "User", "created_at": now,
+        }])
+        conn.execute(List.__table__.insert(), [{
+            "uuid": l, "created_at": now, "title": f"List {i}", "description": "",
+        } for i, l in enumerate(list_uuids)])
+        conn.execute(ListAccess.__table__.insert(), [{
+            "uuid": uuid.uuid4(), "list_uuid": l, "owner_uuid": user_uuid,
+        } for l in list_uuids])
+        batch = []
+        for i in range(n_tasks):
+            batch.append({
+                "uuid": uuid.uuid4(), "list_uuid": list_uuids[i % n_lists], "created_at": now,
+                "title": f"Task {i}", "description": "Something that needs doing " * 3,
+                "due_date": now + datetime.timedelta(minutes=i), "done": i % 3 == 0,
+            })
+            if len(batch) == 10_000:
+                conn.execute(Task.__table__.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(Task.__table__.insert(), batch)
+    engine.dispose()
+    return user_uuid
+
+
+async def drain(app, path: str, token: str) -> tuple[int, bytes]:
+    """Run one GET through the ASGI app, discarding streamed chunks as they arrive."""
+    received = 0
+    body = bytearray()
+    keep_body = not path.startswith("/api/export")
+
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # The client never disconnects; StreamingResponse waits on this in the background
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal received
+        if message["type"] == "http.response.body":
+            chunk = message.get("body", b"")
+            received += len(chunk)
+            if keep_body:
+                body.extend(chunk)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": b"", "server": ("bench", 80), "client": ("bench", 1),
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+    }
+    await app(scope, receive, send)
+    return received, bytes(body)
+
+
+def run_mode(mode: str, user_uuid: str):
+    import json
+    from ..main import app
+    from ..models.user import User
+    from ..utils.token import generate_jwt_token
+
+    user = User(uuid=uuid.UUID(user_uuid), email="bench@example.com", first_name="Bench", last_name="User")
+    token = generate_jwt_token(user, datetime.timedelta(hours=1), "access")
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    async def main():
+        if mode == "stream":
+            return (await drain(app, "/api/export/", token))[0]
+        total, body = await drain(app, "/api/list/", token)
+        lists = json.loads(body)
+        tasks = []
+        for l in lists:
+            size, body = await drain(app, f"/api/list/{l['uuid']}/task/", token)
+            total += size
+            tasks.append(json.loads(body))
+        return total
+
+    start = time.perf_counter()
+    total = asyncio.run(main())
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{mode:>8}: {total / 1e6:8.1f} MB sent in {elapsed:6.2f}s, "
+          f"peak RSS {peak_kb / 1024:7.1f} MB (+{(peak_kb - baseline_kb) / 1024:.1f} MB after import)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lists", type=int, default=50)
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--mode", choices=["stream", "per-list"], help=argparse.SUPPRESS)
+    parser.add_argument("--user", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.user)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ["DATABASE_URL"] = database_url
+        os.environ["SECRET_KEY"] = SECRET_KEY
+        user_uuid = seed(database_url, args.lists, args.tasks)
+        print(f"seeded {args.lists} lists / {args.tasks} tasks")
+        for mode in ("stream", "per-list"):
+            subprocess.run(
+                [sys.executable, "-m", "backend.benchmarks.bench_export", "--mode", mode, "--user", str(user_uuid)],
+                check=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
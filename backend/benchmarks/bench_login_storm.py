@@ -0,0 +1,111 @@
+"""List/task read latency while the server is flooded with logins.
+
+Starts the app under uvicorn, measures GET /api/list/ and GET /api/list/{uuid}/task/
+latency on its own, then again while a pool of clients hammers POST /api/user/login
+with a valid password. Logins beyond the password pool's queue get 429s, which
+are counted separately.
+
+    python -m backend.benchmarks.bench_login_storm --readers 20 --logins 100 --duration 15
+"""
+import argparse
+import asyncio
+import datetime
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import bcrypt
+
+from .bench_async import SECRET_KEY, drive, free_port, seed, wait_for_port
+
+PASSWORD = "correct horse battery staple"
+
+
+async def storm(base_url: str, email: str, concurrency: int, duration: float):
+    import httpx
+
+    counts = {}
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def worker():
+            while time.perf_counter() < deadline:
+                try:
+                    response = await client.post("/api/user/login", json={"email": email, "password": PASSWORD})
+                    status = response.status_code
+                except httpx.HTTPError:
+                    status = "error"
+                counts[status] = counts.get(status, 0) + 1
+                if status == 429:
+                    await asyncio.sleep(float(response.headers.get("Retry-After", 1)))
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return counts
+
+
+def run_storm(base_url: str, email: str, concurrency: int, duration: float, results):
+    # Separate process, so the storm's client-side work does not delay the readers' event loop
+    results.update(asyncio.run(storm(base_url, email, concurrency, duration)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    parser.add_argument("--readers", type=int, default=20)
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    database_url = args.database_url or f"sqlite:///{os.path.join(tmp.name, 'bench.db')}"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["SECRET_KEY"] = SECRET_KEY
+    # All the load comes from one address, which the rate limiter would throttle
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+    from sqlmodel import create_engine
+    from ..models.user import User
+    from ..utils.token import generate_jwt_token
+
+    user, list_uuids = seed(database_url, 20, 50)
+    engine = create_engine(database_url)
+    with engine.begin() as conn:
+        hashed = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(args.bcrypt_rounds)).decode()
+        conn.execute(User.__table__.update().where(User.__table__.c.uuid == user["uuid"]).values(password=hashed))
+    engine.dispose()
+    token = generate_jwt_token(User(**user), datetime.timedelta(hours=1), "access")
+    list_uuids = [str(l) for l in list_uuids]
+
+    port = free_port()
+    env = dict(os.environ, BCRYPT_ROUNDS=str(args.bcrypt_rounds))
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port),
+                               "--log-level", "warning"], env=env)
+    try:
+        wait_for_port(port)
+        base_url = f"http://127.0.0.1:{port}"
+        for label, with_storm in (("quiet", False), ("storm", True)):
+            logins = multiprocessing.Manager().dict()
+            stormer = multiprocessing.Process(target=run_storm, args=(base_url, user["email"], args.logins,
+                                                                     args.duration, logins))
+            if with_storm:
+                stormer.start()
+            rps, latencies, errors = asyncio.run(drive(base_url, token, list_uuids, args.readers, args.duration))
+            if with_storm:
+                stormer.join()
+            q = statistics.quantiles(latencies, n=100)
+            print(f"{label}: reads {rps:7.1f} req/s  p50 {q[49] * 1000:7.1f} ms  p99 {q[98] * 1000:7.1f} ms  "
+                  f"errors {errors}  logins {dict(sorted(logins.items(), key=str))}")
+    finally:
+        server.terminate()
+        server.wait()
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
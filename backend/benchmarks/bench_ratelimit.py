@@ -0,0 +1,91 @@
+"""Time the rate limiter adds to each request, per decision.
+
+Runs RateLimitMiddleware in front of an ASGI app that answers at once, and
+compares it with the bare app: for an anonymous request (keyed by address),
+one with a bearer token already in token_cache (keyed by user), and one
+turned away with a 429. Then the same decision against the database store on
+a SQLite file, the shared store for several workers.
+
+    python -m backend.benchmarks.bench_ratelimit --iterations 50000
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import tempfile
+import time
+import uuid
+
+SECRET_KEY = "benchmark-secret"
+
+
+async def bare_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+def scope_for(path: str, token: str | None = None, address: str = "10.0.0.1") -> dict:
+    headers = [(b"host", b"todo.example.com"), (b"accept", b"application/json"), (b"user-agent", b"bench")]
+    if token:
+        headers.append((b"authorization", f"Bearer {token}".encode()))
+    return {"type": "http", "method": "GET", "path": path, "headers": headers, "client": (address, 5000)}
+
+
+async def per_call(app, scope: dict, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await app(scope, receive, send)
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50_000)
+    parser.add_argument("--database-iterations", type=int, default=2_000)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp.name, 'bench.db')}"
+    os.environ["SECRET_KEY"] = SECRET_KEY
+
+    from ..database import dispose_engines, get_engine
+    from ..migrations import migrate
+    from ..models.user import User
+    from ..utils.ratelimit import Budget, DatabaseRateLimitStore, MemoryRateLimitStore, RateLimiter, RateLimitMiddleware, Rule
+    from ..utils.token import generate_jwt_token
+
+    user = User(uuid=uuid.uuid4(), email="bench@example.com", first_name="Bench", last_name="User")
+    token = generate_jwt_token(user, datetime.timedelta(hours=1), "access")
+    # Budgets too large to run out, plus one that is always empty
+    rules = [Rule(None, "/api/denied", Budget(1, 1e9)), Rule(None, "/api/", Budget(10**12, 1))]
+
+    async def run():
+        bare = await per_call(bare_app, scope_for("/api/list/"), args.iterations)
+        print(f"{'bare app':>22}: {bare * 1e6:6.2f} us/request")
+        limited = RateLimitMiddleware(bare_app, RateLimiter(rules, MemoryRateLimitStore()))
+        for label, scope in (("anonymous", scope_for("/api/list/")),
+                             ("bearer token", scope_for("/api/list/", token)),
+                             ("429", scope_for("/api/denied"))):
+            seconds = await per_call(limited, scope, args.iterations)
+            print(f"{'memory, ' + label:>22}: {(seconds - bare) * 1e6:6.2f} us/decision")
+
+        migrate(get_engine(), log=None)
+        limited = RateLimitMiddleware(bare_app, RateLimiter(rules, DatabaseRateLimitStore()))
+        seconds = await per_call(limited, scope_for("/api/list/", token), args.database_iterations)
+        print(f"{'database, bearer token':>22}: {(seconds - bare) * 1e6:6.2f} us/decision")
+        await dispose_engines()
+
+    asyncio.run(run())
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Serialization cost of a get_tasks response: hand-built dicts vs response models.
+
+"before" is the old path: a dict per task with str()/isoformat() per field,
+then FastAPI's jsonable_encoder and the stdlib json JSONResponse. "after" is
+the current one: the ORM rows validated and serialized by the list[TaskOut]
+response field in pydantic-core, rendered by ORJSONResponse. Reports time and
+peak traced allocations per response.
+
+    python -m backend.benchmarks.bench_serialize --tasks 10000
+"""
+import argparse
+import datetime
+import os
+import statistics
+import time
+import tracemalloc
+import uuid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse, ORJSONResponse
+    from pydantic import TypeAdapter
+    from ..models.task import Task
+    from ..routes.schemas import TaskOut
+
+    now = datetime.datetime.now()
+    list_uuid = uuid.uuid4()
+    tasks = [Task(uuid=uuid.uuid4(), list_uuid=list_uuid, created_at=now, title=f"Task {i}", description="Something to do",
+                  due_date=now + datetime.timedelta(hours=i), done=i % 2 == 0, revision=i) for i in range(args.tasks)]
+
+    def before():
+        content = [{
+            "uuid": str(t.uuid),
+            "list_uuid": str(t.list_uuid),
+            "created_at": t.created_at.isoformat(),
+            "title": t.title,
+            "description": t.description,
+            "due_date": t.due_date.isoformat(),
+            "done": t.done
+        } for t in tasks]
+        return JSONResponse(jsonable_encoder(content)).body
+
+    # What FastAPI does with response_model=list[TaskOut]: validate, then serialize in json mode
+    adapter = TypeAdapter(list[TaskOut])
+
+    def after():
+        return ORJSONResponse(adapter.dump_python(adapter.validate_python(tasks), mode="json")).body
+
+    import json
+    assert json.loads(before()) == json.loads(after())
+
+    for label, fn in (("before", before), ("after", after)):
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            body = fn()
+            timings.append(time.perf_counter() - start)
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{label:>6}: median {statistics.median(timings) * 1000:7.1f} ms  "
+              f"peak alloc {peak / 1024 / 1024:6.1f} MB  body {len(body) / 1024:.0f} KB  ({args.tasks} tasks)")
+
+
+if __name__ == "__main__":
+    main()
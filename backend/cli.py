@@ -0,0 +1,86 @@
+"""Maintenance commands, run from the repository root:
+
+    python -m backend.cli rebuild-summaries
+    python -m backend.cli prune-tombstones --days 30
+    python -m backend.cli purge-orphans
+    python -m backend.cli migrate
+
+Schema changes and the backfills that go with them, such as lowercasing
+emails or filling the search index, are migrations: `migrate` applies them.
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from sqlmodel import Session
+
+from .database import get_engine
+from .migrations import MigrationError, current_version, latest_version, migrate as apply_migrations
+from .utils.purge import LIST_ROWS, delete_chunk, orphaned_list_uuids
+from .utils.revision import prune_tombstones as prune_tombstones_before
+from .utils.summary import rebuild_list_summaries
+
+
+def rebuild_summaries(args):
+    with Session(get_engine()) as session:
+        count = rebuild_list_summaries(session)
+        session.commit()
+    print(f"Rebuilt task summaries for {count} lists")
+
+
+def prune_tombstones(args):
+    with Session(get_engine()) as session:
+        count = prune_tombstones_before(session, datetime.now() - timedelta(days=args.days))
+        session.commit()
+    print(f"Pruned {count} tombstones older than {args.days} days")
+
+
+def purge_orphans(args):
+    # Lists deleted before deletes were soft left their tasks, other members'
+    # access rows and sometimes their summary behind. Find those lists once,
+    # then delete their rows by list through the list_uuid indexes, one short
+    # transaction per chunk, so this can run next to live traffic.
+    with Session(get_engine()) as session:
+        orphaned = set()
+        for model, _ in LIST_ROWS:
+            orphaned.update(session.exec(orphaned_list_uuids(model)).all())
+        count = 0
+        for list_uuid in orphaned:
+            for model, key in LIST_ROWS:
+                while deleted := session.exec(delete_chunk(model, key, model.list_uuid == list_uuid, args.chunk_size)).rowcount:
+                    session.commit()
+                    count += deleted
+    print(f"Removed {count} rows left behind by {len(orphaned)} deleted lists")
+
+
+def migrate(args):
+    engine = get_engine()
+    try:
+        applied = apply_migrations(engine, args.to)
+    except MigrationError as exc:
+        print(exc, file=sys.stderr)
+        sys.exit(1)
+    with engine.connect() as conn:
+        version = current_version(conn)
+    print(f"Applied {len(applied)} migrations, schema is at version {version} of {latest_version()}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("rebuild-summaries", help="recompute every list's task counts from its tasks").set_defaults(func=rebuild_summaries)
+    prune = commands.add_parser("prune-tombstones", help="forget deletions older than a cutoff; older clients get a full sync")
+    prune.add_argument("--days", type=int, default=30)
+    prune.set_defaults(func=prune_tombstones)
+    orphans = commands.add_parser("purge-orphans", help="remove tasks, access rows and summaries of lists that no longer exist")
+    orphans.add_argument("--chunk-size", type=int, default=1000)
+    orphans.set_defaults(func=purge_orphans)
+    migrate_parser = commands.add_parser("migrate", help="apply the schema migrations the database is missing")
+    migrate_parser.add_argument("--to", type=int, help="stop after this version")
+    migrate_parser.set_defaults(func=migrate)
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+from typing import Literal
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    """Application settings, read from the environment (and .env if present)."""
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    # "async" runs queries on the async engine (asyncpg/aiosqlite); "sync" runs
+    # them on the blocking engine through the threadpool.
+    db_mode: Literal["async", "sync"] = "async"
+
+    # Connection pool (ignored for SQLite, which picks its own pool)
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    # Log every SQL statement. Synchronous and noisy, so off unless debugging.
+    db_echo: bool = False
+
+    # List access authorization cache
+    access_cache_ttl_seconds: float = 30.0
+    access_cache_max_entries: int = 10_000
+    # Verified access tokens, each cached until its exp
+    token_cache_max_entries: int = 10_000
+
+    # List change feed. "memory" only reaches subscribers on the same worker;
+    # "postgres" relays events between workers with LISTEN/NOTIFY.
+    event_broadcaster: Literal["memory", "postgres"] = "memory"
+    # Events buffered per subscriber before it is told to resync instead
+    event_queue_size: int = 100
+    # Comment line sent on idle streams so proxies keep them open
+    event_keepalive_seconds: float = 15.0
+    # How often the postgres broadcaster checks its LISTEN connection, and how
+    # long the check may take before the connection is reopened
+    event_health_check_seconds: float = 15.0
+
+    # Password hashing. Cost factor 12 is ~250ms per hash on a typical core.
+    bcrypt_rounds: int = 12
+    # Worker processes hashing in parallel, and how many hashes may be running
+    # or queued before new logins/signups get a 429
+    password_workers: int = 2
+    password_max_pending: int = 32
+    password_retry_after_seconds: int = 1
+    password_worker_nice: int = 5
+
+    # Outgoing email. "fake" keeps messages in memory instead of calling Resend.
+    email_transport: Literal["resend", "fake"] = "resend"
+    email_from: str = "noreply@resend.reesenorr.is"
+    # Outbox rows sent per batch, and how often the worker looks for due rows
+    # when nothing wakes it up
+    email_batch_size: int = 50
+    email_poll_seconds: float = 5.0
+    # Failed sends are retried with exponential backoff, then left in the table
+    email_max_attempts: int = 8
+    email_backoff_base_seconds: float = 2.0
+    email_backoff_max_seconds: float = 600.0
+
+    # Deleted lists are hidden at once and their tasks removed in the background,
+    # purge_chunk_size rows per transaction with a pause in between
+    purge_chunk_size: int = 1000
+    purge_pause_seconds: float = 0.05
+    purge_poll_seconds: float = 60.0
+
+    # Request instrumentation. Per-route timings always go to /metrics/requests;
+    # the Server-Timing header also shows them in the browser's devtools.
+    server_timing_header: bool = True
+    # Sampling profiler, off by default. When on, every thread's stack is
+    # sampled every profiler_interval_ms and each request slower than
+    # profiler_threshold_ms leaves a folded-stack file (flamegraph.pl or
+    # speedscope input) in profiler_output_dir.
+    profiler_enabled: bool = False
+    profiler_interval_ms: float = 5.0
+    profiler_threshold_ms: float = 500.0
+    profiler_output_dir: str = "profiles"
+
+    # Production server (python -m backend.serve). 0 workers means one per CPU
+    # this process may run on; each worker also starts its own password_workers.
+    web_workers: int = 0
+    web_host: str = "0.0.0.0"
+    web_port: int = 8000
+    # With more than one worker, each is replaced after serving web_max_requests
+    # plus a random 0..web_max_requests_jitter, so they do not all restart at
+    # once. 0 disables.
+    web_max_requests: int = 10_000
+    web_max_requests_jitter: int = 1_000
+    # How long a stopping worker waits for open requests (event streams
+    # included) before closing them
+    web_graceful_timeout_seconds: float = 15.0
+    # Proxies trusted to set X-Forwarded-For/-Proto: addresses or networks,
+    # comma separated, or "*". The compose files set the Caddy container's.
+    web_forwarded_allow_ips: str = "127.0.0.1"
+
+    # Schema migrations (backend/migrations). At startup the app only checks
+    # that the database has them all; "migrate" applies missing ones instead,
+    # which is meant for local development and serve.py (which does it once,
+    # before starting the workers). "skip" does neither.
+    schema_on_startup: Literal["check", "migrate", "skip"] = "check"
+    # Rows updated per transaction by data backfills
+    migration_batch_size: int = 1000
+
+    # Rate limiting. A client gets a token bucket per budget: "<requests>/<seconds>"
+    # lets <requests> through at once and refills evenly over <seconds>. Login,
+    # signup and token refresh each have the auth budget; every other /api route
+    # shares the api one. The client is the user in the access token, or else
+    # the address the request came from (behind a proxy, see
+    # web_forwarded_allow_ips).
+    rate_limit_enabled: bool = True
+    rate_limit_auth: str = "10/60"
+    rate_limit_api: str = "100/10"
+    # "memory" keeps the buckets in each worker, so with N workers a client can
+    # get up to N times its budget; "database" shares them through the
+    # rate_limit_bucket table, at the cost of a round trip per request.
+    rate_limit_store: Literal["memory", "database"] = "memory"
+
+    # Response compression, negotiated per request from Accept-Encoding
+    # (zstd, br or gzip). Bodies smaller than compression_min_size bytes are
+    # sent uncompressed. The levels trade CPU per response against bytes saved;
+    # see benchmarks/bench_compression.py.
+    compression_enabled: bool = True
+    compression_min_size: int = 1024
+    compression_zstd_level: int = 3
+    compression_brotli_quality: int = 3
+    compression_gzip_level: int = 4
+
+
+settings = Settings()
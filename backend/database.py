@@ -1,23 +1,269 @@
-from sqlmodel import create_engine, SQLModel, Session
+from sqlmodel import create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel.sql.expression import SelectOfScalar
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
+import asyncio
 import os
+import threading
+import time
+import weakref
 
-from .models import user, list, list_access, task
+from .config import settings
+from . import migrations
+from .models import user, list, list_access, list_summary, task, revision, tombstone, outbox, rate_limit
 
-# Load environment variables from .env
-load_dotenv()
+def database_url() -> str:
+    """DATABASE_URL, from the environment or .env. Read when the first engine is made, not at import."""
+    load_dotenv()
+    return os.environ["DATABASE_URL"]
 
-# Get the database URL
-DATABASE_URL = os.getenv("DATABASE_URL")
+# Async drivers for the dialects we run on
+ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "sqlite": "aiosqlite",
+}
 
-# Create the database engine
-engine = create_engine(DATABASE_URL, echo=True)
+def to_async_url(url: str) -> str:
+    """Rewrite a database URL to use the async driver for its dialect."""
+    parsed = make_url(url)
+    return parsed.set(drivername=f"{parsed.get_backend_name()}+{ASYNC_DRIVERS[parsed.get_backend_name()]}").render_as_string(hide_password=False)
 
-def create_tables():
-    """Create all database tables based on SQLModel metadata."""
-    SQLModel.metadata.create_all(engine)
+class PoolStats:
+    """Counters for connection checkouts from the pool: how many, and how long callers waited."""
 
-def get_session():
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, waited: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+                "wait_seconds_avg": self.wait_seconds_total / self.checkouts if self.checkouts else 0.0,
+            }
+
+pool_stats = PoolStats()
+
+class _TimedPoolMixin:
+    """Time how long each checkout waits for a free connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except TimeoutError:
+            pool_stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        pool_stats.record(time.perf_counter() - start)
+        return connection
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+class TimedAsyncAdaptedQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+def engine_options(url: str, poolclass) -> dict:
+    """Engine keyword arguments from settings. SQLite keeps the pool SQLAlchemy picks for it."""
+    options = {"echo": settings.db_echo}
+    if make_url(url).get_backend_name() != "sqlite":
+        options.update(
+            poolclass=poolclass,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+            pool_pre_ping=settings.db_pool_pre_ping,
+        )
+    return options
+
+# The engines are made on first use, so importing the app neither reads .env
+# nor loads database drivers. In async mode the sync engine only serves
+# migrations and the CLI.
+_engine = None
+_async_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            url = database_url()
+            _engine = create_engine(url, **engine_options(url, TimedQueuePool))
+        return _engine
+
+def get_async_engine():
+    global _async_engine
+    with _engine_lock:
+        if _async_engine is None:
+            url = database_url()
+            _async_engine = create_async_engine(to_async_url(url), **engine_options(url, TimedAsyncAdaptedQueuePool))
+        return _async_engine
+
+def pool_metrics() -> dict:
+    """Current state of the active engine's pool plus checkout wait statistics."""
+    pool = (get_async_engine() if settings.db_mode == "async" else get_engine()).pool
+    metrics = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        metrics.update(
+            size=pool.size(),
+            max_overflow=settings.db_max_overflow,
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+    metrics.update(pool_stats.snapshot())
+    return metrics
+
+# In sync mode a session holds its pooled connection across awaits, and a thread
+# waiting on an exhausted pool blocks a threadpool worker that other requests
+# need to finish and give connections back. Capping concurrent sync sessions at
+# the pool's capacity keeps that wait on the event loop instead.
+SYNC_SESSION_LIMIT = settings.db_pool_size + settings.db_max_overflow
+_sync_session_slots = weakref.WeakKeyDictionary()
+
+def _sync_session_slot() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    slot = _sync_session_slots.get(loop)
+    if slot is None:
+        slot = _sync_session_slots[loop] = asyncio.Semaphore(SYNC_SESSION_LIMIT)
+    return slot
+
+class SyncSessionAdapter:
+    """Expose a blocking Session through the subset of the AsyncSession API the routes use.
+
+    Every call that may touch the database runs on Starlette's threadpool, so
+    route handlers can be written once as `async def` and still run against
+    the sync engine when DB_MODE=sync. Results are buffered in the worker
+    thread, like AsyncSession does, so iterating them never blocks the loop.
+    """
+
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    async def __aenter__(self):
+        self._slot = _sync_session_slot()
+        await self._slot.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        try:
+            await self.close()
+        finally:
+            self._slot.release()
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    def get_bind(self):
+        return self.sync_session.get_bind()
+
+    def _exec(self, statement, **kwargs):
+        result = self.sync_session.execute(statement, **kwargs)
+        if not statement.is_select:
+            return result
+        buffered = result.freeze()()
+        # Mirror Session.exec, which unwraps single-entity selects to scalars
+        return buffered.scalars() if isinstance(statement, SelectOfScalar) else buffered
+
+    async def exec(self, statement, **kwargs):
+        return await run_in_threadpool(self._exec, statement, **kwargs)
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kwargs)
+
+    async def delete(self, instance):
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self):
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def refresh(self, instance):
+        await run_in_threadpool(self.sync_session.refresh, instance)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+    async def stream(self, statement, **kwargs):
+        result = await run_in_threadpool(self.sync_session.execute, statement, **kwargs)
+        return _ThreadedResult(result)
+
+class _ThreadedResult:
+    """Async iteration over a sync streaming Result, fetching each partition on the threadpool."""
+
+    def __init__(self, result):
+        self._result = result
+
+    async def partitions(self, size: int):
+        while True:
+            rows = await run_in_threadpool(self._result.fetchmany, size)
+            if not rows:
+                return
+            yield rows
+
+    async def close(self):
+        await run_in_threadpool(self._result.close)
+
+def open_session(bind=None):
+    """Open a session for the configured DB_MODE. Use as `async with open_session() as session`."""
+    if settings.db_mode == "async":
+        return AsyncSession(bind or get_async_engine(), expire_on_commit=False)
+    return SyncSessionAdapter(Session(bind or get_engine(), expire_on_commit=False))
+
+def open_session_like(session):
+    """Open a new session on the same engine and in the same mode as an existing one."""
+    if isinstance(session, SyncSessionAdapter):
+        return SyncSessionAdapter(Session(session.get_bind(), expire_on_commit=False))
+    return AsyncSession(session.bind, expire_on_commit=False)
+
+async def check_schema_version():
+    """Fail unless every migration this code knows about has been applied (see migrations/)."""
+    if settings.db_mode == "async":
+        async with get_async_engine().connect() as conn:
+            await conn.run_sync(migrations.check_version)
+    else:
+        def check():
+            with get_engine().connect() as conn:
+                migrations.check_version(conn)
+        await run_in_threadpool(check)
+
+async def dispose_engines():
+    """Close the pooled connections, so a stopping worker is not kept alive by them."""
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    if _engine is not None:
+        _engine.dispose()
+
+async def get_session():
     """Dependency to provide a database session."""
-    with Session(engine) as session:
+    async with open_session() as session:
         yield session
@@ -1,12 +1,36 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 
 from .routes.user import user_router
 from .routes.list import list_router
 from .routes.task import task_router
-from .database import create_tables
+from .routes.export import export_router
+from .routes.metrics import metrics_router
+from .routes.events import events_router
+from .routes.sync import sync_router
+from .routes.search import search_router
+from .routes.agenda import agenda_router
+from .routes.middleware import access_invalidations
+from .config import settings
+from .database import check_schema_version, dispose_engines, get_engine
+from .migrations import migrate
+from .utils.compression import CompressionMiddleware
+from .utils.email import confirmation_template, outbox_worker
+from .utils.events import broadcaster
+from .utils.instrumentation import InstrumentationMiddleware
+from .utils.password import shutdown_password_pool
+from .utils.profiling import sampler
+from .utils.purge import purge_worker
+from .utils.ratelimit import RateLimitMiddleware
+from .utils.token import jwt_secret_key
 
-app = FastAPI()
+# orjson renders the already-serialized response models without another pass in Python
+app = FastAPI(default_response_class=ORJSONResponse)
+
+# Inside CORS, so browsers can read the 429s and their Retry-After
+app.add_middleware(RateLimitMiddleware)
 
 # Allow all hosts to connect with credentials
 app.add_middleware(
@@ -15,19 +39,55 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Retry-After"],
 )
 
-# Register the startup event to create tables
+# Outside CORS and the rate limiter, so it sees their responses too; inside
+# instrumentation, so compression time counts towards the request
+app.add_middleware(CompressionMiddleware)
+
+# Added last so it is outermost and times everything below it, CORS included
+app.add_middleware(InstrumentationMiddleware)
+
 @app.on_event("startup")
-def on_startup():
-    create_tables()
+async def on_startup():
+    # Load the signing key now, so a missing SECRET_KEY fails the boot rather than every request
+    jwt_secret_key()
+    confirmation_template()
+    if settings.schema_on_startup == "check":
+        await check_schema_version()
+    elif settings.schema_on_startup == "migrate":
+        await run_in_threadpool(migrate, get_engine())
+    await broadcaster.start()
+    await access_invalidations.start()
+    await outbox_worker.start()
+    await purge_worker.start()
+    if settings.profiler_enabled:
+        sampler.start(settings.profiler_interval_ms / 1000, settings.profiler_output_dir)
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    sampler.stop()
+    await purge_worker.stop()
+    await outbox_worker.stop()
+    await access_invalidations.stop()
+    await broadcaster.stop()
+    shutdown_password_pool()
+    await dispose_engines()
 
 # Include routers from routes
 app.include_router(user_router, tags=["user"], prefix="/api/user")
 app.include_router(list_router, tags=["list"], prefix="/api/list")
 app.include_router(task_router, tags=["task"], prefix="/api/list/{list_uuid}/task")
+app.include_router(events_router, tags=["events"], prefix="/api/list/{list_uuid}/events")
+app.include_router(sync_router, tags=["sync"], prefix="/api/sync")
+app.include_router(search_router, tags=["search"], prefix="/api/search")
+app.include_router(agenda_router, tags=["agenda"], prefix="/api/agenda")
+app.include_router(export_router, tags=["export"], prefix="/api/export")
+# Operational metrics live outside /api so the public proxy does not expose them
+app.include_router(metrics_router, tags=["metrics"], prefix="/metrics")
 
 # Root endpoint
 @app.get("/")
-def read_root():
+async def read_root():
     return {"hello": "world"}
\ No newline at end of file
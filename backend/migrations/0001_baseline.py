@@ -0,0 +1,42 @@
+"""The schema as the app created it before migrations existed: users, lists, access and tasks.
+
+Frozen: the tables are spelled out here rather than taken from the models,
+so version 1 means the same thing whatever the models look like later. On a
+database from before migrations these tables are already there and nothing
+is done; everything added since arrives through its own migration.
+"""
+from sqlalchemy import Boolean, Column, DateTime, MetaData, String, Table, Uuid
+
+metadata = MetaData()
+
+Table("user", metadata,
+      Column("uuid", Uuid, primary_key=True),
+      Column("email", String, unique=True, nullable=False),
+      Column("password", String, nullable=False),
+      Column("first_name", String, nullable=False),
+      Column("last_name", String, nullable=False),
+      Column("created_at", DateTime, nullable=False))
+
+Table("list", metadata,
+      Column("uuid", Uuid, primary_key=True),
+      Column("created_at", DateTime, nullable=False),
+      Column("title", String, nullable=False),
+      Column("description", String, nullable=False))
+
+Table("listaccess", metadata,
+      Column("uuid", Uuid, primary_key=True),
+      Column("list_uuid", Uuid, nullable=False, index=True),
+      Column("owner_uuid", Uuid, nullable=False, index=True))
+
+Table("task", metadata,
+      Column("uuid", Uuid, primary_key=True),
+      Column("list_uuid", Uuid, nullable=False),
+      Column("created_at", DateTime, nullable=False),
+      Column("title", String, nullable=False),
+      Column("description", String, nullable=False),
+      Column("due_date", DateTime, nullable=False),
+      Column("done", Boolean, nullable=False))
+
+
+def upgrade(engine):
+    metadata.create_all(engine)
@@ -0,0 +1,7 @@
+"""Index for keyset pagination of a list's tasks by (due_date, uuid)."""
+from ..models.task import Task
+from . import create_index, index_named
+
+
+def upgrade(engine):
+    create_index(engine, index_named(Task.__table__, "ix_task_list_uuid_due_date_uuid"))
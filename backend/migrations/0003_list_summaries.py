@@ -0,0 +1,15 @@
+"""list_summary, and a row in it for every list that does not have one yet."""
+from sqlalchemy import exists
+
+from ..models.list import List
+from ..models.list_summary import ListSummary
+from ..utils.summary import insert_summaries
+from . import batches
+
+
+def upgrade(engine):
+    with engine.begin() as conn:
+        ListSummary.__table__.create(conn, checkfirst=True)
+    missing = ~exists().where(ListSummary.list_uuid == List.uuid)
+    for conn, list_uuids in batches(engine, List.uuid, missing):
+        conn.execute(insert_summaries(List.uuid.in_(list_uuids)))
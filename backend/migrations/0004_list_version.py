@@ -0,0 +1,7 @@
+"""list.version, the counter list ETags are derived from."""
+from ..models.list import List
+from . import add_column
+
+
+def upgrade(engine):
+    add_column(engine, List.__table__.c.version)
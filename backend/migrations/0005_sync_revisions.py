@@ -0,0 +1,17 @@
+"""The revision counter and tombstones for the sync endpoint, revision columns, and the index for a list's changes since a revision."""
+from ..models.list import List
+from ..models.list_access import ListAccess
+from ..models.revision import Revision
+from ..models.task import Task
+from ..models.tombstone import Tombstone
+from . import add_column, create_index, index_named
+
+
+def upgrade(engine):
+    with engine.begin() as conn:
+        # Creating revision also inserts its single row
+        Revision.__table__.create(conn, checkfirst=True)
+        Tombstone.__table__.create(conn, checkfirst=True)
+    for model in (Task, List, ListAccess):
+        add_column(engine, model.__table__.c.revision)
+    create_index(engine, index_named(Task.__table__, "ix_task_list_uuid_revision"))
@@ -0,0 +1,21 @@
+"""Lowercase stored emails, then build the unique index on lower(email).
+
+Stops without changing anything when two users' emails only differ in case;
+merge or rename those accounts first.
+"""
+from sqlalchemy import func, select, update
+
+from ..models.user import User
+from . import MigrationError, batches, create_index, index_named
+
+
+def upgrade(engine):
+    normalized = func.lower(func.trim(User.email))
+    with engine.connect() as conn:
+        clashes = conn.execute(select(normalized).group_by(normalized).having(func.count() > 1)).scalars().all()
+    if clashes:
+        raise MigrationError("Users share these emails when case is ignored, merge or rename them first: "
+                             + ", ".join(clashes))
+    for conn, user_uuids in batches(engine, User.uuid, User.email != normalized):
+        conn.execute(update(User).where(User.uuid.in_(user_uuids)).values(email=normalized))
+    create_index(engine, index_named(User.__table__, "ix_user_email_lower"))
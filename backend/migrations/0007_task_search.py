@@ -0,0 +1,26 @@
+"""Full-text search over task titles and descriptions (see models/task.py).
+
+On Postgres, adding the generated search_vector column rewrites the task
+table under an exclusive lock, so apply this one in a quiet window; the GIN
+index is then built concurrently. On SQLite the FTS5 table is filled from the
+existing tasks when it is created.
+"""
+from sqlalchemy import inspect, text
+
+from ..models.task import SEARCH_DDL
+from . import create_index_sql
+
+
+def upgrade(engine):
+    if engine.dialect.name == "postgresql":
+        add_column, create_index = SEARCH_DDL["postgresql"]
+        with engine.begin() as conn:
+            conn.execute(text(add_column))
+        create_index_sql(engine, "ix_task_search_vector", create_index)
+        return
+    with engine.begin() as conn:
+        created = not inspect(conn).has_table("task_fts")
+        for statement in SEARCH_DDL["sqlite"]:
+            conn.execute(text(statement))
+        if created:
+            conn.execute(text("INSERT INTO task_fts (task_fts) VALUES ('rebuild')"))
@@ -0,0 +1,7 @@
+"""Partial index of open tasks by list and due date, for the agenda."""
+from ..models.task import Task
+from . import create_index, index_named
+
+
+def upgrade(engine):
+    create_index(engine, index_named(Task.__table__, "ix_task_open_list_uuid_due_date"))
@@ -0,0 +1,8 @@
+"""list.deleted_at, and the partial index the purge worker finds deleted lists with."""
+from ..models.list import List
+from . import add_column, create_index, index_named
+
+
+def upgrade(engine):
+    add_column(engine, List.__table__.c.deleted_at)
+    create_index(engine, index_named(List.__table__, "ix_list_deleted_at"))
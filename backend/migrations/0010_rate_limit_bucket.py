@@ -0,0 +1,7 @@
+"""rate_limit_bucket, shared rate limit state for RATE_LIMIT_STORE=database."""
+from ..models.rate_limit import RateLimitBucket
+
+
+def upgrade(engine):
+    with engine.begin() as conn:
+        RateLimitBucket.__table__.create(conn, checkfirst=True)
@@ -0,0 +1,7 @@
+"""email_outbox, the queue of emails the outbox worker sends."""
+from ..models.outbox import OutboxEmail
+
+
+def upgrade(engine):
+    with engine.begin() as conn:
+        OutboxEmail.__table__.create(conn, checkfirst=True)
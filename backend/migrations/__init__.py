@@ -0,0 +1,151 @@
+"""Versioned schema migrations, applied with `python -m backend.cli migrate`.
+
+Each module here named NNNN_description.py is one migration with an
+`upgrade(engine)` function. They run in order, and each is recorded in the
+schema_migration table once it has finished. The app itself only checks at
+startup that the newest one is recorded (check_version).
+
+A migration is not one transaction, so it can build indexes without blocking
+writes on Postgres (create_index) and backfill large tables in short
+transactions (batches). In exchange, a migration that was interrupted simply
+runs again from the start, so every step has to be a no-op when its change is
+already there. The helpers check first; plain statements should use IF NOT
+EXISTS, or a condition that skips rows already done.
+
+0001 is the schema from before migrations existed, written out rather than
+taken from the models, so an empty database and an old one go through the
+same steps. Every table or index added since arrives in its own migration.
+Migrations may use the models' tables and indexes, but a migration that is
+out must never be edited to create something new: add another one.
+"""
+import importlib
+import pkgutil
+import re
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, func, inspect, select, text
+from sqlalchemy.schema import CreateColumn, CreateIndex
+
+from ..config import settings
+
+schema_migration = Table(
+    "schema_migration", MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# Session-level Postgres advisory lock held while migrating, so two deploys
+# starting at once do not both run the same migration
+LOCK_KEY = 0x746f646f
+
+class SchemaVersionError(RuntimeError):
+    """The database is missing migrations this code needs."""
+
+class MigrationError(RuntimeError):
+    """A migration cannot be applied to the data as it is."""
+
+def migrations() -> list[tuple[int, str]]:
+    """(version, module name) of every migration, oldest first."""
+    found = sorted((int(m.group(1)), m.group(0)) for info in pkgutil.iter_modules(__path__)
+                   if (m := re.fullmatch(r"(\d{4})_\w+", info.name)))
+    versions = [version for version, _ in found]
+    if len(set(versions)) != len(versions):
+        raise MigrationError(f"Two migrations share a version number: {[name for _, name in found]}")
+    return found
+
+def latest_version() -> int:
+    return migrations()[-1][0]
+
+def current_version(conn) -> int:
+    """The newest migration recorded in the database, 0 when it has none."""
+    if not inspect(conn).has_table(schema_migration.name):
+        return 0
+    return conn.execute(select(func.max(schema_migration.c.version))).scalar() or 0
+
+def check_version(conn):
+    """Raise unless the database has every migration applied. A newer schema is fine: migrations only add."""
+    current, latest = current_version(conn), latest_version()
+    if current < latest:
+        raise SchemaVersionError(
+            f"Database schema is at version {current}, this code needs {latest}: run `python -m backend.cli migrate`")
+
+def migrate(engine, target: int | None = None, log=print) -> list[str]:
+    """Apply the migrations the database is missing, in order, up to `target`. Returns their names."""
+    applied = []
+    # Autocommit, so holding the lock does not keep a transaction open for the
+    # whole run; CREATE INDEX CONCURRENTLY would wait for it to end
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock:
+        if lock.dialect.name == "postgresql":
+            lock.execute(text("SELECT pg_advisory_lock(:key)"), {"key": LOCK_KEY})
+        try:
+            with engine.begin() as conn:
+                schema_migration.create(conn, checkfirst=True)
+                current = current_version(conn)
+            for version, name in migrations():
+                if version <= current or (target is not None and version > target):
+                    continue
+                if log:
+                    log(f"Applying {name}")
+                importlib.import_module(f".{name}", __name__).upgrade(engine)
+                with engine.begin() as conn:
+                    conn.execute(schema_migration.insert().values(version=version, name=name, applied_at=datetime.now()))
+                applied.append(name)
+        finally:
+            if lock.dialect.name == "postgresql":
+                lock.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": LOCK_KEY})
+    return applied
+
+def index_named(table: Table, name: str) -> Index:
+    return next(index for index in table.indexes if index.name == name)
+
+def create_index(engine, index: Index):
+    """Create one of the models' indexes if it is missing."""
+    create_index_sql(engine, index.name, str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect)))
+
+def create_index_sql(engine, name: str, ddl: str):
+    """Run a CREATE [UNIQUE] INDEX IF NOT EXISTS statement, concurrently on Postgres.
+
+    A concurrent build lets reads and writes go on while it scans the table,
+    but cannot run in a transaction, and one that fails or is interrupted
+    leaves an invalid index behind, which is dropped and built again.
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if conn.dialect.name == "postgresql":
+            invalid = conn.execute(text(
+                "SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+                "WHERE pg_class.relname = :name AND NOT pg_index.indisvalid"), {"name": name}).first()
+            if invalid:
+                conn.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            ddl = ddl.replace(" INDEX ", " INDEX CONCURRENTLY ", 1)
+        conn.exec_driver_sql(ddl)
+
+def add_column(engine, column: Column):
+    """Add one of the models' columns to its table if it is missing. It needs a server default or to allow NULL."""
+    with engine.begin() as conn:
+        if column.name in {c["name"] for c in inspect(conn).get_columns(column.table.name)}:
+            return
+        table = conn.dialect.identifier_preparer.format_table(column.table)
+        # Postgres adds a column with a constant default without rewriting the table
+        conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {CreateColumn(column).compile(dialect=conn.dialect)}")
+
+def batches(engine, key, where=None, size: int | None = None):
+    """Walk the rows matching `where` in `key` order, yielding (conn, keys) for up to `size` rows at a time.
+
+    Each batch is its own transaction, committed when the caller asks for the
+    next one, so a backfill never holds locks on more than one batch of rows.
+    """
+    size = size or settings.migration_batch_size
+    last = None
+    while True:
+        with engine.begin() as conn:
+            statement = select(key).order_by(key).limit(size)
+            if where is not None:
+                statement = statement.where(where)
+            if last is not None:
+                statement = statement.where(key > last)
+            keys = conn.execute(statement).scalars().all()
+            if not keys:
+                return
+            yield conn, keys
+        last = keys[-1]
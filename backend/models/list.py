@@ -1,11 +1,26 @@
 from datetime import datetime
+from typing import Optional
 from uuid import UUID
 
+from sqlalchemy import Index, text
 from sqlmodel import Field, SQLModel
 
 class List(SQLModel, table=True):
-    __table_args__ = { 'extend_existing': True }
+    __table_args__ = (
+        # The purge worker's queue of deleted lists; only those rows are indexed
+        Index("ix_list_deleted_at", "deleted_at",
+              sqlite_where=text("deleted_at IS NOT NULL"), postgresql_where=text("deleted_at IS NOT NULL")),
+        { 'extend_existing': True },
+    )
     uuid: UUID = Field(primary_key=True)
     created_at: datetime = Field()
     title: str = Field()
     description: str = Field()
+    # Bumped by every write to the list or its tasks; read endpoints derive their ETag from it
+    version: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    # Revision of the last write to the list row or its sharing, not to its
+    # tasks, which carry their own (see models/revision.py)
+    revision: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    # Set when the list is deleted. Nobody can reach it any more, and the purge
+    # worker (utils/purge.py) removes its tasks and then the row itself.
+    deleted_at: Optional[datetime] = Field(default=None)
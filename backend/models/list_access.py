@@ -8,3 +8,5 @@ class ListAccess(SQLModel, table=True):
     uuid: UUID = Field(primary_key=True)
     list_uuid: UUID = Field(index=True)
     owner_uuid: UUID = Field(index=True)
+    # Revision at which access was granted; the sync endpoint sends the whole list to new members
+    revision: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
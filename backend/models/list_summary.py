@@ -0,0 +1,15 @@
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from sqlmodel import Field, SQLModel
+
+class ListSummary(SQLModel, table=True):
+    """Task counts for a list, kept up to date by every task write (see utils/summary.py)."""
+    __tablename__ = "list_summary"
+    __table_args__ = { 'extend_existing': True }
+    list_uuid: UUID = Field(primary_key=True)
+    total_tasks: int = Field(default=0)
+    tasks_completed: int = Field(default=0)
+    # Earliest due date among tasks that are not done
+    earliest_open_due_date: Optional[datetime] = Field(default=None)
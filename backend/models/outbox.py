@@ -0,0 +1,26 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Index
+from sqlmodel import Field, SQLModel
+
+class OutboxEmail(SQLModel, table=True):
+    """An email waiting to be sent by the outbox worker (see utils/email.py).
+
+    Rows are written in the same transaction as whatever caused the email, and
+    deleted once the transport accepts them.
+    """
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index("ix_email_outbox_next_attempt_at", "next_attempt_at"),
+        { 'extend_existing': True },
+    )
+    id: Optional[int] = Field(default=None, primary_key=True)
+    to: str = Field()
+    subject: str = Field()
+    html: str = Field()
+    created_at: datetime = Field()
+    attempts: int = Field(default=0)
+    # When the worker may next pick the row up. NULL once it has given up on it.
+    next_attempt_at: Optional[datetime] = Field()
+    last_error: Optional[str] = Field(default=None)
@@ -0,0 +1,12 @@
+from sqlmodel import Field, SQLModel
+
+class RateLimitBucket(SQLModel, table=True):
+    """One client's bucket for one rate limit budget, when RATE_LIMIT_STORE=database (see utils/ratelimit.py)."""
+    __tablename__ = "rate_limit_bucket"
+    __table_args__ = ({ 'extend_existing': True },)
+    # "<budget>:<user uuid or client address>"
+    key: str = Field(primary_key=True)
+    # Epoch seconds at which the bucket is full again (GCRA's theoretical arrival time)
+    tat: float = Field()
+    # Whether the last request counted against the bucket was let through
+    allowed: bool = Field()
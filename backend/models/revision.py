@@ -0,0 +1,21 @@
+from sqlalchemy import DDL, event
+from sqlmodel import Field, SQLModel
+
+class Revision(SQLModel, table=True):
+    """Single-row counter handing out revisions to writes, for the sync endpoint.
+
+    Taking a revision locks this row until the transaction ends, so revisions
+    become visible in the order they were handed out and a client that has
+    synced up to N never misses a later commit with a revision below N.
+    """
+    __tablename__ = "revision"
+    __table_args__ = { 'extend_existing': True }
+    id: int = Field(primary_key=True)
+    value: int = Field()
+    # Tombstones at or below this revision have been pruned
+    pruned_through: int = Field(default=0)
+
+event.listen(
+    Revision.__table__, "after_create",
+    DDL("INSERT INTO revision (id, value, pruned_through) VALUES (1, 0, 0)"),
+)
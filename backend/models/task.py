@@ -1,10 +1,21 @@
 from datetime import datetime
 from uuid import UUID
 
+from sqlalchemy import DDL, Index, event, text
 from sqlmodel import Field, SQLModel
 
 class Task(SQLModel, table=True):
-    __table_args__ = { 'extend_existing': True }
+    __table_args__ = (
+        # Keyset pagination of a list's tasks by (due_date, uuid)
+        Index("ix_task_list_uuid_due_date_uuid", "list_uuid", "due_date", "uuid"),
+        # Tasks of a list changed since a sync revision
+        Index("ix_task_list_uuid_revision", "list_uuid", "revision"),
+        # Open tasks of a list by due date, for the agenda. Done tasks, usually
+        # most of a list, are left out of the index entirely.
+        Index("ix_task_open_list_uuid_due_date", "list_uuid", "due_date", "uuid",
+              sqlite_where=text("done = 0"), postgresql_where=text("done = false")),
+        { 'extend_existing': True },
+    )
     uuid: UUID = Field(primary_key=True)
     list_uuid: UUID = Field()
     created_at: datetime = Field()
@@ -12,3 +23,37 @@ class Task(SQLModel, table=True):
     description: str = Field()
     due_date: datetime = Field()
     done: bool = Field()
+    # Revision of the last write to the task (see models/revision.py)
+    revision: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+
+# Full-text search over title and description (see utils/search.py). Neither
+# index is expressible as a column on the model, so both are created with the
+# table, and migration 0007 adds them to an existing one.
+SEARCH_DDL = {
+    # A stored tsvector, so ranking reads it instead of re-parsing every match,
+    # with title words weighted above description words
+    "postgresql": [
+        "ALTER TABLE task ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', title), 'A') || setweight(to_tsvector('english', description), 'B')) STORED",
+        "CREATE INDEX IF NOT EXISTS ix_task_search_vector ON task USING gin (search_vector)",
+    ],
+    # An external-content FTS5 table keyed by task's rowid and kept in step by
+    # triggers. VACUUM can renumber those rowids, so after one refill it with
+    # INSERT INTO task_fts (task_fts) VALUES ('rebuild').
+    "sqlite": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS task_fts USING fts5("
+        "title, description, content='task', content_rowid='rowid', tokenize='porter unicode61')",
+        "CREATE TRIGGER IF NOT EXISTS task_fts_insert AFTER INSERT ON task BEGIN "
+        "INSERT INTO task_fts (rowid, title, description) VALUES (new.rowid, new.title, new.description); END",
+        "CREATE TRIGGER IF NOT EXISTS task_fts_delete AFTER DELETE ON task BEGIN "
+        "INSERT INTO task_fts (task_fts, rowid, title, description) VALUES ('delete', old.rowid, old.title, old.description); END",
+        "CREATE TRIGGER IF NOT EXISTS task_fts_update AFTER UPDATE OF title, description ON task BEGIN "
+        "INSERT INTO task_fts (task_fts, rowid, title, description) VALUES ('delete', old.rowid, old.title, old.description); "
+        "INSERT INTO task_fts (rowid, title, description) VALUES (new.rowid, new.title, new.description); END",
+    ],
+}
+
+for dialect, statements in SEARCH_DDL.items():
+    for statement in statements:
+        event.listen(Task.__table__, "after_create", DDL(statement).execute_if(dialect=dialect))
+event.listen(Task.__table__, "before_drop", DDL("DROP TABLE IF EXISTS task_fts").execute_if(dialect="sqlite"))
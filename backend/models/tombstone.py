@@ -0,0 +1,22 @@
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import Index
+from sqlmodel import Field, SQLModel
+
+class Tombstone(SQLModel, table=True):
+    """A deleted task, or a list a user lost (deleted or access revoked), kept for the sync endpoint."""
+    __table_args__ = (
+        Index("ix_tombstone_revision", "revision"),
+        { 'extend_existing': True },
+    )
+    id: Optional[int] = Field(default=None, primary_key=True)
+    revision: int = Field()
+    # "task" or "list"
+    kind: str = Field()
+    entity_uuid: UUID = Field()
+    list_uuid: UUID = Field()
+    # Set on "list" tombstones: the user whose copy of the list should be dropped
+    user_uuid: Optional[UUID] = Field(default=None)
+    deleted_at: datetime = Field()
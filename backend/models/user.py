@@ -1,13 +1,27 @@
 from datetime import datetime
 from uuid import UUID
 
+from sqlalchemy import Index, func, text
 from sqlmodel import Field, SQLModel
 
+def normalize_email(email: str) -> str:
+    """Canonical form of an email address: what we store, and what lookups compare against."""
+    return email.strip().lower()
+
 class User(SQLModel, table=True):
-    __table_args__ = { 'extend_existing': True }
+    __table_args__ = (
+        # Case-insensitive lookups and uniqueness; query with User.email_is()
+        Index("ix_user_email_lower", text("lower(email)"), unique=True),
+        { 'extend_existing': True },
+    )
     uuid: UUID = Field(primary_key=True)
     email: str = Field(unique=True)
     password: str = Field()
     first_name: str = Field()
     last_name: str = Field()
     created_at: datetime = Field()
+
+    @classmethod
+    def email_is(cls, email: str):
+        """Filter for the user with this email, in any case, served by ix_user_email_lower."""
+        return func.lower(cls.email) == normalize_email(email)
@@ -0,0 +1,73 @@
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import true, tuple_
+from sqlalchemy.orm import aliased
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..database import get_session
+from ..models.list_access import ListAccess
+from ..models.task import Task
+from ..utils.pagination import decode_cursor, encode_cursor, take_page
+from .middleware import get_current_user
+from .schemas import TaskOut
+from .task import MAX_PAGE_SIZE
+
+agenda_router = APIRouter()
+
+def agenda_statement(dialect: str, user_uuid: UUID, limit: int, due_after: datetime | None = None,
+                     due_before: datetime | None = None, after: tuple[datetime, UUID] | None = None):
+    """The user's open tasks in all accessible lists, by (due_date, uuid), at most `limit` of them.
+
+    `Task.done == False` renders as a literal, so both databases match it to
+    the partial ix_task_open_list_uuid_due_date index and range-scan only open
+    tasks in the window.
+    """
+    conditions = [Task.done == False]
+    if due_after is not None:
+        conditions.append(Task.due_date >= due_after)
+    if due_before is not None:
+        conditions.append(Task.due_date < due_before)
+    if after is not None:
+        conditions.append(tuple_(Task.due_date, Task.uuid) > tuple_(*after))
+
+    if dialect == "postgresql":
+        # Take at most `limit` tasks from each list's index range before merging,
+        # so a wide window over a big list costs no more than the page
+        per_list = select(Task).where(Task.list_uuid == ListAccess.list_uuid, *conditions).order_by(Task.due_date, Task.uuid).limit(limit).lateral()
+        task = aliased(Task, per_list)
+        return select(task).select_from(ListAccess).join(per_list, true()).where(
+            ListAccess.owner_uuid == user_uuid
+        ).order_by(task.due_date, task.uuid).limit(limit)
+    # SQLite has no LATERAL; it range-scans each list's open tasks in the window and sorts them
+    return select(Task).join(ListAccess, Task.list_uuid == ListAccess.list_uuid).where(
+        ListAccess.owner_uuid == user_uuid, *conditions
+    ).order_by(Task.due_date, Task.uuid).limit(limit)
+
+# Open tasks across every list the caller can access, soonest due first, for
+# dashboards ("due this week": due_before=<end of week>; leave due_after out to
+# include overdue tasks). When more tasks remain, the cursor for the next page
+# is returned in the X-Next-Cursor header.
+@agenda_router.get("/", response_model=list[TaskOut])
+async def get_agenda(
+    response: Response,
+    due_after: Optional[datetime] = None,
+    due_before: Optional[datetime] = None,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_session),
+    current_user=Depends(get_current_user),
+):
+    after = None
+    if cursor is not None:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    dialect = session.get_bind().dialect.name
+    tasks = (await session.exec(agenda_statement(dialect, current_user.uuid, limit + 1, due_after, due_before, after))).all()
+    return take_page(tasks, limit, response, lambda task: encode_cursor(task.due_date, task.uuid))
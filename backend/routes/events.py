@@ -0,0 +1,53 @@
+import asyncio
+import json
+import uuid
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.security.utils import get_authorization_scheme_param
+from fastapi.responses import StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..config import settings
+from ..database import get_session
+from ..utils.events import broadcaster
+from .middleware import get_current_user, has_list_access
+
+events_router = APIRouter()
+
+async def get_stream_user(request: Request, access_token: Optional[str] = None):
+    # EventSource cannot set an Authorization header, so the token may also come in the query string
+    scheme, token = get_authorization_scheme_param(request.headers.get("Authorization"))
+    if scheme.lower() != "bearer":
+        token = access_token
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    return await get_current_user(token)
+
+async def event_stream(queue: asyncio.Queue, user_uuid: str):
+    yield "retry: 3000\n\n"
+    while True:
+        try:
+            message = await asyncio.wait_for(queue.get(), settings.event_keepalive_seconds)
+        except asyncio.TimeoutError:
+            yield ": keepalive\n\n"
+            continue
+        yield f"data: {message}\n\n"
+        event = json.loads(message)
+        if event["type"] == "list.deleted" or (event["type"] == "access.revoked" and event.get("user_uuid") == user_uuid):
+            return
+
+# Server-sent events for one list. Each event names what changed and carries the
+# new task or list where there is one, so clients can patch their copy instead of
+# refetching. A "resync" event means events were dropped and the client should refetch.
+@events_router.get("/")
+async def list_events(list_uuid: uuid.UUID, session: AsyncSession = Depends(get_session), current_user=Depends(get_stream_user)):
+    if not await has_list_access(session, current_user.uuid, list_uuid):
+        raise HTTPException(status_code=404, detail="List not found")
+
+    async def stream():
+        with broadcaster.subscribe(str(list_uuid)) as queue:
+            async for chunk in event_stream(queue, str(current_user.uuid)):
+                yield chunk
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
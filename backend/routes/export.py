@@ -0,0 +1,61 @@
+import uuid
+
+import orjson
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .middleware import get_current_user
+from ..database import get_session, open_session_like
+from ..models.list import List
+from ..models.list_access import ListAccess
+from ..models.task import Task
+from .schemas import ListOut, TaskOut
+
+export_router = APIRouter()
+
+# Rows fetched from the server-side cursor per round trip
+EXPORT_BATCH_SIZE = 1000
+
+async def export_rows(session: AsyncSession, user_uuid: uuid.UUID):
+    """Yield NDJSON chunks: a line per list followed by a line per task in that list.
+
+    Rows are read from a server-side cursor one batch at a time and each batch
+    is sent as a single chunk. Lines are the API's ListOut and TaskOut with a
+    "type" added.
+    """
+    result = await session.stream(select(List, Task).join(
+        ListAccess, List.uuid == ListAccess.list_uuid
+    ).outerjoin(
+        Task, List.uuid == Task.list_uuid
+    ).where(
+        ListAccess.owner_uuid == user_uuid
+    ).order_by(
+        List.created_at.desc(), List.uuid, Task.due_date, Task.uuid
+    ).execution_options(yield_per=EXPORT_BATCH_SIZE))
+
+    current_list_uuid = None
+    async for rows in result.partitions(EXPORT_BATCH_SIZE):
+        lines = []
+        for l, t in rows:
+            if l.uuid != current_list_uuid:
+                current_list_uuid = l.uuid
+                lines.append(orjson.dumps({"type": "list", **ListOut.model_validate(l).model_dump()}))
+            if t is not None:
+                lines.append(orjson.dumps({"type": "task", **TaskOut.model_validate(t).model_dump()}))
+        yield b"\n".join(lines) + b"\n"
+    await result.close()
+
+@export_router.get("/")
+async def export_all(session: AsyncSession = Depends(get_session), current_user=Depends(get_current_user)):
+    user_uuid = current_user.uuid
+
+    # The request's session is closed once the handler returns, before the body
+    # is streamed, so the stream gets its own session on the same engine.
+    async def stream():
+        async with open_session_like(session) as stream_session:
+            async for chunk in export_rows(stream_session, user_uuid):
+                yield chunk
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
@@ -1,15 +1,22 @@
 from datetime import datetime
+import typing
 import uuid
 from ..models.user import User
-from fastapi import APIRouter, Depends, HTTPException, Response, status
-from sqlmodel import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from pydantic import BaseModel
-from sqlalchemy import func, case
+from sqlalchemy import delete
 
-from .middleware import get_current_user
+from .middleware import get_current_user, require_list_access, invalidate_list_access
+from .schemas import ListAccessUserOut, ListDetailsOut, ListOut
 from ..database import get_session
 from ..models import list, list_access
-from ..models.task import Task
+from ..models.list_summary import ListSummary
+from ..utils.etag import conditional, touch_list, weak_etag
+from ..utils.events import publish_list_event
+from ..utils.purge import purge_worker
+from ..utils.revision import add_tombstones, next_revision
 
 list_router = APIRouter()
 
@@ -17,8 +24,8 @@ class CreateListBody(BaseModel):
     title: str
     description: str
 
-@list_router.post("/create")
-def create_list(reqBody: CreateListBody, session: Session = Depends(get_session), current_user=Depends(get_current_user)):
+@list_router.post("/create", response_model=ListOut)
+async def create_list(reqBody: CreateListBody, session: AsyncSession = Depends(get_session), current_user=Depends(get_current_user)):
     # Create a new list with its details
     l = list.List()
     l.uuid = uuid.uuid4()
@@ -30,216 +37,205 @@ def create_list(reqBody: CreateListBody, session: Session = Depends(get_session)
     la = list_access.ListAccess()
     la.uuid = uuid.uuid4()
     la.list_uuid = l.uuid  # Link to the list's UUID
-    la.owner_uuid = uuid.UUID(current_user['uuid'])  # Convert user's UUID string to UUID object
+    la.owner_uuid = current_user.uuid
+    l.revision = la.revision = await next_revision(session)
 
-    # Add both the list and the access entry to the session
+    # Add the list, the access entry and an empty task summary to the session
     session.add(l)
     session.add(la)
-    session.commit()
+    session.add(ListSummary(list_uuid=l.uuid))
+    await session.commit()
 
     # Return the details of the newly created list
-    return {
-        "uuid": str(l.uuid),
-        "created_at": l.created_at.isoformat(),
-        "title": l.title,
-        "description": l.description,
-    }
-
-@list_router.get("/")
-def get_lists(session: Session = Depends(get_session), current_user=Depends(get_current_user)):
-    user_uuid = uuid.UUID(current_user['uuid'])
+    return l
+
+def list_details(l: list.List, summary: ListSummary | None) -> ListDetailsOut:
+    # Lists created before summaries existed have no row until rebuild-summaries runs
+    summary = summary or ListSummary(list_uuid=l.uuid)
+    return ListDetailsOut(
+        uuid=l.uuid,
+        created_at=l.created_at,
+        title=l.title,
+        description=l.description,
+        total_tasks=summary.total_tasks,
+        tasks_completed=summary.tasks_completed,
+        earliest_due_date=summary.earliest_open_due_date,
+    )
+
+@list_router.get("/", response_model=typing.List[ListDetailsOut])
+async def get_lists(request: Request, response: Response, session: AsyncSession = Depends(get_session), current_user=Depends(get_current_user)):
+    user_uuid = current_user.uuid
     
-    # Fetch all lists with task counts and earliest due date
-    lists_with_counts = session.query(
-        list.List,
-        func.count(Task.uuid).label('total_tasks'),
-        func.sum(case((Task.done == True, 1), else_=0)).label('tasks_completed'),
-        func.min(Task.due_date).label('earliest_due_date')
+    # The index changes when a list is added, removed or written to, so its ETag
+    # covers the versions of every list the user can see
+    versions = (await session.exec(select(
+        list.List.uuid, list.List.version
     ).join(
         list_access.ListAccess, list.List.uuid == list_access.ListAccess.list_uuid
-    ).outerjoin(
-        Task, list.List.uuid == Task.list_uuid
-    ).filter(
+    ).where(
         list_access.ListAccess.owner_uuid == user_uuid
-    ).group_by(
+    ).order_by(
         list.List.uuid
+    ))).all()
+    if not_modified := conditional(request, response, weak_etag(*(tuple(row) for row in versions))):
+        return not_modified
+
+    # Fetch all lists with their precomputed task counts and earliest due date
+    rows = (await session.exec(select(
+        list.List, ListSummary
+    ).join(
+        list_access.ListAccess, list.List.uuid == list_access.ListAccess.list_uuid
+    ).outerjoin(
+        ListSummary, list.List.uuid == ListSummary.list_uuid
+    ).where(
+        list_access.ListAccess.owner_uuid == user_uuid
     ).order_by(
         list.List.created_at.desc()
-    ).all()
+    ))).all()
     
     # Return lists with details, task counts, and earliest due date
-    return [{
-        "uuid": str(row.List.uuid),
-        "created_at": row.List.created_at.isoformat(),
-        "title": row.List.title,
-        "description": row.List.description,
-        "total_tasks": row.total_tasks,
-        "tasks_completed": row.tasks_completed,
-        "earliest_due_date": row.earliest_due_date.isoformat() if row.earliest_due_date else None
-    } for row in lists_with_counts]
-
-@list_router.get("/{list_uuid}")
-def get_list(list_uuid: str, session: Session = Depends(get_session), current_user=Depends(get_current_user)):
-    user_uuid = uuid.UUID(current_user['uuid'])
+    return [list_details(row.List, row.ListSummary) for row in rows]
+
+@list_router.get("/{list_uuid}", response_model=ListDetailsOut)
+async def get_list(list_uuid: str, request: Request, response: Response, session: AsyncSession = Depends(get_session), current_user=Depends(get_current_user)):
+    user_uuid = current_user.uuid
     list_uuid_obj = uuid.UUID(list_uuid)
     
-    # Fetch single list with task counts and earliest due date
-    result = session.query(
-        list.List,
-        func.count(Task.uuid).label('total_tasks'),
-        func.sum(case((Task.done == True, 1), else_=0)).label('tasks_completed'),
-        func.min(Task.due_date).label('earliest_due_date')
+    version = (await session.exec(select(list.List.version).join(
+        list_access.ListAccess, list.List.uuid == list_access.ListAccess.list_uuid
+    ).where(
+        list.List.uuid == list_uuid_obj,
+        list_access.ListAccess.owner_uuid == user_uuid
+    ))).first()
+    if version is None:
+        raise HTTPException(status_code=404, detail="List not found")
+    if not_modified := conditional(request, response, weak_etag(list_uuid_obj, version)):
+        return not_modified
+
+    # Fetch single list with its precomputed task counts and earliest due date
+    result = (await session.exec(select(
+        list.List, ListSummary
     ).join(
         list_access.ListAccess, list.List.uuid == list_access.ListAccess.list_uuid
     ).outerjoin(
-        Task, list.List.uuid == Task.list_uuid
-    ).filter(
+        ListSummary, list.List.uuid == ListSummary.list_uuid
+    ).where(
         list.List.uuid == list_uuid_obj,
         list_access.ListAccess.owner_uuid == user_uuid
-    ).group_by(
-        list.List.uuid
-    ).first()
+    ))).first()
     
     # If list not found, raise 404
     if result is None:
         raise HTTPException(status_code=404, detail="List not found")
     
     # Return list with details, task counts, and earliest due date
-    return {
-        "uuid": str(result.List.uuid),
-        "created_at": result.List.created_at.isoformat(),
-        "title": result.List.title,
-        "description": result.List.description,
-        "total_tasks": result.total_tasks,
-        "tasks_completed": result.tasks_completed,
-        "earliest_due_date": result.earliest_due_date.isoformat() if result.earliest_due_date else None
-    }
-
-@list_router.put("/{list_uuid}")
-def update_list(list_uuid: str, reqBody: CreateListBody, session: Session = Depends(get_session), current_user=Depends(get_current_user)):
-    user_uuid = uuid.UUID(current_user['uuid'])
-    list_uuid_obj = uuid.UUID(list_uuid)
-    la = session.query(list_access.ListAccess).filter(list_access.ListAccess.list_uuid == list_uuid_obj, list_access.ListAccess.owner_uuid == user_uuid).first()
-    if not la:
-        raise HTTPException(status_code=404, detail="List not found")
-    l = session.query(list.List).filter(list.List.uuid == list_uuid_obj).first()
+    return list_details(result.List, result.ListSummary)
+
+@list_router.put("/{list_uuid}", response_model=ListOut)
+async def update_list(list_uuid: uuid.UUID, reqBody: CreateListBody, session: AsyncSession = Depends(get_session), current_user=Depends(require_list_access)):
+    l = await session.get(list.List, list_uuid)
     if not l:
         raise HTTPException(status_code=404, detail="List not found")
+    await touch_list(session, list_uuid, list_changed=True)
     l.title = reqBody.title
     l.description = reqBody.description
     session.add(l)
-    session.commit()
-    return {
-        "uuid": str(l.uuid),
-        "created_at": l.created_at.isoformat(),
-        "title": l.title,
-        "description": l.description,
-    }
+    await session.commit()
+    await publish_list_event(list_uuid, "list.updated", list=ListOut.model_validate(l).model_dump(mode="json"))
+    return l
 
 @list_router.delete("/{list_uuid}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_list(list_uuid: str, session: Session = Depends(get_session), current_user=Depends(get_current_user)):
-    user_uuid = uuid.UUID(current_user['uuid'])
-    list_uuid_obj = uuid.UUID(list_uuid)
+async def delete_list(list_uuid: uuid.UUID, session: AsyncSession = Depends(get_session), current_user=Depends(get_current_user)):
+    user_uuid = current_user.uuid
     
     # Check if the user has access to the list
-    la = session.query(list_access.ListAccess).filter(
-        list_access.ListAccess.list_uuid == list_uuid_obj,
+    la = (await session.exec(select(list_access.ListAccess).where(
+        list_access.ListAccess.list_uuid == list_uuid,
         list_access.ListAccess.owner_uuid == user_uuid
-    ).first()
+    ))).first()
     if not la:
         raise HTTPException(status_code=404, detail="List not found or access denied")
     
     # Get the list
-    l = session.query(list.List).filter(list.List.uuid == list_uuid_obj).first()
+    l = await session.get(list.List, list_uuid)
     if not l:
         raise HTTPException(status_code=404, detail="List not found")
     
-    # Delete the list and its access entry
-    session.delete(la)
-    session.delete(l)
-    session.commit()
+    # Everyone with access drops the list on their next sync
+    members = (await session.exec(select(list_access.ListAccess.owner_uuid).where(list_access.ListAccess.list_uuid == list_uuid))).all()
+    await add_tombstones(session, await next_revision(session), "list", list_uuid, [list_uuid], members)
+
+    # Hide the list from everyone now: every read goes through an access row.
+    # The tasks, however many, are left to the purge worker.
+    await session.exec(delete(list_access.ListAccess).where(list_access.ListAccess.list_uuid == list_uuid))
+    await session.exec(delete(ListSummary).where(ListSummary.list_uuid == list_uuid))
+    l.deleted_at = datetime.now()
+    session.add(l)
+    await session.commit()
+    await invalidate_list_access(list_uuid)
+    purge_worker.wake()
+    await publish_list_event(list_uuid, "list.deleted")
     
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
-@list_router.get("/{list_uuid}/access")
-def get_list_access(list_uuid: str, session: Session = Depends(get_session), current_user=Depends(get_current_user)):
-    user_uuid = uuid.UUID(current_user['uuid'])
-    list_uuid_obj = uuid.UUID(list_uuid)
-
-    la_current = session.query(list_access.ListAccess).filter(list_access.ListAccess.list_uuid == list_uuid_obj, list_access.ListAccess.owner_uuid == user_uuid).first()
-    if not la_current:
-        raise HTTPException(status_code=404, detail="List not found")
-
-    access_list = session.query(list_access.ListAccess).filter(list_access.ListAccess.list_uuid == list_uuid_obj).all()
-
-    users_access = []
-    for access in access_list:
-        user = session.query(User).filter(User.uuid == access.owner_uuid).first()
-        if user:
-            users_access.append({
-                "uuid": str(user.uuid),
-                "name": user.first_name + " " + user.last_name,
-                "email": user.email,
-            })
-
-    return users_access
+@list_router.get("/{list_uuid}/access", response_model=typing.List[ListAccessUserOut])
+async def get_list_access(list_uuid: uuid.UUID, session: AsyncSession = Depends(get_session), current_user=Depends(require_list_access)):
+    # One query for every member, however many people the list is shared with
+    return (await session.exec(select(
+        User.uuid,
+        (User.first_name + " " + User.last_name).label("name"),
+        User.email,
+    ).join(
+        list_access.ListAccess, list_access.ListAccess.owner_uuid == User.uuid
+    ).where(
+        list_access.ListAccess.list_uuid == list_uuid
+    ))).all()
 
 @list_router.put("/{list_uuid}/access/{email}")
-def add_list_access(list_uuid: str, email: str, session: Session = Depends(get_session), current_user=Depends(get_current_user)):
-    user_uuid = uuid.UUID(current_user['uuid'])
-    list_uuid_obj = uuid.UUID(list_uuid)
-
+async def add_list_access(list_uuid: uuid.UUID, email: str, session: AsyncSession = Depends(get_session), current_user=Depends(require_list_access)):
     # Find user by email
-    other_user = session.query(User).filter(User.email.ilike(email)).first()
+    other_user = (await session.exec(select(User).where(User.email_is(email)))).first()
     if not other_user:
         raise HTTPException(status_code=404, detail="User not found")
     other_user_uuid_obj = other_user.uuid
 
-    # Check if current_user has access to list_uuid
-    la_current = session.query(list_access.ListAccess).filter(
-        list_access.ListAccess.list_uuid == list_uuid_obj,
-        list_access.ListAccess.owner_uuid == user_uuid
-    ).first()
-    if not la_current:
-        raise HTTPException(status_code=404, detail="List not found")
-
     # Check if other_user already has access
-    la_other = session.query(list_access.ListAccess).filter(
-        list_access.ListAccess.list_uuid == list_uuid_obj,
+    la_other = (await session.exec(select(list_access.ListAccess).where(
+        list_access.ListAccess.list_uuid == list_uuid,
         list_access.ListAccess.owner_uuid == other_user_uuid_obj
-    ).first()
+    ))).first()
     if la_other:
         return {"message": "User already has access"}, status.HTTP_200_OK
 
     # Create new ListAccess
     new_la = list_access.ListAccess()
     new_la.uuid = uuid.uuid4()
-    new_la.list_uuid = list_uuid_obj
+    new_la.list_uuid = list_uuid
     new_la.owner_uuid = other_user_uuid_obj
+    new_la.revision = await touch_list(session, list_uuid, list_changed=True)
     session.add(new_la)
-    session.commit()
+    await session.commit()
+    await invalidate_list_access(list_uuid, other_user_uuid_obj)
+    await publish_list_event(list_uuid, "access.granted", user_uuid=str(other_user_uuid_obj))
 
     return {"message": "Access granted"}, status.HTTP_201_CREATED
 
 @list_router.delete("/{list_uuid}/access/{other_user_uuid}", status_code=status.HTTP_204_NO_CONTENT)
-def remove_list_access(list_uuid: str, other_user_uuid: str, session: Session = Depends(get_session), current_user=Depends(get_current_user)):
-    user_uuid = uuid.UUID(current_user['uuid'])
-    list_uuid_obj = uuid.UUID(list_uuid)
+async def remove_list_access(list_uuid: uuid.UUID, other_user_uuid: str, session: AsyncSession = Depends(get_session), current_user=Depends(require_list_access)):
     other_user_uuid_obj = uuid.UUID(other_user_uuid)
 
-    # Check if current_user has access to list_uuid
-    la_current = session.query(list_access.ListAccess).filter(list_access.ListAccess.list_uuid == list_uuid_obj, list_access.ListAccess.owner_uuid == user_uuid).first()
-    if not la_current:
-        raise HTTPException(status_code=404, detail="List not found")
-
     # Find ListAccess for other_user
-    la_other = session.query(list_access.ListAccess).filter(list_access.ListAccess.list_uuid == list_uuid_obj, list_access.ListAccess.owner_uuid == other_user_uuid_obj).first()
+    la_other = (await session.exec(select(list_access.ListAccess).where(list_access.ListAccess.list_uuid == list_uuid, list_access.ListAccess.owner_uuid == other_user_uuid_obj))).first()
     if not la_other:
         raise HTTPException(status_code=404, detail="User does not have access")
 
-    # Delete ListAccess
-    session.delete(la_other)
-    session.commit()
+    # Take the revision before the delete locks the access row (see utils/revision.py)
+    revision = await touch_list(session, list_uuid, list_changed=True)
+    await session.delete(la_other)
+    await add_tombstones(session, revision, "list", list_uuid, [list_uuid], [other_user_uuid_obj])
+    await session.commit()
+    await invalidate_list_access(list_uuid, other_user_uuid_obj)
+    await publish_list_event(list_uuid, "access.revoked", user_uuid=str(other_user_uuid_obj))
 
     # No return needed, will return 204
     
\ No newline at end of file
@@ -0,0 +1,31 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from ..database import pool_metrics
+from ..utils.events import broadcaster
+from ..utils.instrumentation import request_metrics
+from .middleware import list_access_cache, token_cache
+
+metrics_router = APIRouter()
+
+@metrics_router.get("/pool")
+async def get_pool_metrics():
+    # Checked-out connections, overflow in use and checkout wait times
+    return pool_metrics()
+
+@metrics_router.get("/caches")
+async def get_cache_metrics():
+    return {
+        "list_access": list_access_cache.stats(),
+        "token": token_cache.stats(),
+    }
+
+@metrics_router.get("/events")
+async def get_event_metrics():
+    # Open change-feed streams on this worker
+    return {"subscribers": broadcaster.subscriber_count()}
+
+@metrics_router.get("/requests", response_class=PlainTextResponse)
+async def get_request_metrics():
+    # Per-route latency, DB time, statement and row histograms, for Prometheus to scrape
+    return PlainTextResponse(request_metrics.render(), media_type="text/plain; version=0.0.4")
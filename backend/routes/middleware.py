@@ -1,23 +1,140 @@
-import os
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import time
+import uuid
 
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 import jwt
 
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = "HS256"
+from ..config import settings
+from ..database import get_session
+from ..models.list_access import ListAccess
+from ..utils.cache import TTLCache
+from ..utils.events import RESYNC, broadcaster
+from ..utils.token import TokenClaims, parse_jwt_token
+
+logger = logging.getLogger(__name__)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+# (user_uuid, list_uuid) -> whether the user may access the list. Every worker
+# has its own; changes are announced to the others on ACCESS_CHANNEL.
+list_access_cache = TTLCache(
+    max_entries=settings.access_cache_max_entries,
+    ttl_seconds=settings.access_cache_ttl_seconds,
+)
+
+# Broadcaster channel for access invalidations; list channels are uuids, so it cannot clash
+ACCESS_CHANNEL = "list-access"
+
+# Bumped on every invalidation, so a lookup that raced one does not cache what it read before it
+_access_generation = 0
+
+# sha256(token) -> TokenClaims, kept until the token expires. Clients resend
+# the same access token on every request, so most lookups skip jwt.decode.
+token_cache = TTLCache(
+    max_entries=settings.token_cache_max_entries,
+    ttl_seconds=0,
+)
+
+def verify_token(token: str) -> TokenClaims | None:
+    """The claims of a valid token, from token_cache when it has them. None for an invalid or expired one."""
+    key = hashlib.sha256(token.encode()).digest()
+    claims = token_cache.get(key)
+    if claims is not None:
+        return claims
     try:
-        secret_key = os.getenv("SECRET_KEY")
-        payload = jwt.decode(token, secret_key, algorithms=[ALGORITHM])
-        return payload
-    except jwt.PyJWTError:
-        raise credentials_exception
-    
+        claims = parse_jwt_token(token)
+    except (jwt.PyJWTError, KeyError, ValueError):
+        return None
+    token_cache.set(key, claims, ttl_seconds=claims.exp - time.time())
+    return claims
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> TokenClaims:
+    claims = verify_token(token)
+    if claims is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return claims
+
+async def has_list_access(session: AsyncSession, user_uuid: uuid.UUID, list_uuid: uuid.UUID) -> bool:
+    """Check whether a user has a ListAccess row for a list, consulting the cache first."""
+    key = (user_uuid, list_uuid)
+    allowed = list_access_cache.get(key)
+    if allowed is None:
+        generation = _access_generation
+        la = (await session.exec(select(ListAccess.uuid).where(ListAccess.list_uuid == list_uuid, ListAccess.owner_uuid == user_uuid))).first()
+        allowed = la is not None
+        if generation == _access_generation:
+            list_access_cache.set(key, allowed)
+    return allowed
+
+def forget_list_access(list_uuid: uuid.UUID | None = None, user_uuid: uuid.UUID | None = None):
+    """Drop this worker's cached decisions for one user on a list, everyone on a list, or everything."""
+    global _access_generation
+    _access_generation += 1
+    if list_uuid is None:
+        list_access_cache.delete_where(lambda key: True)
+    elif user_uuid is not None:
+        list_access_cache.delete((user_uuid, list_uuid))
+    else:
+        list_access_cache.delete_where(lambda key: key[1] == list_uuid)
+
+async def invalidate_list_access(list_uuid: uuid.UUID, user_uuid: uuid.UUID | None = None):
+    """Forget cached access decisions for one user on a list, or for everyone if no user is given, on every worker.
+
+    Call after the change commits.
+    """
+    forget_list_access(list_uuid, user_uuid)
+    await broadcaster.publish(ACCESS_CHANNEL, json.dumps({"list_uuid": str(list_uuid), "user_uuid": str(user_uuid) if user_uuid else None}))
+
+class AccessInvalidationListener:
+    """Background task applying the invalidations other workers publish to this worker's cache.
+
+    A resync, sent when the broadcaster may have lost messages, clears the
+    whole cache rather than trust entries a missed invalidation would have dropped.
+    """
+
+    def __init__(self):
+        self._task = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _run(self):
+        with broadcaster.subscribe(ACCESS_CHANNEL) as queue:
+            while True:
+                message = await queue.get()
+                if message == RESYNC:
+                    forget_list_access()
+                    continue
+                try:
+                    data = json.loads(message)
+                    forget_list_access(uuid.UUID(data["list_uuid"]), uuid.UUID(data["user_uuid"]) if data["user_uuid"] else None)
+                except (ValueError, KeyError, TypeError):
+                    logger.exception("Ignoring malformed access invalidation %r", message)
+                    forget_list_access()
+
+access_invalidations = AccessInvalidationListener()
+
+async def require_list_access(list_uuid: uuid.UUID, session: AsyncSession = Depends(get_session), current_user: TokenClaims = Depends(get_current_user)):
+    """Dependency that 404s unless the current user has access to the list in the path."""
+    if not await has_list_access(session, current_user.uuid, list_uuid):
+        raise HTTPException(status_code=404, detail="List not found")
+    return current_user
@@ -0,0 +1,67 @@
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from pydantic import BaseModel, ConfigDict
+
+# Response models shared by the routers. Handlers return ORM rows (or these
+# models) and FastAPI serializes them through pydantic-core in one pass, so
+# UUIDs and datetimes are never converted field by field in Python.
+
+class TaskOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    uuid: UUID
+    list_uuid: UUID
+    created_at: datetime
+    title: str
+    description: str
+    due_date: datetime
+    done: bool
+
+class ListOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    uuid: UUID
+    created_at: datetime
+    title: str
+    description: str
+
+class ListDetailsOut(ListOut):
+    total_tasks: int
+    tasks_completed: int
+    # Earliest due date among the list's open tasks
+    earliest_due_date: Optional[datetime]
+
+class ListAccessUserOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    uuid: UUID
+    name: str
+    email: str
+
+class SearchResultOut(BaseModel):
+    task: TaskOut
+    # Relevance, higher is better. Only comparable within one query's results.
+    rank: float
+
+class BatchResultOut(BaseModel):
+    op: str
+    status: int
+    uuid: Optional[UUID] = None
+    detail: Optional[str] = None
+    task: Optional[TaskOut] = None
+
+class BatchOut(BaseModel):
+    results: list[BatchResultOut]
+
+class SyncTaskOut(TaskOut):
+    revision: int
+
+class SyncListOut(ListOut):
+    revision: int
+
+class SyncOut(BaseModel):
+    revision: int
+    full: bool
+    lists: list[SyncListOut]
+    tasks: list[SyncTaskOut]
+    deleted_tasks: list[UUID]
+    deleted_lists: list[UUID]
@@ -0,0 +1,40 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..database import get_session
+from ..utils.pagination import decode_rank_cursor, encode_rank_cursor, take_page
+from ..utils.search import search_terms, search_tasks_statement
+from .middleware import get_current_user
+from .schemas import SearchResultOut
+from .task import MAX_PAGE_SIZE
+
+search_router = APIRouter()
+
+# Tasks matching every word of `q` in their title or description, across all
+# lists the caller can access, best match first. When more results remain, the
+# cursor for the next page is returned in the X-Next-Cursor header.
+@search_router.get("/", response_model=list[SearchResultOut])
+async def search_tasks(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_session),
+    current_user=Depends(get_current_user),
+):
+    after = None
+    if cursor is not None:
+        try:
+            after = decode_rank_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if not search_terms(q):
+        return []
+    dialect = session.get_bind().dialect.name
+    statement = search_tasks_statement(dialect, current_user.uuid, q, after)
+    rows = (await session.exec(statement.limit(limit + 1))).all()
+    rows = take_page(rows, limit, response, lambda row: encode_rank_cursor(row.rank, row[0].uuid))
+    return [{"task": task, "rank": rank} for task, rank in rows]
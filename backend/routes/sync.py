@@ -0,0 +1,73 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import and_, or_
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..database import get_session
+from ..models.list import List
+from ..models.list_access import ListAccess
+from ..models.revision import Revision
+from ..models.task import Task
+from ..models.tombstone import Tombstone
+from .middleware import get_current_user
+from .schemas import SyncOut
+
+sync_router = APIRouter()
+
+# Everything that changed after revision `since` in the lists the user can access.
+# Clients keep the returned revision and pass it back next time; since=0 (or a
+# revision older than the pruned tombstones, flagged with "full": true) returns
+# everything, and the client should replace its copy rather than merge.
+# Clients apply the deletions before the lists and tasks, since a list can be
+# removed from a user and shared with them again between two syncs.
+@sync_router.get("/", response_model=SyncOut)
+async def sync(since: int = Query(0, ge=0), session: AsyncSession = Depends(get_session), current_user=Depends(get_current_user)):
+    user_uuid = current_user.uuid
+
+    # Read the counter first: anything committed after this shows up again next time, never the reverse
+    counter = (await session.exec(select(Revision).where(Revision.id == 1))).one()
+    if since < counter.pruned_through:
+        since = 0
+
+    accessible = select(ListAccess.list_uuid).where(ListAccess.owner_uuid == user_uuid)
+    memberships = (await session.exec(select(ListAccess.list_uuid, ListAccess.revision).where(ListAccess.owner_uuid == user_uuid))).all()
+    # Lists shared with the user since their last sync are sent whole
+    new_lists = [list_uuid for list_uuid, granted in memberships if granted > since]
+
+    lists = (await session.exec(select(List).join(
+        ListAccess, List.uuid == ListAccess.list_uuid
+    ).where(
+        ListAccess.owner_uuid == user_uuid,
+        or_(List.revision > since, ListAccess.revision > since),
+    ))).all()
+
+    # Served by the (list_uuid, revision) index, one range per accessible list
+    tasks = (await session.exec(select(Task).join(
+        ListAccess, Task.list_uuid == ListAccess.list_uuid
+    ).where(
+        ListAccess.owner_uuid == user_uuid,
+        Task.revision > since,
+    ))).all()
+    if new_lists:
+        tasks += (await session.exec(select(Task).where(Task.list_uuid.in_(new_lists), Task.revision <= since))).all()
+
+    deleted_tasks, deleted_lists = [], []
+    if since:
+        tombstones = (await session.exec(select(Tombstone).where(
+            Tombstone.revision > since,
+            or_(
+                Tombstone.user_uuid == user_uuid,
+                and_(Tombstone.kind == "task", Tombstone.list_uuid.in_(accessible)),
+            ),
+        ))).all()
+        deleted_tasks = [t.entity_uuid for t in tombstones if t.kind == "task"]
+        deleted_lists = [t.entity_uuid for t in tombstones if t.kind == "list"]
+
+    return {
+        "revision": counter.value,
+        "full": since == 0,
+        "lists": lists,
+        "tasks": tasks,
+        "deleted_tasks": deleted_tasks,
+        "deleted_lists": deleted_lists,
+    }
@@ -1,13 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, status
-from sqlmodel import Session
-from pydantic import BaseModel
-from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import tuple_, insert, update, delete
+from pydantic import BaseModel, Field
+from typing import Annotated, Literal, Optional, Union
 from datetime import datetime
 import uuid
 from ..database import get_session
+from ..models.list import List
 from ..models.task import Task
-from ..models.list_access import ListAccess
-from .middleware import get_current_user
+from ..utils.etag import conditional, touch_list, weak_etag
+from ..utils.events import publish_list_event
+from ..utils.revision import add_tombstones
+from ..utils.pagination import encode_cursor, decode_cursor, take_page
+from ..utils.summary import apply_task_changes
+from .middleware import require_list_access
+from .schemas import BatchOut, TaskOut
 
 # Pydantic models for request bodies
 class CreateTaskBody(BaseModel):
@@ -22,19 +30,33 @@ class UpdateTaskBody(BaseModel):
     due_date: Optional[datetime] = None
     done: Optional[bool] = None
 
+# Operations accepted by the batch endpoint, discriminated by "op"
+class BatchCreateOp(CreateTaskBody):
+    op: Literal["create"]
+
+class BatchUpdateOp(UpdateTaskBody):
+    op: Literal["update"]
+    uuid: uuid.UUID
+
+class BatchDeleteOp(BaseModel):
+    op: Literal["delete"]
+    uuid: uuid.UUID
+
+# Largest number of operations accepted in one batch
+MAX_BATCH_SIZE = 1000
+
+class BatchTaskBody(BaseModel):
+    operations: list[Annotated[Union[BatchCreateOp, BatchUpdateOp, BatchDeleteOp], Field(discriminator="op")]] = Field(max_length=MAX_BATCH_SIZE)
+
+# Largest page a client may request from get_tasks
+MAX_PAGE_SIZE = 500
+
 # Define the router with prefix
 task_router = APIRouter()
 
 # Create a new task
-@task_router.post("/")
-def create_task(list_uuid: uuid.UUID, reqBody: CreateTaskBody, session: Session = Depends(get_session), current_user=Depends(get_current_user)):
-    user_uuid = uuid.UUID(current_user['uuid'])
-    
-    # Check if current user has access to the list
-    la = session.query(ListAccess).filter(ListAccess.list_uuid == list_uuid, ListAccess.owner_uuid == user_uuid).first()
-    if not la:
-        raise HTTPException(status_code=404, detail="List not found")
-    
+@task_router.post("/", response_model=TaskOut)
+async def create_task(list_uuid: uuid.UUID, reqBody: CreateTaskBody, session: AsyncSession = Depends(get_session), current_user=Depends(require_list_access)):
     # Create a new task
     new_task = Task()
     new_task.uuid = uuid.uuid4()
@@ -44,85 +66,82 @@ def create_task(list_uuid: uuid.UUID, reqBody: CreateTaskBody, session: Session
     new_task.description = reqBody.description
     new_task.due_date = reqBody.due_date
     new_task.done = reqBody.done
+    new_task.revision = await touch_list(session, list_uuid)
     
     session.add(new_task)
-    session.commit()
-    session.refresh(new_task)
+    await apply_task_changes(session, list_uuid, added=[(new_task.done, new_task.due_date)])
+    await session.commit()
     
     # Return the created task
-    return {
-        "uuid": str(new_task.uuid),
-        "list_uuid": str(new_task.list_uuid),
-        "created_at": new_task.created_at.isoformat(),
-        "title": new_task.title,
-        "description": new_task.description,
-        "due_date": new_task.due_date.isoformat(),
-        "done": new_task.done
-    }
-
-# Get all tasks for a list
-@task_router.get("/")
-def get_tasks(list_uuid: uuid.UUID, session: Session = Depends(get_session), current_user=Depends(get_current_user)):
-    user_uuid = uuid.UUID(current_user['uuid'])
-    
-    # Check if current user has access to the list
-    la = session.query(ListAccess).filter(ListAccess.list_uuid == list_uuid, ListAccess.owner_uuid == user_uuid).first()
-    if not la:
-        raise HTTPException(status_code=404, detail="List not found")
-    
-    # Get all tasks for this list
-    tasks = session.query(Task).filter(Task.list_uuid == list_uuid).order_by(Task.due_date).all()
+    await publish_list_event(list_uuid, "task.created", task=TaskOut.model_validate(new_task).model_dump(mode="json"))
+    return new_task
+
+# Get tasks for a list, optionally filtered and paginated by a (due_date, uuid) cursor.
+# Without a limit every matching task is returned. When a limit is given and more
+# tasks remain, the cursor for the next page is returned in the X-Next-Cursor header.
+@task_router.get("/", response_model=list[TaskOut])
+async def get_tasks(
+    list_uuid: uuid.UUID,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    done: Optional[bool] = None,
+    due_before: Optional[datetime] = None,
+    due_after: Optional[datetime] = None,
+    session: AsyncSession = Depends(get_session),
+    current_user=Depends(require_list_access),
+):
+    # The list's version covers every task in it, so an unchanged list skips the task query.
+    # The query string is part of the URL, so one ETag per version is enough.
+    version = (await session.exec(select(List.version).where(List.uuid == list_uuid))).first()
+    if not_modified := conditional(request, response, weak_etag(list_uuid, version)):
+        return not_modified
+
+    # Served by the (list_uuid, due_date, uuid) index as a single range scan
+    query = select(Task).where(Task.list_uuid == list_uuid)
+    if done is not None:
+        query = query.where(Task.done == done)
+    if due_before is not None:
+        query = query.where(Task.due_date < due_before)
+    if due_after is not None:
+        query = query.where(Task.due_date >= due_after)
+    if cursor is not None:
+        try:
+            cursor_due_date, cursor_uuid = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(tuple_(Task.due_date, Task.uuid) > tuple_(cursor_due_date, cursor_uuid))
+    query = query.order_by(Task.due_date, Task.uuid)
+
+    if limit is None:
+        tasks = (await session.exec(query)).all()
+    else:
+        tasks = (await session.exec(query.limit(limit + 1))).all()
+        tasks = take_page(tasks, limit, response, lambda task: encode_cursor(task.due_date, task.uuid))
     
     # Return list of tasks
-    return [{
-        "uuid": str(t.uuid),
-        "list_uuid": str(t.list_uuid),
-        "created_at": t.created_at.isoformat(),
-        "title": t.title,
-        "description": t.description,
-        "due_date": t.due_date.isoformat(),
-        "done": t.done
-    } for t in tasks]
+    return tasks
 
 # Get a single task
-@task_router.get("/{task_uuid}")
-def get_task(list_uuid: uuid.UUID, task_uuid: uuid.UUID, session: Session = Depends(get_session), current_user=Depends(get_current_user)):
-    user_uuid = uuid.UUID(current_user['uuid'])
-    
-    # Check if current user has access to the list
-    la = session.query(ListAccess).filter(ListAccess.list_uuid == list_uuid, ListAccess.owner_uuid == user_uuid).first()
-    if not la:
-        raise HTTPException(status_code=404, detail="List not found")
-    
+@task_router.get("/{task_uuid}", response_model=TaskOut)
+async def get_task(list_uuid: uuid.UUID, task_uuid: uuid.UUID, session: AsyncSession = Depends(get_session), current_user=Depends(require_list_access)):
     # Get the task
-    task = session.query(Task).filter(Task.uuid == task_uuid, Task.list_uuid == list_uuid).first()
+    task = (await session.exec(select(Task).where(Task.uuid == task_uuid, Task.list_uuid == list_uuid))).first()
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    return {
-        "uuid": str(task.uuid),
-        "list_uuid": str(task.list_uuid),
-        "created_at": task.created_at.isoformat(),
-        "title": task.title,
-        "description": task.description,
-        "due_date": task.due_date.isoformat(),
-        "done": task.done
-    }
+    return task
 
 # Update a task
-@task_router.put("/{task_uuid}")
-def update_task(list_uuid: uuid.UUID, task_uuid: uuid.UUID, reqBody: UpdateTaskBody, session: Session = Depends(get_session), current_user=Depends(get_current_user)):
-    user_uuid = uuid.UUID(current_user['uuid'])
-    
-    # Check if current user has access to the list
-    la = session.query(ListAccess).filter(ListAccess.list_uuid == list_uuid, ListAccess.owner_uuid == user_uuid).first()
-    if not la:
-        raise HTTPException(status_code=404, detail="List not found")
-    
+@task_router.put("/{task_uuid}", response_model=TaskOut)
+async def update_task(list_uuid: uuid.UUID, task_uuid: uuid.UUID, reqBody: UpdateTaskBody, session: AsyncSession = Depends(get_session), current_user=Depends(require_list_access)):
     # Get the task
-    task = session.query(Task).filter(Task.uuid == task_uuid, Task.list_uuid == list_uuid).first()
+    task = (await session.exec(select(Task).where(Task.uuid == task_uuid, Task.list_uuid == list_uuid))).first()
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
+    before = (task.done, task.due_date)
+    task.revision = await touch_list(session, list_uuid)
     
     # Update fields if provided
     if reqBody.title is not None:
@@ -134,36 +153,118 @@ def update_task(list_uuid: uuid.UUID, task_uuid: uuid.UUID, reqBody: UpdateTaskB
     if reqBody.done is not None:
         task.done = reqBody.done
     
-    session.commit()
-    session.refresh(task)
+    after = (task.done, task.due_date)
+    if after != before:
+        await apply_task_changes(session, list_uuid, removed=[before], added=[after])
+    await session.commit()
     
-    return {
-        "uuid": str(task.uuid),
-        "list_uuid": str(task.list_uuid),
-        "created_at": task.created_at.isoformat(),
-        "title": task.title,
-        "description": task.description,
-        "due_date": task.due_date.isoformat(),
-        "done": task.done
-    }
+    await publish_list_event(list_uuid, "task.updated", task=TaskOut.model_validate(task).model_dump(mode="json"))
+    return task
 
 # Delete a task
 @task_router.delete("/{task_uuid}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_task(list_uuid: uuid.UUID, task_uuid: uuid.UUID, session: Session = Depends(get_session), current_user=Depends(get_current_user)):
-    user_uuid = uuid.UUID(current_user['uuid'])
-    
-    # Check if current user has access to the list
-    la = session.query(ListAccess).filter(ListAccess.list_uuid == list_uuid, ListAccess.owner_uuid == user_uuid).first()
-    if not la:
-        raise HTTPException(status_code=404, detail="List not found")
-    
+async def delete_task(list_uuid: uuid.UUID, task_uuid: uuid.UUID, session: AsyncSession = Depends(get_session), current_user=Depends(require_list_access)):
     # Get the task
-    task = session.query(Task).filter(Task.uuid == task_uuid, Task.list_uuid == list_uuid).first()
+    task = (await session.exec(select(Task).where(Task.uuid == task_uuid, Task.list_uuid == list_uuid))).first()
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    # Delete the task
-    session.delete(task)
-    session.commit()
+    # Take the revision before the delete and the summary update lock their rows (see utils/revision.py)
+    revision = await touch_list(session, list_uuid)
+    await session.delete(task)
+    await apply_task_changes(session, list_uuid, removed=[(task.done, task.due_date)])
+    await add_tombstones(session, revision, "task", list_uuid, [task_uuid])
+    await session.commit()
+    await publish_list_event(list_uuid, "task.deleted", uuid=str(task_uuid))
     
     return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+# Apply many task creates, updates and deletes in one request and one transaction.
+# Creates are inserted first, then updates and deletes are applied, each as a single
+# bulk statement. The response holds one result per operation, in request order.
+@task_router.post("/batch", response_model=BatchOut, response_model_exclude_none=True)
+async def batch_tasks(list_uuid: uuid.UUID, reqBody: BatchTaskBody, session: AsyncSession = Depends(get_session), current_user=Depends(require_list_access)):
+    operations = reqBody.operations
+    results = [None] * len(operations)
+    now = datetime.now()
+
+    # Updates and deletes may only touch tasks that belong to this list
+    referenced = {op.uuid for op in operations if op.op != "create"}
+    # uuid -> (done, due_date) before the batch, and after it (None once deleted)
+    existing = {}
+    if referenced:
+        existing = {row.uuid: (row.done, row.due_date) for row in (await session.exec(
+            select(Task.uuid, Task.done, Task.due_date).where(Task.list_uuid == list_uuid, Task.uuid.in_(referenced))
+        )).all()}
+    final = dict(existing)
+
+    new_rows = []
+    update_rows = []
+    update_indexes = []
+    delete_uuids = set()
+    for i, op in enumerate(operations):
+        if op.op == "create":
+            row = {
+                "uuid": uuid.uuid4(),
+                "list_uuid": list_uuid,
+                "created_at": now,
+                "title": op.title,
+                "description": op.description,
+                "due_date": op.due_date,
+                "done": op.done,
+            }
+            new_rows.append(row)
+            results[i] = {"op": "create", "status": status.HTTP_201_CREATED, "task": TaskOut(**row)}
+        elif op.uuid not in existing:
+            results[i] = {"op": op.op, "uuid": op.uuid, "status": status.HTTP_404_NOT_FOUND, "detail": "Task not found"}
+        elif op.op == "update":
+            changes = op.model_dump(include={"title", "description", "due_date", "done"}, exclude_none=True)
+            if changes:
+                update_rows.append({"uuid": op.uuid, **changes})
+                if final[op.uuid] is not None:
+                    done, due_date = final[op.uuid]
+                    final[op.uuid] = (changes.get("done", done), changes.get("due_date", due_date))
+            update_indexes.append(i)
+            results[i] = {"op": "update", "uuid": op.uuid, "status": status.HTTP_200_OK}
+        else:
+            delete_uuids.add(op.uuid)
+            final[op.uuid] = None
+            results[i] = {"op": "delete", "uuid": op.uuid, "status": status.HTTP_204_NO_CONTENT}
+
+    if new_rows or update_rows or delete_uuids:
+        revision = await touch_list(session, list_uuid)
+        for row in new_rows + update_rows:
+            row["revision"] = revision
+        await add_tombstones(session, revision, "task", list_uuid, delete_uuids)
+    if new_rows:
+        await session.exec(insert(Task), params=new_rows)
+    if update_rows:
+        # ORM bulk UPDATE by primary key, grouped into executemany batches by column set
+        await session.exec(update(Task), params=update_rows)
+    if delete_uuids:
+        await session.exec(delete(Task).where(Task.list_uuid == list_uuid, Task.uuid.in_(delete_uuids)))
+    changed = [u for u in existing if final[u] != existing[u]]
+    await apply_task_changes(
+        session, list_uuid,
+        removed=[existing[u] for u in changed],
+        added=[(row["done"], row["due_date"]) for row in new_rows] + [final[u] for u in changed if final[u] is not None],
+    )
+    await session.commit()
+
+    # Return the final state of updated tasks, fetched in one query
+    updated_uuids = {operations[i].uuid for i in update_indexes} - delete_uuids
+    if updated_uuids:
+        updated = {t.uuid: t for t in (await session.exec(select(Task).where(Task.uuid.in_(updated_uuids)))).all()}
+        for i in update_indexes:
+            t = updated.get(operations[i].uuid)
+            if t is not None:
+                results[i]["task"] = TaskOut.model_validate(t)
+
+    if new_rows or update_rows or delete_uuids:
+        await publish_list_event(
+            list_uuid, "tasks.changed",
+            tasks=[r["task"].model_dump(mode="json") for r in results if "task" in r],
+            deleted=[str(u) for u in delete_uuids],
+        )
+
+    return {"results": results}
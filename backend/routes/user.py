@@ -3,14 +3,15 @@ import urllib.parse
 
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import RedirectResponse
-from sqlmodel import Session
-from ..models.user import User
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from ..models.user import User, normalize_email
 from ..database import get_session
 
 from ..utils.token import generate_registration_token, decrypt_registration_token, parse_jwt_token, generate_jwt_token
-from ..utils.email import send_confirmation_email
+from ..utils.email import outbox_worker, queue_confirmation_email
+from ..utils.password import hash_password, verify_password
 from pydantic import BaseModel
-import bcrypt
 import datetime
 import uuid
 import urllib
@@ -24,29 +25,30 @@ class CreateUserBody(BaseModel):
     last_name: str
 
 @user_router.post("/create")
-def create_user(reqBody: CreateUserBody, session: Session = Depends(get_session)):
+async def create_user(reqBody: CreateUserBody, session: AsyncSession = Depends(get_session)):
     # Check if the email is already in use
-    email: str = reqBody.email
-    rows = session.query(User).filter(User.email == email)
-    u = rows.first()
+    email: str = normalize_email(reqBody.email)
+    u = (await session.exec(select(User).where(User.email_is(email)))).first()
     if u:
         raise HTTPException(status_code=409, detail="email already in use")
 
     # Generate encrypted registration token
     regTokenCiphertext = generate_registration_token(
-        email=reqBody.email,
+        email=email,
         password=reqBody.password,
         first_name=reqBody.first_name,
         last_name=reqBody.last_name
     )
 
-    # Send confirmation email
-    send_confirmation_email(email, regTokenCiphertext)
+    # Queue the confirmation email; the outbox worker sends it after the commit
+    queue_confirmation_email(session, email, regTokenCiphertext)
+    await session.commit()
+    outbox_worker.wake()
 
     return {"message": "Confirmation email sent"}
 
 @user_router.get("/confirm/{regTokenCiphertext}")
-def confirm_user(regTokenCiphertext: str, session: Session = Depends(get_session)):
+async def confirm_user(regTokenCiphertext: str, session: AsyncSession = Depends(get_session)):
     # Decrypt the registration token
     try:
         regDetails = decrypt_registration_token(regTokenCiphertext)
@@ -55,14 +57,12 @@ def confirm_user(regTokenCiphertext: str, session: Session = Depends(get_session
 
     # Create the user
     user = User()
-    user.email = regDetails["email"]
+    user.email = normalize_email(regDetails["email"])
     user.first_name = regDetails["first_name"]
     user.last_name = regDetails["last_name"]
 
-    # Hash the password
-    plaintext_password = regDetails["password"].encode()
-    salt = bcrypt.gensalt()
-    user.password = bcrypt.hashpw(plaintext_password, salt).decode("utf-8")
+    # Hash the password in the worker pool, bcrypt is deliberately slow
+    user.password = await hash_password(regDetails["password"])
 
     # Set additional fields
     user.created_at = datetime.datetime.now()
@@ -70,7 +70,7 @@ def confirm_user(regTokenCiphertext: str, session: Session = Depends(get_session
 
     # Save to database
     session.add(user)
-    session.commit()
+    await session.commit()
 
     access_token = generate_jwt_token(user, timedelta(0, 60 * 15), "access")
     refresh_token = generate_jwt_token(user, timedelta(1), "refresh")
@@ -83,16 +83,16 @@ class LoginUserBody(BaseModel):
     password: str
 
 @user_router.post("/login")
-def login_user(req_body: LoginUserBody, session: Session = Depends(get_session)):
-    email: str = req_body.email
-    rows = session.query(User).filter(User.email == email)
-    user = rows.first()
+async def login_user(req_body: LoginUserBody, session: AsyncSession = Depends(get_session)):
+    user = (await session.exec(select(User).where(User.email_is(req_body.email)))).first()
     if not user:
         raise HTTPException(status_code=401, detail="bad credentials")
 
-    print(user)
+    # Hand the connection back before waiting on the password pool, so a burst
+    # of logins cannot tie up the whole connection pool
+    await session.close()
 
-    if not bcrypt.checkpw(req_body.password.encode(), user.password.encode()):
+    if not await verify_password(req_body.password, user.password):
         raise HTTPException(status_code=401, detail="bad credentials")
 
     access_token = generate_jwt_token(user, timedelta(0, 60 * 15), "access")
@@ -107,15 +107,14 @@ class RefreshAccessTokenBody(BaseModel):
     refresh_token: str
 
 @user_router.post("/refresh")
-def refresh(req_body: RefreshAccessTokenBody, session: Session = Depends(get_session)):
+async def refresh(req_body: RefreshAccessTokenBody, session: AsyncSession = Depends(get_session)):
     refresh_token_str = req_body.refresh_token
     refresh_token = parse_jwt_token(refresh_token_str)
     
     if refresh_token.token_type != "refresh":
         raise HTTPException(status_code=400, detail="bad token")
     
-    rows = session.query(User).filter(User.email == refresh_token.email)
-    user = rows.first()
+    user = (await session.exec(select(User).where(User.email_is(refresh_token.email)))).first()
     if not user:
         raise HTTPException(status_code=401, detail="unauthorized")
 
@@ -0,0 +1,78 @@
+"""Production server, run from the repository root:
+
+    python -m backend.serve
+
+Runs settings.web_workers uvicorn worker processes (one per CPU by default) on
+uvloop and httptools. With more than one, uvicorn's supervisor replaces any
+worker that dies or reaches its request limit.
+
+The schema is checked once, here, before any worker starts. Apply migrations
+first with `python -m backend.cli migrate`, or set SCHEMA_ON_STARTUP=migrate
+to have them applied here, once, rather than by every worker.
+
+`fastapi dev` stays the way to run the app while working on it.
+"""
+import logging
+import os
+
+import uvicorn
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def worker_count() -> int:
+    """settings.web_workers, or one per CPU this process is allowed to run on."""
+    if settings.web_workers > 0:
+        return settings.web_workers
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def prepare_schema():
+    from .database import get_engine
+    from .migrations import check_version, migrate
+
+    engine = get_engine()
+    if settings.schema_on_startup == "migrate":
+        migrate(engine)
+        # Done; the workers only check
+        os.environ["SCHEMA_ON_STARTUP"] = "check"
+    elif settings.schema_on_startup == "check":
+        with engine.connect() as conn:
+            check_version(conn)
+    engine.dispose()
+
+
+def main():
+    workers = worker_count()
+    if workers > 1 and settings.event_broadcaster == "memory":
+        logger.warning("EVENT_BROADCASTER=memory with %d workers: list events only reach clients on the same worker, "
+                       "and other workers keep using revoked shares for up to ACCESS_CACHE_TTL_SECONDS", workers)
+
+    # Fails here, once, rather than in every worker. The workers load their
+    # settings from the environment they inherit.
+    prepare_schema()
+
+    uvicorn.run(
+        f"{__package__}.main:app",
+        host=settings.web_host,
+        port=settings.web_port,
+        workers=workers,
+        loop="uvloop",
+        http="httptools",
+        # A single worker runs without the supervisor, so nothing would replace it
+        limit_max_requests=(settings.web_max_requests or None) if workers > 1 else None,
+        limit_max_requests_jitter=settings.web_max_requests_jitter,
+        timeout_graceful_shutdown=settings.web_graceful_timeout_seconds,
+        proxy_headers=True,
+        forwarded_allow_ips=settings.web_forwarded_allow_ips,
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,160 @@
+import os
+import tempfile
+
+# The app's own database, which startup migrates and the background workers
+# poll. Requests go to each test's database instead, through get_session.
+_app_database = tempfile.TemporaryDirectory()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_app_database.name}/app.db")
+os.environ.setdefault("SCHEMA_ON_STARTUP", "migrate")
+os.environ.setdefault("SECRET_KEY", "abcdef")
+# Tests make many requests from one client; test_ratelimit turns it back on
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import contextlib
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlmodel import create_engine, Session
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from ..main import app
+from ..config import settings
+from ..database import get_session, open_session, to_async_url
+from ..migrations import migrate
+from ..models.user import User
+from ..utils.instrumentation import current_request
+from ..utils.token import generate_jwt_token
+from datetime import timedelta
+import uuid
+import datetime
+
+# Create test engine (SQLite database file, so the sync and async engines share it)
+@pytest.fixture(scope="function")
+def test_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", echo=True)
+    migrate(engine, log=None)
+    yield engine
+    engine.dispose()
+
+# Session for inspecting the test database directly
+@pytest.fixture(scope="function")
+def session(test_engine):
+    with Session(test_engine) as session:
+        yield session
+
+# Run every API test against both the sync and the async database path
+@pytest.fixture(scope="function", params=["sync", "async"])
+def db_mode(request, monkeypatch):
+    monkeypatch.setattr(settings, "db_mode", request.param)
+    return request.param
+
+# Fixture for the app with test database
+@pytest.fixture(scope="function")
+def app_with_test_db(test_engine, db_mode):
+    if db_mode == "async":
+        # NullPool: connections must not outlive the TestClient's event loop
+        bind = create_async_engine(to_async_url(str(test_engine.url)), echo=True, poolclass=NullPool)
+    else:
+        bind = test_engine
+
+    async def override_get_session():
+        async with open_session(bind) as session:
+            yield session
+    app.dependency_overrides[get_session] = override_get_session
+    yield app
+    app.dependency_overrides.clear()
+
+# Count the SQL statements requests run inside a block, on any engine (sync or async):
+#
+#     with assert_max_queries(3):
+#         client.get(...)
+#
+# Fails with the statements listed when the block runs more than `limit`.
+# Background workers the app woke up in the meantime are not counted.
+@pytest.fixture(scope="function")
+def assert_max_queries():
+    @contextlib.contextmanager
+    def counting(limit):
+        statements = []
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if current_request.get() is not None:
+                statements.append(statement)
+        event.listen(Engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(Engine, "before_cursor_execute", record)
+        assert len(statements) <= limit, f"{len(statements)} queries, expected at most {limit}:\n" + "\n".join(statements)
+    return counting
+
+# Fixture for TestClient
+@pytest.fixture(scope="function")
+def client(app_with_test_db):
+    with TestClient(app_with_test_db) as client:
+        yield client
+
+# Fixture for test user
+@pytest.fixture(scope="function")
+def test_user(test_engine):
+    with Session(test_engine) as session:
+        user_uuid = uuid.uuid4()
+        user = User(
+            uuid=user_uuid,
+            email="test@example.com",
+            password="hashed_test_password",
+            first_name="Test",
+            last_name="User",
+            created_at=datetime.datetime.now()
+        )
+        session.add(user)
+        session.commit()
+        session.refresh(user)
+    return user
+
+# Fixture for another test user (for access control tests)
+@pytest.fixture(scope="function")
+def another_user(test_engine):
+    with Session(test_engine) as session:
+        another_uuid = uuid.uuid4()
+        another = User(
+            uuid=another_uuid,
+            email="another@example.com",
+            password="hashed_another_password",
+            first_name="Another",
+            last_name="User",
+            created_at=datetime.datetime.now()
+        )
+        session.add(another)
+        session.commit()
+        session.refresh(another)
+    return another
+
+@pytest.fixture(scope="function")
+def access_token(test_user):
+    token = generate_jwt_token(test_user, timedelta(days=1), "access")
+    return token
+
+@pytest.fixture(scope="function")
+def another_access_token(another_user):
+    token = generate_jwt_token(another_user, timedelta(days=1), "access")
+    return token
+
+# Helpers for tests that need lists and tasks made through the API:
+#
+#     from .conftest import create_list, create_task
+def create_list(client, headers, title="Tasks", description=""):
+    """Create a list as the user in `headers` and return its uuid."""
+    response = client.post("/api/list/create", json={"title": title, "description": description}, headers=headers)
+    assert response.status_code == 200
+    return response.json()["uuid"]
+
+def create_task(client, headers, list_uuid, title, due_date=datetime.datetime(2025, 1, 1), done=False, description=""):
+    """Create a task in a list and return it as the API does."""
+    response = client.post(
+        f"/api/list/{list_uuid}/task/",
+        json={"title": title, "description": description, "due_date": due_date.isoformat(), "done": done},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    return response.json()
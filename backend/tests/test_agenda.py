@@ -0,0 +1,69 @@
+from ..routes.agenda import agenda_statement
+from .conftest import create_list, create_task
+import datetime
+import uuid
+
+BASE = datetime.datetime(2025, 1, 1)
+
+def due(days):
+    return BASE + datetime.timedelta(days=days)
+
+def agenda(client, headers, **params):
+    response = client.get("/api/agenda/", params=params, headers=headers)
+    assert response.status_code == 200
+    return response
+
+# Test: Open tasks from own and shared lists, soonest first
+def test_agenda_across_accessible_lists(client, access_token, another_access_token, another_user):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    other_headers = {"Authorization": f"Bearer {another_access_token}"}
+    own_list = create_list(client, headers)
+    shared_list = create_list(client, other_headers)
+    private_list = create_list(client, other_headers)
+    client.put(f"/api/list/{shared_list}/access/test@example.com", headers=other_headers)
+
+    day3 = create_task(client, headers, own_list, "Due in 3", due(3))["uuid"]
+    day1 = create_task(client, other_headers, shared_list, "Due in 1", due(1))["uuid"]
+    overdue = create_task(client, headers, own_list, "Due in -2", due(-2))["uuid"]
+    create_task(client, headers, own_list, "Due in 2", due(2), done=True)
+    create_task(client, other_headers, private_list, "Due in 0", due(0))
+    day9 = create_task(client, other_headers, shared_list, "Due in 9", due(9))["uuid"]
+
+    assert [t["uuid"] for t in agenda(client, headers).json()] == [overdue, day1, day3, day9]
+    # Due this week, overdue included
+    week = agenda(client, headers, due_before=due(7).isoformat()).json()
+    assert [t["uuid"] for t in week] == [overdue, day1, day3]
+    window = agenda(client, headers, due_after=BASE.isoformat(), due_before=due(7).isoformat()).json()
+    assert [t["uuid"] for t in window] == [day1, day3]
+
+    # Completing a task takes it off the agenda
+    client.put(f"/api/list/{own_list}/task/{overdue}", json={"done": True}, headers=headers)
+    assert [t["uuid"] for t in agenda(client, headers).json()] == [day1, day3, day9]
+
+# Test: Walk the agenda with the keyset cursor
+def test_agenda_pagination(client, access_token):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    lists = [create_list(client, headers, f"List {i}") for i in range(3)]
+    # Tasks in different lists share due dates, so the uuid tiebreaker is exercised
+    expected = [create_task(client, headers, lists[i % 3], f"Due in {i // 2}", due(i // 2))["uuid"] for i in range(10)]
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3} if cursor is None else {"limit": 3, "cursor": cursor}
+        response = agenda(client, headers, **params)
+        seen += response.json()
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert sorted(t["uuid"] for t in seen) == sorted(expected)
+    keys = [(t["due_date"], t["uuid"]) for t in seen]
+    assert keys == sorted(keys)
+
+    assert client.get("/api/agenda/", params={"cursor": "nope"}, headers=headers).status_code == 400
+
+# Test: SQLite serves the agenda from the partial index
+def test_agenda_uses_partial_index(session):
+    statement = agenda_statement("sqlite", uuid.uuid4(), 51, BASE, due(7))
+    compiled = statement.compile(session.get_bind(), compile_kwargs={"literal_binds": True})
+    plan = " ".join(row[-1] for row in session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}"))
+    assert "ix_task_open_list_uuid_due_date" in plan
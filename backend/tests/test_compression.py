@@ -0,0 +1,97 @@
+from ..config import settings
+from ..utils.compression import CompressionMiddleware, negotiate
+import asyncio
+import brotli
+import datetime
+import gzip
+import pytest
+import zstandard
+
+
+def test_negotiate_prefers_zstd_then_brotli_then_gzip():
+    assert negotiate("gzip, deflate, br, zstd") == "zstd"
+    assert negotiate("gzip, deflate, br") == "br"
+    assert negotiate("gzip;q=1.0, br;q=0.5") == "gzip"
+    assert negotiate("deflate") is None
+    assert negotiate("zstd;q=0, *") == "br"
+    assert negotiate("identity") is None
+
+
+# Test: A large task list is compressed in the negotiated encoding; small bodies are not
+@pytest.mark.parametrize("encoding,decompress", [
+    ("zstd", lambda body: zstandard.ZstdDecompressor().decompressobj().decompress(body)),
+    ("br", brotli.decompress),
+    ("gzip", gzip.decompress),
+])
+def test_task_list_is_compressed(client, access_token, encoding, decompress):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    list_uuid = client.post("/api/list/create", json={"title": "Tasks", "description": ""}, headers=headers).json()["uuid"]
+    due = datetime.datetime(2025, 1, 1).isoformat()
+    client.post(f"/api/list/{list_uuid}/task/batch", json={"operations": [
+        {"op": "create", "title": f"Task {i}", "description": "Something to do", "due_date": due} for i in range(50)]}, headers=headers)
+
+    plain = client.get(f"/api/list/{list_uuid}/task/", headers=dict(headers, **{"Accept-Encoding": "identity"}))
+    assert "Content-Encoding" not in plain.headers
+    # A cache must not hand this to a client that asked for compression, nor the other way round
+    assert plain.headers["Vary"] == "Accept-Encoding"
+    with client.stream("GET", f"/api/list/{list_uuid}/task/", headers=dict(headers, **{"Accept-Encoding": encoding})) as response:
+        raw = b"".join(response.iter_raw())
+    assert response.headers["Content-Encoding"] == encoding
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert int(response.headers["Content-Length"]) == len(raw) < len(plain.content) / 4
+    assert decompress(raw) == plain.content
+    # The ETag names the content, whatever the encoding
+    assert response.headers["ETag"] == plain.headers["ETag"]
+
+    small = client.get("/", headers={"Accept-Encoding": encoding})
+    assert "Content-Encoding" not in small.headers
+    assert small.headers["Vary"] == "Accept-Encoding"
+
+
+def test_compression_can_be_disabled(client, monkeypatch):
+    monkeypatch.setattr(settings, "compression_min_size", 1)
+    assert client.get("/", headers={"Accept-Encoding": "gzip"}).headers["Content-Encoding"] == "gzip"
+    monkeypatch.setattr(settings, "compression_enabled", False)
+    assert "Content-Encoding" not in client.get("/", headers={"Accept-Encoding": "gzip"}).headers
+
+
+def run_streaming(content_type: str, chunks: list[bytes], accept_encoding: bytes | None = b"gzip") -> list[dict]:
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", content_type.encode())]})
+        for chunk in chunks:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    sent = []
+    async def send(message):
+        sent.append(message)
+    headers = [(b"accept-encoding", accept_encoding)] if accept_encoding is not None else []
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": headers}
+    asyncio.run(CompressionMiddleware(app)(scope, None, send))
+    return sent
+
+
+# Test: Streamed bodies are compressed as they go, event streams not at all
+def test_streams_are_compressed_incrementally():
+    chunks = [b"".join(b'{"uuid": "%032d", "title": "Task", "done": false}\n' % (i * 1000 + j) for j in range(1000)) for i in range(20)]
+    start, *bodies = run_streaming("application/x-ndjson", chunks)
+    assert dict(start["headers"])[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in dict(start["headers"])
+    # Output starts before the stream ends, rather than after buffering it all
+    assert len([body for body in bodies if body["body"] and body["more_body"]]) > 1
+    assert gzip.decompress(b"".join(body["body"] for body in bodies)) == b"".join(chunks)
+
+    events = [b"data: %d\n\n" % i * 100 for i in range(3)]
+    start, *bodies = run_streaming("text/event-stream", events)
+    assert b"content-encoding" not in dict(start["headers"])
+    assert b"vary" not in dict(start["headers"])
+    assert [body["body"] for body in bodies] == events + [b""]
+
+
+# Test: Responses that could have been compressed say so in Vary, even when the request did not ask
+def test_vary_without_accept_encoding():
+    start, *bodies = run_streaming("application/json", [b"{}"], accept_encoding=None)
+    assert dict(start["headers"])[b"vary"] == b"Accept-Encoding"
+    assert b"content-encoding" not in dict(start["headers"])
+    start, *bodies = run_streaming("image/png", [b"\x89PNG"], accept_encoding=None)
+    assert b"vary" not in dict(start["headers"])
@@ -0,0 +1,47 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError
+
+from ..config import settings
+from ..database import TimedQueuePool, engine_options, pool_stats, to_async_url
+
+
+def test_to_async_url():
+    assert to_async_url("postgresql://u:p@db:5432/todo") == "postgresql+asyncpg://u:p@db:5432/todo"
+    assert to_async_url("sqlite:///test.db") == "sqlite+aiosqlite:///test.db"
+
+
+def test_engine_options(monkeypatch):
+    monkeypatch.setattr(settings, "db_pool_size", 7)
+    monkeypatch.setattr(settings, "db_echo", False)
+    options = engine_options("postgresql://u:p@db/todo", TimedQueuePool)
+    assert options["pool_size"] == 7
+    assert options["poolclass"] is TimedQueuePool
+    assert options["pool_pre_ping"] is True
+    assert options["echo"] is False
+    # SQLite keeps its own pool, which does not accept QueuePool arguments
+    assert engine_options("sqlite://", TimedQueuePool) == {"echo": False}
+
+
+def test_timed_pool_records_waits_and_timeouts(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool,
+                           pool_size=1, max_overflow=0, pool_timeout=0.05)
+    before = pool_stats.snapshot()
+    with engine.connect() as conn:
+        conn.execute(text("select 1"))
+        # The only connection is checked out, so a second checkout times out
+        with pytest.raises(TimeoutError):
+            engine.connect()
+    after = pool_stats.snapshot()
+    assert after["checkouts"] == before["checkouts"] + 1
+    assert after["timeouts"] == before["timeouts"] + 1
+    assert after["wait_seconds_max"] >= 0.05
+    engine.dispose()
+
+
+def test_pool_metrics_endpoint(client):
+    response = client.get("/metrics/pool")
+    assert response.status_code == 200
+    data = response.json()
+    assert "pool_class" in data
+    assert "checkouts" in data
@@ -0,0 +1,122 @@
+from ..routes.events import event_stream
+from ..utils.events import MemoryBroadcaster, PostgresBroadcaster, RESYNC
+import asyncio
+import json
+
+def test_memory_broadcaster_fans_out_per_channel():
+    broadcaster = MemoryBroadcaster(queue_size=10)
+
+    async def run():
+        with broadcaster.subscribe("a") as first, broadcaster.subscribe("a") as second, broadcaster.subscribe("b") as other:
+            assert broadcaster.subscriber_count() == 3
+            await broadcaster.publish("a", "hello")
+            assert first.get_nowait() == second.get_nowait() == "hello"
+            assert other.empty()
+        assert broadcaster.subscriber_count() == 0
+        # Publishing with nobody listening is a no-op
+        await broadcaster.publish("a", "nobody")
+
+    asyncio.run(run())
+
+def test_slow_subscriber_gets_resync():
+    broadcaster = MemoryBroadcaster(queue_size=2)
+
+    async def run():
+        with broadcaster.subscribe("a") as queue:
+            for i in range(3):
+                await broadcaster.publish("a", str(i))
+            assert queue.get_nowait() == RESYNC
+            assert queue.empty()
+
+    asyncio.run(run())
+
+def test_event_stream_ends_when_access_is_revoked():
+    queue = asyncio.Queue()
+    for event in ({"type": "task.deleted", "uuid": "t"}, {"type": "access.revoked", "user_uuid": "other"},
+                  {"type": "access.revoked", "user_uuid": "me"}, {"type": "task.deleted", "uuid": "never"}):
+        queue.put_nowait(json.dumps(event))
+
+    async def collect():
+        return [chunk async for chunk in event_stream(queue, "me")]
+
+    chunks = asyncio.run(collect())
+    assert chunks[0].startswith("retry:")
+    assert [json.loads(c.removeprefix("data: "))["type"] for c in chunks[1:]] == ["task.deleted", "access.revoked", "access.revoked"]
+
+def test_list_events_requires_access(client, access_token, another_access_token):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    list_uuid = client.post("/api/list/create", json={"title": "List", "description": ""}, headers=headers).json()["uuid"]
+
+    assert client.get(f"/api/list/{list_uuid}/events/").status_code == 401
+    assert client.get(f"/api/list/{list_uuid}/events/", params={"access_token": "bad"}).status_code == 401
+    assert client.get(f"/api/list/{list_uuid}/events/", params={"access_token": another_access_token}).status_code == 404
+
+class FakeListenConnection:
+    def __init__(self):
+        self.channels = []
+        self.termination_listeners = []
+        self.closed = False
+
+    async def add_listener(self, channel, callback):
+        self.channels.append(channel)
+
+    def add_termination_listener(self, callback):
+        self.termination_listeners.append(callback)
+
+    def is_closed(self):
+        return self.closed
+
+    def terminate(self):
+        self.closed = True
+
+    async def close(self):
+        self.closed = True
+
+    async def fetchval(self, query):
+        if self.closed:
+            raise ConnectionError("connection is closed")
+        return 1
+
+class FakePool:
+    async def close(self):
+        pass
+
+# Test: A dropped LISTEN connection is reopened, and subscribers resync for what they missed
+def test_postgres_broadcaster_reconnects_and_resyncs(monkeypatch):
+    import asyncpg
+    connections, attempts = [], []
+
+    async def connect(dsn):
+        attempts.append(dsn)
+        # The database is still unreachable on the first attempt after the drop
+        if len(attempts) == 2:
+            raise OSError("connection refused")
+        connections.append(FakeListenConnection())
+        return connections[-1]
+
+    async def create_pool(dsn, **kwargs):
+        return FakePool()
+
+    monkeypatch.setattr(asyncpg, "connect", connect)
+    monkeypatch.setattr(asyncpg, "create_pool", create_pool)
+    monkeypatch.setattr(PostgresBroadcaster, "RECONNECT_MIN_SECONDS", 0.01)
+    broadcaster = PostgresBroadcaster("postgresql://user:pw@db/app", queue_size=10, health_check_seconds=0.05)
+
+    async def run():
+        await broadcaster.start()
+        with broadcaster.subscribe("a") as queue:
+            first = connections[0]
+            first.closed = True
+            for callback in first.termination_listeners:
+                callback(first)
+            assert await asyncio.wait_for(queue.get(), 1) == RESYNC
+            assert len(attempts) == 3 and connections[1].channels == [PostgresBroadcaster.PG_CHANNEL]
+
+            # A connection that died without telling anyone is found by the health check
+            connections[1].closed = True
+            assert await asyncio.wait_for(queue.get(), 1) == RESYNC
+            assert len(connections) == 3
+        await broadcaster.stop()
+        assert connections[2].closed
+
+    asyncio.run(run())
@@ -0,0 +1,118 @@
+from ..config import settings
+from ..utils import instrumentation
+from ..utils.instrumentation import Histogram, InstrumentationMiddleware, RequestMetrics, request_metrics
+from ..utils.profiling import StackSampler
+import asyncio
+import datetime
+import re
+import time
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("x_seconds", "Test.", (0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(("GET", "/a"), value)
+    assert histogram.render(("method", "route"))[2:] == [
+        'x_seconds_bucket{method="GET",route="/a",le="0.1"} 2',
+        'x_seconds_bucket{method="GET",route="/a",le="1.0"} 3',
+        'x_seconds_bucket{method="GET",route="/a",le="+Inf"} 4',
+        'x_seconds_sum{method="GET",route="/a"} 3.65',
+        'x_seconds_count{method="GET",route="/a"} 4',
+    ]
+
+
+def test_server_timing_and_route_metrics(client, access_token):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    list_uuid = client.post("/api/list/create", json={"title": "Tasks", "description": ""}, headers=headers).json()["uuid"]
+    due = datetime.datetime(2025, 1, 1).isoformat()
+    for i in range(3):
+        client.post(f"/api/list/{list_uuid}/task/", json={"title": f"Task {i}", "description": "", "due_date": due, "done": False}, headers=headers)
+
+    response = client.get(f"/api/list/{list_uuid}/task/", headers=headers)
+    assert response.status_code == 200
+    db = re.match(r'db;dur=[\d.]+;desc="(\d+) statements, (\d+) rows", app;dur=[\d.]+$', response.headers["Server-Timing"])
+    assert db is not None
+    # The list version for the ETag (one row) and the three tasks; the access check is cached
+    assert (int(db.group(1)), int(db.group(2))) == (2, 4)
+
+    text = client.get("/metrics/requests").text
+    # One series per route template, not per list
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/list/{list_uuid}/task/"}' in text
+    assert 'http_responses_total{method="GET",route="/api/list/{list_uuid}/task/",status="200"}' in text
+    assert list_uuid not in text
+    assert re.search(r'http_request_db_rows_sum\{method="GET",route="/api/list/\{list_uuid\}/task/"\} [1-9]', text)
+
+
+def test_unmatched_paths_share_one_series(client):
+    client.get("/no/such/path")
+    assert ("GET", "unmatched", "404") in request_metrics.responses
+
+
+def test_server_timing_header_can_be_disabled(client, monkeypatch):
+    monkeypatch.setattr(settings, "server_timing_header", False)
+    assert "Server-Timing" not in client.get("/").headers
+
+
+# Test: Event streams are counted, but neither timed nor profiled
+def test_event_streams_are_not_timed(monkeypatch):
+    dumped = []
+
+    class RecordingSampler:
+        running = True
+
+        def dump(self, label, *args):
+            dumped.append(label)
+
+    monkeypatch.setattr(instrumentation, "sampler", RecordingSampler())
+    monkeypatch.setattr(settings, "profiler_threshold_ms", 0)
+
+    def app(content_type):
+        async def respond(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", content_type)]})
+            await send({"type": "http.response.body", "body": b"data: {}\n\n"})
+        return respond
+
+    metrics = RequestMetrics()
+    for content_type in (b"text/event-stream; charset=utf-8", b"application/json"):
+        sent = []
+        async def send(message):
+            sent.append(message)
+        scope = {"type": "http", "method": "GET", "path": "/", "headers": []}
+        asyncio.run(InstrumentationMiddleware(app(content_type), metrics)(scope, None, send))
+        assert (b"server-timing" in dict(sent[0]["headers"])) == (content_type == b"application/json")
+
+    assert metrics.responses == {("GET", "unmatched", "200"): 2}
+    assert 'http_request_duration_seconds_count{method="GET",route="unmatched"} 1' in metrics.render()
+    assert dumped == ["GET unmatched"]
+
+
+def test_sampler_dumps_only_the_slow_requests_stacks(tmp_path):
+    sampler = StackSampler()
+
+    def busy(seconds):
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            pass
+
+    async def slow_request():
+        busy(0.2)
+
+    async def other_request():
+        busy(0.2)
+
+    async def main():
+        sampler.start(0.005, tmp_path)
+        try:
+            task = asyncio.create_task(slow_request())
+            start = time.perf_counter()
+            await task
+            await asyncio.create_task(other_request())
+            return sampler.dump("GET /slow", task, start, time.perf_counter() - start)
+        finally:
+            sampler.stop()
+
+    path = asyncio.run(main())
+    folded = path.read_text()
+    assert "slow_request" in folded
+    assert "other_request" not in folded
+    assert all(re.match(r".+ \d+$", line) for line in folded.splitlines())
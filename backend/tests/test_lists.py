@@ -1,108 +1,39 @@
-import pytest
-from fastapi.testclient import TestClient
-from sqlmodel import create_engine, Session, SQLModel
-from ..main import app
-from ..database import get_session
-from ..models.user import User
+from sqlalchemy import delete, func
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from .. import cli
+from ..database import to_async_url
 from ..models.list import List
 from ..models.list_access import ListAccess
-from ..utils.token import generate_jwt_token
-from datetime import timedelta
+from ..models.list_summary import ListSummary
+from ..models.task import Task
+from ..models.user import User
+from ..routes.middleware import ACCESS_CHANNEL, AccessInvalidationListener, list_access_cache
+from ..utils.events import RESYNC, broadcaster
+from ..utils.purge import purge_chunk
+import asyncio
+import datetime
+import json
 import os
 import uuid
-import datetime
 
 # Set SECRET_KEY for testing
 os.environ["SECRET_KEY"] = "abcdef"
 
-# Create test engine (in-memory SQLite database)
-@pytest.fixture(scope="session")
-def test_engine():
-    engine = create_engine("sqlite:///:memory:", echo=True)
-    SQLModel.metadata.create_all(engine)
-    yield engine
-    engine.dispose()
-
-# Override get_session dependency for testing
-@pytest.fixture(scope="function")
-def session(test_engine):
-    with Session(test_engine) as session:
-        yield session
-
-# Fixture for the app with test database
-@pytest.fixture(scope="session")
-def app_with_test_db(test_engine):
-    def override_get_session():
-        with Session(test_engine) as session:
-            yield session
-    app.dependency_overrides[get_session] = override_get_session
-    yield app
-    app.dependency_overrides.clear()
-
-# Fixture for TestClient
-@pytest.fixture(scope="session")
-def client(app_with_test_db):
-    with TestClient(app_with_test_db) as client:
-        yield client
-
-# Fixture for test user
-@pytest.fixture(scope="session")
-def test_user(test_engine):
-    with Session(test_engine) as session:
-        user_uuid = uuid.uuid4()
-        user = User(
-            uuid=user_uuid,
-            email="test@example.com",
-            password="hashed_test_password",
-            first_name="Test",
-            last_name="User",
-            created_at=datetime.datetime.now()
-        )
-        session.add(user)
-        session.commit()
-        session.refresh(user)
-    return user
-
-# Fixture for another test user (for access control tests)
-@pytest.fixture(scope="session")
-def another_user(test_engine):
-    with Session(test_engine) as session:
-        another_uuid = uuid.uuid4()
-        another = User(
-            uuid=another_uuid,
-            email="another@example.com",
-            password="hashed_another_password",
-            first_name="Another",
-            last_name="User",
-            created_at=datetime.datetime.now()
-        )
-        session.add(another)
-        session.commit()
-        session.refresh(another)
-    return another
-
-@pytest.fixture(scope="session")
-def access_token(test_user):
-    token = generate_jwt_token(test_user, timedelta(days=1), "access")
-    return token.encode('utf-8')
-
-@pytest.fixture(scope="session")
-def another_access_token(another_user):
-    token = generate_jwt_token(another_user, timedelta(days=1), "access")
-    return token.encode('utf-8')
-
 # Test: Create List
-def test_create_list(client, access_token, session, test_user):
+def test_create_list(client, access_token, session, test_user, assert_max_queries):
     
     list_data = {
         "title": "Test List",
         "description": "This is a test list"
     }
-    response = client.post(
-        "/list/create",
-        json=list_data,
-        headers={"Authorization": f"Bearer {access_token}"}
-    )
+    with assert_max_queries(4):
+        response = client.post(
+            "/api/list/create",
+            json=list_data,
+            headers={"Authorization": f"Bearer {access_token}"}
+        )
     assert response.status_code == 200
     data = response.json()
     assert "uuid" in data
@@ -114,22 +45,23 @@ def test_create_list(client, access_token, session, test_user):
     assert la is not None
 
 # Test: Get All Lists
-def test_get_lists(client, access_token, session, test_user):    
+def test_get_lists(client, access_token, session, test_user, assert_max_queries):
     print(f"ACCESS_TOKEN -> {access_token}")
     
     # Create two lists
     list1_data = {"title": "List 1", "description": "Desc 1"}
-    response1 = client.post("/list/create", json=list1_data, headers={"Authorization": f"Bearer {access_token}"})
+    response1 = client.post("/api/list/create", json=list1_data, headers={"Authorization": f"Bearer {access_token}"})
     assert response1.status_code == 200
     list1_uuid = response1.json()["uuid"]
 
     list2_data = {"title": "List 2", "description": "Desc 2"}
-    response2 = client.post("/list/create", json=list2_data, headers={"Authorization": f"Bearer {access_token}"})
+    response2 = client.post("/api/list/create", json=list2_data, headers={"Authorization": f"Bearer {access_token}"})
     assert response2.status_code == 200
     list2_uuid = response2.json()["uuid"]
 
     # Get all lists
-    response = client.get("/list", headers={"Authorization": f"Bearer {access_token}"})
+    with assert_max_queries(2):
+        response = client.get("/api/list", headers={"Authorization": f"Bearer {access_token}"})
     assert response.status_code == 200
     data = response.json()
     assert len(data) == 2
@@ -138,15 +70,16 @@ def test_get_lists(client, access_token, session, test_user):
     assert list2_uuid in uuids
 
 # Test: Get Single List
-def test_get_list(client, access_token, another_access_token, session, test_user, another_user):
+def test_get_list(client, access_token, another_access_token, session, test_user, another_user, assert_max_queries):
     # Create a list with first user
     list_data = {"title": "Test List", "description": "Desc"}
-    response_create = client.post("/list/create", json=list_data, headers={"Authorization": f"Bearer {access_token}"})
+    response_create = client.post("/api/list/create", json=list_data, headers={"Authorization": f"Bearer {access_token}"})
     assert response_create.status_code == 200
     list_uuid = response_create.json()["uuid"]
 
     # Get the list with first user
-    response = client.get(f"/list/{list_uuid}", headers={"Authorization": f"Bearer {access_token}"})
+    with assert_max_queries(2):
+        response = client.get(f"/api/list/{list_uuid}", headers={"Authorization": f"Bearer {access_token}"})
     assert response.status_code == 200
     data = response.json()
     assert data["uuid"] == list_uuid
@@ -154,24 +87,25 @@ def test_get_list(client, access_token, another_access_token, session, test_user
     assert data["description"] == "Desc"
 
     # Try to get the list with second user (should fail)
-    response_another = client.get(f"/list/{list_uuid}", headers={"Authorization": f"Bearer {another_access_token}"})
+    response_another = client.get(f"/api/list/{list_uuid}", headers={"Authorization": f"Bearer {another_access_token}"})
     assert response_another.status_code == 404
 
     # Test getting a non-existent list
-    response_nonexistent = client.get("/list/99999999-9999-9999-9999-999999999999", headers={"Authorization": f"Bearer {access_token}"})
+    response_nonexistent = client.get("/api/list/99999999-9999-9999-9999-999999999999", headers={"Authorization": f"Bearer {access_token}"})
     assert response_nonexistent.status_code == 404
 
 # Test: Update List
-def test_update_list(client, access_token, another_access_token, session, test_user, another_user):
+def test_update_list(client, access_token, another_access_token, session, test_user, another_user, assert_max_queries):
     # Create a list with first user
     list_data = {"title": "Original Title", "description": "Original Desc"}
-    response_create = client.post("/list/create", json=list_data, headers={"Authorization": f"Bearer {access_token}"})
+    response_create = client.post("/api/list/create", json=list_data, headers={"Authorization": f"Bearer {access_token}"})
     assert response_create.status_code == 200
     list_uuid = response_create.json()["uuid"]
 
     # Update the list with first user
     update_data = {"title": "Updated Title", "description": "Updated Desc"}
-    response_update = client.put(f"/list/{list_uuid}", json=update_data, headers={"Authorization": f"Bearer {access_token}"})
+    with assert_max_queries(5):
+        response_update = client.put(f"/api/list/{list_uuid}", json=update_data, headers={"Authorization": f"Bearer {access_token}"})
     assert response_update.status_code == 200
     data = response_update.json()
     assert data["title"] == "Updated Title"
@@ -183,33 +117,181 @@ def test_update_list(client, access_token, another_access_token, session, test_u
     assert l.description == "Updated Desc"
 
     # Try to update the list with second user (should fail)
-    response_another = client.put(f"/list/{list_uuid}", json=update_data, headers={"Authorization": f"Bearer {another_access_token}"})
+    response_another = client.put(f"/api/list/{list_uuid}", json=update_data, headers={"Authorization": f"Bearer {another_access_token}"})
     assert response_another.status_code == 404
 
     # Test updating a non-existent list
-    response_nonexistent = client.put("/list/99999999-9999-9999-9999-999999999999", json=update_data, headers={"Authorization": f"Bearer {access_token}"})
+    response_nonexistent = client.put("/api/list/99999999-9999-9999-9999-999999999999", json=update_data, headers={"Authorization": f"Bearer {access_token}"})
     assert response_nonexistent.status_code == 404
 
 # Test: Delete List
-def test_delete_list(client, access_token, another_access_token, session, test_user, another_user):
+def test_delete_list(client, access_token, another_access_token, session, test_user, another_user, assert_max_queries):
     # Create a list with first user
     list_data = {"title": "To Delete", "description": "Will be deleted"}
-    response_create = client.post("/list/create", json=list_data, headers={"Authorization": f"Bearer {access_token}"})
+    response_create = client.post("/api/list/create", json=list_data, headers={"Authorization": f"Bearer {access_token}"})
     assert response_create.status_code == 200
     list_uuid = response_create.json()["uuid"]
 
     # Delete the list with first user
-    response_delete = client.delete(f"/list/{list_uuid}", headers={"Authorization": f"Bearer {access_token}"})
+    with assert_max_queries(8):
+        response_delete = client.delete(f"/api/list/{list_uuid}", headers={"Authorization": f"Bearer {access_token}"})
     assert response_delete.status_code == 204
 
     # Check if the list is deleted
-    response_get = client.get(f"/list/{list_uuid}", headers={"Authorization": f"Bearer {access_token}"})
+    response_get = client.get(f"/api/list/{list_uuid}", headers={"Authorization": f"Bearer {access_token}"})
     assert response_get.status_code == 404
 
     # Try to delete the list with second user (should fail)
-    response_another = client.delete(f"/list/{list_uuid}", headers={"Authorization": f"Bearer {another_access_token}"})
+    response_another = client.delete(f"/api/list/{list_uuid}", headers={"Authorization": f"Bearer {another_access_token}"})
     assert response_another.status_code == 404
 
     # Test deleting a non-existent list
-    response_nonexistent = client.delete("/list/99999999-9999-9999-9999-999999999999", headers={"Authorization": f"Bearer {access_token}"})
+    response_nonexistent = client.delete("/api/list/99999999-9999-9999-9999-999999999999", headers={"Authorization": f"Bearer {access_token}"})
     assert response_nonexistent.status_code == 404
+
+# Test: List access decisions are cached and invalidated on share changes
+def test_list_access_cache(client, access_token, another_access_token, test_user, another_user, assert_max_queries):
+    list_access_cache.clear()
+    headers = {"Authorization": f"Bearer {access_token}"}
+    another_headers = {"Authorization": f"Bearer {another_access_token}"}
+
+    response_create = client.post("/api/list/create", json={"title": "Shared", "description": "Desc"}, headers=headers)
+    assert response_create.status_code == 200
+    list_uuid = response_create.json()["uuid"]
+
+    # Repeated reads hit the cache after the first lookup
+    for _ in range(3):
+        assert client.get(f"/api/list/{list_uuid}/task/", headers=headers).status_code == 200
+    stats = list_access_cache.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 2
+
+    # The other user is denied, and that decision is cached too
+    assert client.get(f"/api/list/{list_uuid}/task/", headers=another_headers).status_code == 404
+
+    # Granting access invalidates the cached denial
+    with assert_max_queries(5):
+        response_share = client.put(f"/api/list/{list_uuid}/access/{another_user.email}", headers=headers)
+    assert response_share.status_code == 200
+    assert client.get(f"/api/list/{list_uuid}/task/", headers=another_headers).status_code == 200
+
+    # Revoking access invalidates the cached grant
+    with assert_max_queries(5):
+        response_revoke = client.delete(f"/api/list/{list_uuid}/access/{another_user.uuid}", headers=headers)
+    assert response_revoke.status_code == 204
+    assert client.get(f"/api/list/{list_uuid}/task/", headers=another_headers).status_code == 404
+
+    # Deleting the list invalidates every cached grant for it
+    assert client.delete(f"/api/list/{list_uuid}", headers=headers).status_code == 204
+    assert client.get(f"/api/list/{list_uuid}/task/", headers=headers).status_code == 404
+
+# Test: Access changes made on another worker reach this worker's cache
+def test_list_access_cache_follows_other_workers():
+    list_access_cache.clear()
+    alice, bob, list_uuid, other_list = uuid.uuid4(), uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    listener = AccessInvalidationListener()
+
+    async def run():
+        await listener.start()
+        await asyncio.sleep(0)
+        for key in ((alice, list_uuid), (bob, list_uuid), (alice, other_list)):
+            list_access_cache.set(key, True)
+        # What the broadcaster delivers when another worker revokes bob's share
+        await broadcaster.publish(ACCESS_CHANNEL, json.dumps({"list_uuid": str(list_uuid), "user_uuid": str(bob)}))
+        await asyncio.sleep(0)
+        assert list_access_cache.get((bob, list_uuid)) is None
+        assert list_access_cache.get((alice, list_uuid)) is True
+        # ... deletes the list
+        await broadcaster.publish(ACCESS_CHANNEL, json.dumps({"list_uuid": str(list_uuid), "user_uuid": None}))
+        await asyncio.sleep(0)
+        assert list_access_cache.get((alice, list_uuid)) is None
+        assert list_access_cache.get((alice, other_list)) is True
+        # Invalidations may have been lost: nothing cached is trusted
+        await broadcaster.publish(ACCESS_CHANNEL, RESYNC)
+        await asyncio.sleep(0)
+        assert list_access_cache.stats()["entries"] == 0
+        await listener.stop()
+
+    asyncio.run(run())
+
+# Test: The access listing costs the same number of queries however many members a list has
+def test_get_list_access(client, access_token, session, test_user, assert_max_queries):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    response_create = client.post("/api/list/create", json={"title": "Shared", "description": "Desc"}, headers=headers)
+    assert response_create.status_code == 200
+    list_uuid = response_create.json()["uuid"]
+
+    for i in range(25):
+        member = User(uuid=uuid.uuid4(), email=f"member{i}@example.com", password="hashed", first_name="Member", last_name=str(i), created_at=datetime.datetime.now())
+        session.add(member)
+        session.add(ListAccess(uuid=uuid.uuid4(), list_uuid=uuid.UUID(list_uuid), owner_uuid=member.uuid))
+    session.commit()
+
+    list_access_cache.clear()
+    # One query for the access check, one for the members
+    with assert_max_queries(2):
+        response = client.get(f"/api/list/{list_uuid}/access", headers=headers)
+    assert response.status_code == 200
+    members = {item["email"]: item for item in response.json()}
+    assert len(members) == 26
+    assert members["test@example.com"] == {"uuid": str(test_user.uuid), "name": "Test User", "email": "test@example.com"}
+    assert members["member7@example.com"]["name"] == "Member 7"
+
+def purge(test_engine, chunk_size):
+    async def run():
+        engine = create_async_engine(to_async_url(str(test_engine.url)))
+        chunks = 0
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            while await purge_chunk(session, chunk_size):
+                chunks += 1
+        await engine.dispose()
+        return chunks
+    return asyncio.run(run())
+
+def count_rows(session, model, list_uuid):
+    return session.exec(select(func.count()).select_from(model).where(model.list_uuid == list_uuid)).one()
+
+# Test: Deleting a list hides it from every member at once, and the purge removes the rest in chunks
+def test_delete_list_purges_in_chunks(client, access_token, another_access_token, another_user, test_engine, session):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    another_headers = {"Authorization": f"Bearer {another_access_token}"}
+    list_uuid = client.post("/api/list/create", json={"title": "Big", "description": ""}, headers=headers).json()["uuid"]
+    client.put(f"/api/list/{list_uuid}/access/another@example.com", headers=headers)
+    due = datetime.datetime(2025, 1, 1).isoformat()
+    for i in range(5):
+        client.post(f"/api/list/{list_uuid}/task/", json={"title": f"Task {i}", "description": "", "due_date": due}, headers=headers)
+
+    assert client.delete(f"/api/list/{list_uuid}", headers=headers).status_code == 204
+    for h in (headers, another_headers):
+        assert client.get(f"/api/list/{list_uuid}", headers=h).status_code == 404
+        assert client.get(f"/api/list/{list_uuid}/task/", headers=h).status_code == 404
+        assert client.get("/api/list/", headers=h).json() == []
+
+    list_uuid = uuid.UUID(list_uuid)
+    assert count_rows(session, ListAccess, list_uuid) == 0
+    assert count_rows(session, Task, list_uuid) == 5
+    assert session.get(List, list_uuid).deleted_at is not None
+
+    # Two tasks per chunk: three task chunks, then the list row
+    assert purge(test_engine, chunk_size=2) == 4
+    session.expire_all()
+    assert count_rows(session, Task, list_uuid) == 0
+    assert session.get(List, list_uuid) is None
+    assert purge(test_engine, chunk_size=2) == 0
+
+# Test: The sweep removes rows of lists hard-deleted before deletes were soft
+def test_purge_orphans(client, access_token, test_engine, session, monkeypatch):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    kept = client.post("/api/list/create", json={"title": "Kept", "description": ""}, headers=headers).json()["uuid"]
+    gone = client.post("/api/list/create", json={"title": "Gone", "description": ""}, headers=headers).json()["uuid"]
+    due = datetime.datetime(2025, 1, 1).isoformat()
+    for list_uuid in (kept, gone, gone, gone):
+        client.post(f"/api/list/{list_uuid}/task/", json={"title": "Task", "description": "", "due_date": due}, headers=headers)
+    session.exec(delete(List).where(List.uuid == uuid.UUID(gone)))
+    session.commit()
+
+    monkeypatch.setattr(cli, "get_engine", lambda: test_engine)
+    cli.main(["purge-orphans", "--chunk-size", "2"])
+    for model in (Task, ListAccess, ListSummary):
+        assert count_rows(session, model, uuid.UUID(gone)) == 0
+        assert count_rows(session, model, uuid.UUID(kept)) == 1
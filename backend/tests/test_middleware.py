@@ -0,0 +1,37 @@
+from ..routes.middleware import get_current_user, token_cache
+from ..utils.token import TokenClaims, generate_jwt_token
+from datetime import timedelta
+from fastapi import HTTPException
+import asyncio
+import hashlib
+import pytest
+import time
+
+def test_get_current_user_caches_verified_claims(test_user):
+    token = generate_jwt_token(test_user, timedelta(minutes=15), "access")
+    hits = token_cache.hits
+
+    claims = asyncio.run(get_current_user(token))
+    assert isinstance(claims, TokenClaims)
+    assert claims.uuid == test_user.uuid
+    assert claims.email == test_user.email
+    assert not hasattr(claims, "__dict__")
+
+    assert asyncio.run(get_current_user(token)) is claims
+    assert token_cache.hits == hits + 1
+
+def test_cached_claims_expire_with_the_token(test_user, monkeypatch):
+    token = generate_jwt_token(test_user, timedelta(minutes=15), "access")
+    asyncio.run(get_current_user(token))
+    key = hashlib.sha256(token.encode()).digest()
+    assert token_cache.get(key) is not None
+
+    monkeypatch.setattr(token_cache, "_clock", lambda: time.monotonic() + 16 * 60)
+    assert token_cache.get(key) is None
+
+@pytest.mark.parametrize("expires_in", [timedelta(minutes=-1), None])
+def test_get_current_user_rejects_bad_tokens(test_user, expires_in):
+    token = generate_jwt_token(test_user, expires_in, "access") if expires_in else "not-a-jwt"
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(get_current_user(token))
+    assert exc_info.value.status_code == 401
@@ -0,0 +1,144 @@
+from sqlalchemy import Boolean, Column, DateTime, MetaData, String, Table, Uuid, event, inspect, select
+from sqlmodel import SQLModel, Session, create_engine
+from .. import database, migrations
+from ..migrations import MigrationError, SchemaVersionError, current_version, latest_version, migrate
+from ..models.list_summary import ListSummary
+from ..models.user import User
+from ..utils.search import search_tasks_statement
+import asyncio
+import datetime
+import pytest
+import time
+import uuid
+
+NOW = datetime.datetime(2025, 1, 1)
+
+def original_schema(engine):
+    """The tables as the first version of the app created them, before any later column or index."""
+    metadata = MetaData()
+    tables = {
+        "user": Table("user", metadata, Column("uuid", Uuid, primary_key=True), Column("email", String, unique=True, nullable=False),
+                      Column("password", String, nullable=False), Column("first_name", String, nullable=False),
+                      Column("last_name", String, nullable=False), Column("created_at", DateTime, nullable=False)),
+        "list": Table("list", metadata, Column("uuid", Uuid, primary_key=True), Column("created_at", DateTime, nullable=False),
+                      Column("title", String, nullable=False), Column("description", String, nullable=False)),
+        "listaccess": Table("listaccess", metadata, Column("uuid", Uuid, primary_key=True),
+                            Column("list_uuid", Uuid, nullable=False, index=True), Column("owner_uuid", Uuid, nullable=False, index=True)),
+        "task": Table("task", metadata, Column("uuid", Uuid, primary_key=True), Column("list_uuid", Uuid, nullable=False),
+                      Column("created_at", DateTime, nullable=False), Column("title", String, nullable=False),
+                      Column("description", String, nullable=False), Column("due_date", DateTime, nullable=False),
+                      Column("done", Boolean, nullable=False)),
+    }
+    metadata.create_all(engine)
+    return tables
+
+def schema(engine):
+    inspector = inspect(engine)
+    return {table: ({c["name"] for c in inspector.get_columns(table)}, {i["name"] for i in inspector.get_indexes(table)})
+            for table in inspector.get_table_names() if table != "schema_migration"}
+
+# Test: A database created before migrations existed ends up like a new one, data included
+def test_migrations_bring_an_old_database_up_to_date(tmp_path, monkeypatch):
+    monkeypatch.setattr(database.settings, "migration_batch_size", 2)
+    old = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    tables = original_schema(old)
+    user_uuid, list_uuid = uuid.uuid4(), uuid.uuid4()
+    with old.begin() as conn:
+        conn.execute(tables["user"].insert(), [
+            {"uuid": user_uuid, "email": " Old@Example.com", "password": "x", "first_name": "Old", "last_name": "User", "created_at": NOW},
+            *({"uuid": uuid.uuid4(), "email": f"User{i}@Example.com", "password": "x", "first_name": "U", "last_name": str(i), "created_at": NOW}
+              for i in range(4)),
+        ])
+        conn.execute(tables["list"].insert(), {"uuid": list_uuid, "created_at": NOW, "title": "Old", "description": ""})
+        conn.execute(tables["listaccess"].insert(), {"uuid": uuid.uuid4(), "list_uuid": list_uuid, "owner_uuid": user_uuid})
+        conn.execute(tables["task"].insert(), [
+            {"uuid": uuid.uuid4(), "list_uuid": list_uuid, "created_at": NOW, "title": f"Water the plants {i}", "description": "",
+             "due_date": NOW + datetime.timedelta(days=i), "done": i == 0} for i in range(3)])
+
+    applied = migrate(old, log=None)
+    assert len(applied) == latest_version()
+    fresh = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    migrate(fresh, log=None)
+    assert schema(old) == schema(fresh)
+
+    with Session(old) as session:
+        assert sorted(session.exec(select(User.email)).scalars()) == ["old@example.com"] + [f"user{i}@example.com" for i in range(4)]
+        summary = session.get(ListSummary, list_uuid)
+        assert (summary.total_tasks, summary.tasks_completed, summary.earliest_open_due_date) == (3, 1, NOW + datetime.timedelta(days=1))
+        # Tasks written before the search index existed are in it
+        assert len(session.exec(search_tasks_statement("sqlite", user_uuid, "plants")).all()) == 3
+
+    # Nothing left to do the second time
+    assert migrate(old, log=None) == []
+    with old.connect() as conn:
+        assert current_version(conn) == latest_version()
+
+# Test: Migrating an empty database builds exactly what the models describe
+def test_migrations_build_the_models_schema(tmp_path):
+    migrated = create_engine(f"sqlite:///{tmp_path / 'migrated.db'}")
+    migrate(migrated, log=None)
+    models = create_engine(f"sqlite:///{tmp_path / 'models.db'}")
+    SQLModel.metadata.create_all(models)
+    assert schema(migrated) == schema(models)
+    with migrated.connect() as conn:
+        # Created with the revision table
+        assert conn.exec_driver_sql("SELECT value FROM revision WHERE id = 1").scalar() == 0
+
+def test_migration_stops_on_emails_that_clash_when_lowercased(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    tables = original_schema(engine)
+    with engine.begin() as conn:
+        conn.execute(tables["user"].insert(), [
+            {"uuid": uuid.uuid4(), "email": email, "password": "x", "first_name": "A", "last_name": "B", "created_at": NOW}
+            for email in ("Same@example.com", "same@example.com")])
+    with pytest.raises(MigrationError, match="same@example.com"):
+        migrate(engine, log=None)
+    with engine.connect() as conn:
+        # Versions before the failing migration stay applied; it runs again next time
+        assert current_version(conn) == 5
+        assert sorted(conn.execute(select(tables["user"].c.email)).scalars()) == ["Same@example.com", "same@example.com"]
+
+def test_migrate_stops_at_target(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    assert migrate(engine, target=3, log=None) == [name for version, name in migrations.migrations() if version <= 3]
+    with engine.connect() as conn:
+        assert current_version(conn) == 3
+        with pytest.raises(SchemaVersionError, match="version 3"):
+            migrations.check_version(conn)
+
+# Test: Startup checks one version number instead of creating tables
+def test_startup_schema_check_timing(test_engine, monkeypatch):
+    monkeypatch.setattr(database, "_engine", test_engine)
+    monkeypatch.setattr(database.settings, "db_mode", "sync")
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    def best_of(n, f):
+        timings = []
+        for _ in range(n):
+            start = time.perf_counter()
+            f()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    event.listen(test_engine, "before_cursor_execute", record)
+    try:
+        check = best_of(5, lambda: asyncio.run(database.check_schema_version()))
+        check_statements, statements[:] = len(statements), []
+        # What every startup did before migrations
+        create_all = best_of(5, lambda: asyncio.run(database.run_in_threadpool(SQLModel.metadata.create_all, test_engine)))
+        create_all_statements = len(statements)
+    finally:
+        event.remove(test_engine, "before_cursor_execute", record)
+    assert check_statements / 5 <= 2
+    assert create_all_statements > 2 * check_statements
+    assert check < create_all
+
+def test_startup_fails_on_a_database_missing_migrations(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    migrate(engine, target=latest_version() - 1, log=None)
+    monkeypatch.setattr(database, "_engine", engine)
+    monkeypatch.setattr(database.settings, "db_mode", "sync")
+    with pytest.raises(SchemaVersionError, match="python -m backend.cli migrate"):
+        asyncio.run(database.check_schema_version())
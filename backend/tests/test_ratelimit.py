@@ -0,0 +1,135 @@
+from ..config import settings
+from ..utils import ratelimit
+from ..utils.ratelimit import Budget, DatabaseRateLimitStore, MemoryRateLimitStore, RateLimiter, Rule, client_identity, rate_limiter
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+import asyncio
+import pytest
+import time
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def takes(store, key, budget, n):
+    async def run():
+        return [await store.take(key, budget) for _ in range(n)]
+    return asyncio.run(run())
+
+
+def test_memory_store_allows_a_burst_then_refills_evenly():
+    clock = FakeClock()
+    store = MemoryRateLimitStore(clock=clock, sweep_seconds=100)
+    budget = Budget.parse("5/10")
+    assert takes(store, "a", budget, 5) == [0.0] * 5
+    # Empty: the next token is back one interval (10s / 5) from now
+    assert takes(store, "a", budget, 1) == [pytest.approx(2.0)]
+    # Other clients have their own bucket
+    assert takes(store, "b", budget, 1) == [0.0]
+    clock.now += 2.0
+    assert takes(store, "a", budget, 2) == [0.0, pytest.approx(2.0)]
+    # Refilled buckets are forgotten at the next sweep
+    clock.now += 100
+    takes(store, "c", budget, 1)
+    assert len(store) == 1
+
+
+@pytest.fixture
+def limited(monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_enabled", True)
+    monkeypatch.setattr(rate_limiter, "rules", [
+        Rule("POST", "/api/user/login", Budget.parse("2/60")),
+        Rule(None, "/api/", Budget.parse("3/60")),
+    ])
+    monkeypatch.setattr(rate_limiter, "store", MemoryRateLimitStore())
+
+
+# Test: Requests over a budget get a 429 with Retry-After, per route and per client
+def test_login_is_limited_by_address(client, limited):
+    for _ in range(2):
+        assert client.post("/api/user/login", json={"email": "nobody@example.com", "password": "x"}).status_code == 401
+    response = client.post("/api/user/login", json={"email": "nobody@example.com", "password": "x"}, headers={"Origin": "http://app"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "30"
+    # Readable by the frontend
+    assert "Retry-After" in response.headers["Access-Control-Expose-Headers"]
+    # A different budget, and paths outside /api are not limited
+    assert client.get("/api/list/").status_code == 401
+    assert all(client.get("/").status_code == 200 for _ in range(5))
+
+
+def test_authenticated_requests_are_limited_by_user(client, limited, access_token, another_access_token):
+    alice, bob = {"Authorization": f"Bearer {access_token}"}, {"Authorization": f"Bearer {another_access_token}"}
+    assert [client.get("/api/list/", headers=alice).status_code for _ in range(4)] == [200, 200, 200, 429]
+    assert client.get("/api/list/", headers=bob).status_code == 200
+    # An invalid token does not get a bucket of its own; the address's is used
+    assert [client.get("/api/list/", headers={"Authorization": "Bearer nonsense"}).status_code for _ in range(4)] == [401, 401, 401, 429]
+
+
+# Test: Behind a trusted proxy each client is limited by its own address, not the proxy's
+def test_client_identity_behind_a_proxy():
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append(client_identity(scope))
+
+    # What serve.py runs with the root docker-compose.yml's default
+    proxied = ProxyHeadersMiddleware(app, trusted_hosts="172.16.0.0/12")
+
+    def identity(client, forwarded_for):
+        scope = {"type": "http", "method": "GET", "path": "/api/list/", "client": (client, 40000),
+                 "headers": [(b"x-forwarded-for", forwarded_for.encode())]}
+        asyncio.run(proxied(scope, None, None))
+        return seen.pop()
+
+    # Caddy on caddy_net, forwarding two different clients
+    assert identity("172.18.0.3", "203.0.113.7") == "203.0.113.7"
+    assert identity("172.18.0.3", "198.51.100.2") == "198.51.100.2"
+    # Anyone else cannot pick their bucket with the header
+    assert identity("203.0.113.9", "198.51.100.2") == "203.0.113.9"
+
+
+@pytest.mark.parametrize("db_mode", ["sync", "async"])
+def test_database_store_is_shared_between_workers(test_engine, db_mode, monkeypatch):
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import NullPool
+    from ..database import to_async_url
+    monkeypatch.setattr(settings, "db_mode", db_mode)
+    monkeypatch.setattr(ratelimit, "get_engine", lambda: test_engine)
+    async_engine = create_async_engine(to_async_url(str(test_engine.url)), poolclass=NullPool)
+    monkeypatch.setattr(ratelimit, "get_async_engine", lambda: async_engine)
+    clock = FakeClock()
+    # Two workers with their own store object, sharing the table
+    first, second = DatabaseRateLimitStore(clock=clock), DatabaseRateLimitStore(clock=clock)
+    budget = Budget.parse("3/30")
+    assert takes(first, "k", budget, 2) + takes(second, "k", budget, 2) == [0.0, 0.0, 0.0, pytest.approx(10.0)]
+    clock.now += 10
+    assert takes(first, "k", budget, 2) == [0.0, pytest.approx(10.0)]
+    # Full buckets are deleted at the next sweep
+    clock.now += 100
+    takes(first, "other", budget, 1)
+    with test_engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT key FROM rate_limit_bucket").scalars().all() == ["other"]
+
+
+# Test: A decision with the in-process store adds well under 50µs
+def test_decision_time(access_token):
+    limiter = RateLimiter([Rule("POST", "/api/user/login", Budget.parse("10/60")), Rule(None, "/api/", Budget.parse("1000000/1"))],
+                          MemoryRateLimitStore())
+    scope = {"type": "http", "method": "GET", "path": "/api/list/", "client": ("10.0.0.1", 1234),
+             "headers": [(b"host", b"example.com"), (b"accept", b"*/*"), (b"authorization", f"Bearer {access_token}".encode())]}
+
+    async def run(n):
+        start = time.perf_counter()
+        for _ in range(n):
+            assert await limiter.check(scope) == 0.0
+        return (time.perf_counter() - start) / n
+
+    async def best():
+        await run(100)
+        return min([await run(2000) for _ in range(3)])
+    assert asyncio.run(best()) < 50e-6
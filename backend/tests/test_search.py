@@ -0,0 +1,78 @@
+from ..utils.search import fts5_query
+from .conftest import create_list, create_task
+
+
+def search(client, headers, q, **params):
+    response = client.get("/api/search/", params={"q": q, **params}, headers=headers)
+    assert response.status_code == 200
+    return response
+
+def test_fts5_query_quotes_user_input():
+    assert fts5_query('buy "milk" AND eggs*') == '"buy" "milk" "AND" "eggs"'
+    assert fts5_query("-(") == ""
+
+# Test: Search covers the caller's own and shared lists, and nobody else's
+def test_search_across_accessible_lists(client, access_token, another_access_token, another_user):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    other_headers = {"Authorization": f"Bearer {another_access_token}"}
+    own_list = create_list(client, headers)
+    shared_list = create_list(client, other_headers)
+    private_list = create_list(client, other_headers)
+    assert client.put(f"/api/list/{shared_list}/access/{'test@example.com'}", headers=other_headers).status_code == 200
+
+    in_title = create_task(client, headers, own_list, "Buy milk")["uuid"]
+    in_description = create_task(client, other_headers, shared_list, "Groceries", description="milk and eggs")["uuid"]
+    create_task(client, other_headers, private_list, "Milk the cows")
+    walk = create_task(client, headers, own_list, "Walk the dog")["uuid"]
+
+    results = search(client, headers, "milk").json()
+    # Title matches rank above description matches
+    assert [r["task"]["uuid"] for r in results] == [in_title, in_description]
+    assert results[0]["rank"] > results[1]["rank"]
+    assert results[0]["task"]["title"] == "Buy milk"
+
+    # Every word has to match, and words are stemmed
+    assert [r["task"]["uuid"] for r in search(client, headers, "milk eggs").json()] == [in_description]
+    assert [r["task"]["uuid"] for r in search(client, headers, "walking").json()] == [walk]
+
+# Test: Edits and deletes reach the index
+def test_search_follows_task_changes(client, access_token):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    list_uuid = create_list(client, headers)
+    task_uuid = create_task(client, headers, list_uuid, "Call the plumber")["uuid"]
+    assert len(search(client, headers, "plumber").json()) == 1
+
+    client.put(f"/api/list/{list_uuid}/task/{task_uuid}", json={"title": "Call the electrician"}, headers=headers)
+    assert search(client, headers, "plumber").json() == []
+    assert len(search(client, headers, "electrician").json()) == 1
+
+    client.delete(f"/api/list/{list_uuid}/task/{task_uuid}", headers=headers)
+    assert search(client, headers, "electrician").json() == []
+
+# Test: Walk ranked results with the keyset cursor
+def test_search_pagination(client, access_token):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    list_uuid = create_list(client, headers)
+    # Several tasks share each rank, so the uuid tiebreaker is exercised
+    expected = {create_task(client, headers, list_uuid, "Report " + "draft " * (i % 3))["uuid"] for i in range(9)}
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 4} if cursor is None else {"limit": 4, "cursor": cursor}
+        response = search(client, headers, "report", **params)
+        seen += response.json()
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert {r["task"]["uuid"] for r in seen} == expected
+    assert len(seen) == 9
+    ranks = [r["rank"] for r in seen]
+    assert ranks == sorted(ranks, reverse=True)
+
+def test_search_rejects_bad_input(client, access_token):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    assert client.get("/api/search/", params={"q": "x", "cursor": "nope"}, headers=headers).status_code == 400
+    assert client.get("/api/search/", params={"q": ""}, headers=headers).status_code == 422
+    assert client.get("/api/search/", params={"q": "x"}).status_code == 401
+    # Query syntax characters are searched for as text, never parsed
+    assert search(client, headers, '"(*').json() == []
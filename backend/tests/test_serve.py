@@ -0,0 +1,23 @@
+from .. import database, serve
+from ..config import settings
+from ..migrations import current_version, latest_version
+from sqlmodel import create_engine
+import os
+
+
+def test_worker_count_follows_setting_or_cpus(monkeypatch):
+    monkeypatch.setattr(settings, "web_workers", 3)
+    assert serve.worker_count() == 3
+    monkeypatch.setattr(settings, "web_workers", 0)
+    assert serve.worker_count() >= 1
+
+# Test: serve.py applies migrations once, and its workers only check
+def test_prepare_schema_migrates_once_for_all_workers(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    monkeypatch.setattr(database, "get_engine", lambda: engine)
+    monkeypatch.setattr(settings, "schema_on_startup", "migrate")
+    monkeypatch.setenv("SCHEMA_ON_STARTUP", "migrate")
+    serve.prepare_schema()
+    assert os.environ["SCHEMA_ON_STARTUP"] == "check"
+    with engine.connect() as conn:
+        assert current_version(conn) == latest_version()
@@ -0,0 +1,80 @@
+from ..utils.revision import prune_tombstones
+from .conftest import create_list, create_task
+import datetime
+
+def sync(client, headers, since):
+    response = client.get("/api/sync/", params={"since": since}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+# Test: A sync returns only what changed after the client's revision
+def test_sync_returns_changes_since_revision(client, access_token):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    list_uuid = create_list(client, headers)
+    kept = create_task(client, headers, list_uuid, "Kept")["uuid"]
+    doomed = create_task(client, headers, list_uuid, "Doomed")["uuid"]
+
+    full = sync(client, headers, 0)
+    assert full["full"] is True
+    assert [l["uuid"] for l in full["lists"]] == [list_uuid]
+    assert {t["uuid"] for t in full["tasks"]} == {kept, doomed}
+    revision = full["revision"]
+
+    # Nothing changed
+    empty = sync(client, headers, revision)
+    assert empty["revision"] == revision
+    assert empty["lists"] == empty["tasks"] == empty["deleted_tasks"] == empty["deleted_lists"] == []
+
+    client.put(f"/api/list/{list_uuid}/task/{kept}", json={"done": True}, headers=headers)
+    client.delete(f"/api/list/{list_uuid}/task/{doomed}", headers=headers)
+    added = create_task(client, headers, list_uuid, "Added")["uuid"]
+
+    delta = sync(client, headers, revision)
+    assert delta["full"] is False
+    assert delta["revision"] > revision
+    # Task writes do not send the list again
+    assert delta["lists"] == []
+    assert {t["uuid"]: t["done"] for t in delta["tasks"]} == {kept: True, added: False}
+    assert delta["deleted_tasks"] == [doomed]
+
+    client.put(f"/api/list/{list_uuid}", json={"title": "Renamed", "description": ""}, headers=headers)
+    renamed = sync(client, headers, delta["revision"])
+    assert [l["title"] for l in renamed["lists"]] == ["Renamed"]
+    assert renamed["tasks"] == []
+
+# Test: Sharing sends the whole list, revoking sends a list tombstone
+def test_sync_follows_access_changes(client, access_token, another_access_token, another_user):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    other_headers = {"Authorization": f"Bearer {another_access_token}"}
+    list_uuid = create_list(client, headers)
+    task_uuid = create_task(client, headers, list_uuid, "Old task")["uuid"]
+    revision = sync(client, other_headers, 0)["revision"]
+
+    client.put(f"/api/list/{list_uuid}/access/{another_user.email}", headers=headers)
+    shared = sync(client, other_headers, revision)
+    assert [l["uuid"] for l in shared["lists"]] == [list_uuid]
+    assert [t["uuid"] for t in shared["tasks"]] == [task_uuid]
+
+    client.delete(f"/api/list/{list_uuid}/access/{another_user.uuid}", headers=headers)
+    revoked = sync(client, other_headers, shared["revision"])
+    assert revoked["lists"] == revoked["tasks"] == []
+    assert revoked["deleted_lists"] == [list_uuid]
+
+    # The owner's view is unaffected apart from the touched list
+    assert sync(client, headers, shared["revision"])["deleted_lists"] == []
+
+# Test: Clients older than the pruned tombstones get a full sync
+def test_sync_after_pruning_is_full(client, access_token, session):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    list_uuid = create_list(client, headers)
+    task_uuid = create_task(client, headers, list_uuid, "Task")["uuid"]
+    revision = sync(client, headers, 0)["revision"]
+    client.delete(f"/api/list/{list_uuid}/task/{task_uuid}", headers=headers)
+
+    assert prune_tombstones(session, datetime.datetime.now() + datetime.timedelta(seconds=1)) == 1
+    session.commit()
+
+    result = sync(client, headers, revision)
+    assert result["full"] is True
+    assert result["deleted_tasks"] == []
+    assert [l["uuid"] for l in result["lists"]] == [list_uuid]
@@ -0,0 +1,227 @@
+from sqlalchemy import delete
+from ..models.list_summary import ListSummary
+from ..utils.summary import rebuild_list_summaries
+from .conftest import create_list, create_task
+import json
+import datetime
+
+
+# Test: Paginate tasks with a keyset cursor
+def test_get_tasks_pagination(client, access_token):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    list_uuid = create_list(client, headers)
+    base = datetime.datetime(2025, 1, 1)
+    # Two tasks share each due date so the uuid tiebreaker is exercised
+    for i in range(10):
+        create_task(client, headers, list_uuid, f"Task {i}", base + datetime.timedelta(days=i // 2))
+
+    # Without a limit every task is returned in due date order
+    response_all = client.get(f"/api/list/{list_uuid}/task/", headers=headers)
+    assert response_all.status_code == 200
+    all_tasks = response_all.json()
+    assert len(all_tasks) == 10
+    assert "X-Next-Cursor" not in response_all.headers
+
+    # Walk the pages and make sure they cover the same tasks in the same order
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 3}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get(f"/api/list/{list_uuid}/task/", params=params, headers=headers)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) <= 3
+        seen.extend(page)
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert [t["uuid"] for t in seen] == [t["uuid"] for t in all_tasks]
+
+    # Malformed cursors are rejected
+    response_bad = client.get(f"/api/list/{list_uuid}/task/", params={"cursor": "not-a-cursor"}, headers=headers)
+    assert response_bad.status_code == 400
+
+# Test: Filter tasks by completion and due date
+def test_get_tasks_filters(client, access_token):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    list_uuid = create_list(client, headers)
+    base = datetime.datetime(2025, 1, 1)
+    for i in range(6):
+        create_task(client, headers, list_uuid, f"Task {i}", base + datetime.timedelta(days=i), done=i % 2 == 0)
+
+    response_done = client.get(f"/api/list/{list_uuid}/task/", params={"done": True}, headers=headers)
+    assert [t["title"] for t in response_done.json()] == ["Task 0", "Task 2", "Task 4"]
+
+    params = {
+        "done": False,
+        "due_after": (base + datetime.timedelta(days=1)).isoformat(),
+        "due_before": (base + datetime.timedelta(days=5)).isoformat(),
+    }
+    response_window = client.get(f"/api/list/{list_uuid}/task/", params=params, headers=headers)
+    assert [t["title"] for t in response_window.json()] == ["Task 1", "Task 3"]
+
+# Test: Export every accessible list and task as NDJSON
+def test_export(client, access_token, another_access_token):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    list_a = create_list(client, headers, "A")
+    list_b = create_list(client, headers, "B")
+    base = datetime.datetime(2025, 1, 1)
+    for i in range(3):
+        create_task(client, headers, list_a, f"A{i}", base + datetime.timedelta(days=i))
+    # Another user's list must not leak into the export
+    create_list(client, {"Authorization": f"Bearer {another_access_token}"}, "Other")
+
+    response = client.get("/api/export/", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["type"] for line in lines].count("list") == 2
+    assert {line["uuid"] for line in lines if line["type"] == "list"} == {list_a, list_b}
+    assert [line["title"] for line in lines if line["type"] == "task"] == ["A0", "A1", "A2"]
+    # The same fields and formats as the task API
+    tasks = client.get(f"/api/list/{list_a}/task/", headers=headers).json()
+    assert [{k: v for k, v in line.items() if k != "type"} for line in lines if line["type"] == "task"] == tasks
+
+    # Each task follows the list it belongs to
+    current_list = None
+    for line in lines:
+        if line["type"] == "list":
+            current_list = line["uuid"]
+        else:
+            assert line["list_uuid"] == current_list
+
+# Test: Apply creates, updates and deletes in one batch
+def test_batch_tasks(client, access_token, another_access_token):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    list_uuid = create_list(client, headers)
+    other_list_uuid = create_list(client, headers, "Other")
+    due = datetime.datetime(2025, 1, 1)
+    keep = create_task(client, headers, list_uuid, "Keep", due)
+    remove = create_task(client, headers, list_uuid, "Remove", due)
+    foreign = create_task(client, headers, other_list_uuid, "Foreign", due)
+
+    operations = [
+        {"op": "create", "title": "New 1", "description": "", "due_date": due.isoformat()},
+        {"op": "update", "uuid": keep["uuid"], "done": True},
+        {"op": "delete", "uuid": remove["uuid"]},
+        # Tasks from another list are not visible through this one
+        {"op": "update", "uuid": foreign["uuid"], "done": True},
+        {"op": "create", "title": "New 2", "description": "", "due_date": due.isoformat(), "done": True},
+    ]
+    response = client.post(f"/api/list/{list_uuid}/task/batch", json={"operations": operations}, headers=headers)
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["status"] for r in results] == [201, 200, 204, 404, 201]
+    assert results[1]["task"]["done"] is True
+    assert results[4]["task"]["done"] is True
+
+    tasks = client.get(f"/api/list/{list_uuid}/task/", headers=headers).json()
+    assert sorted(t["title"] for t in tasks) == ["Keep", "New 1", "New 2"]
+    assert next(t for t in tasks if t["title"] == "Keep")["done"] is True
+    foreign_after = client.get(f"/api/list/{other_list_uuid}/task/{foreign['uuid']}", headers=headers).json()
+    assert foreign_after["done"] is False
+
+    # Unknown operations are rejected, as are users without access
+    response_bad = client.post(f"/api/list/{list_uuid}/task/batch", json={"operations": [{"op": "rename"}]}, headers=headers)
+    assert response_bad.status_code == 422
+    response_denied = client.post(
+        f"/api/list/{list_uuid}/task/batch",
+        json={"operations": operations[:1]},
+        headers={"Authorization": f"Bearer {another_access_token}"},
+    )
+    assert response_denied.status_code == 404
+
+def list_summary(client, headers, list_uuid):
+    response = client.get(f"/api/list/{list_uuid}", headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    return data["total_tasks"], data["tasks_completed"], data["earliest_due_date"]
+
+# Test: The list summary follows every kind of task write
+def test_list_summary_maintained(client, access_token):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    list_uuid = create_list(client, headers)
+    base = datetime.datetime(2025, 1, 1)
+    assert list_summary(client, headers, list_uuid) == (0, 0, None)
+
+    first = create_task(client, headers, list_uuid, "First", base)
+    second = create_task(client, headers, list_uuid, "Second", base + datetime.timedelta(days=1))
+    create_task(client, headers, list_uuid, "Done", base - datetime.timedelta(days=1), done=True)
+    assert list_summary(client, headers, list_uuid) == (3, 1, base.isoformat())
+
+    # Completing the earliest open task moves the earliest due date forward
+    response = client.put(f"/api/list/{list_uuid}/task/{first['uuid']}", json={"done": True}, headers=headers)
+    assert response.status_code == 200
+    assert list_summary(client, headers, list_uuid) == (3, 2, (base + datetime.timedelta(days=1)).isoformat())
+
+    # Moving a due date earlier
+    response = client.put(f"/api/list/{list_uuid}/task/{second['uuid']}", json={"due_date": (base - datetime.timedelta(days=5)).isoformat()}, headers=headers)
+    assert response.status_code == 200
+    assert list_summary(client, headers, list_uuid) == (3, 2, (base - datetime.timedelta(days=5)).isoformat())
+
+    response = client.delete(f"/api/list/{list_uuid}/task/{second['uuid']}", headers=headers)
+    assert response.status_code == 204
+    assert list_summary(client, headers, list_uuid) == (2, 2, None)
+
+    operations = [
+        {"op": "create", "title": "New", "description": "", "due_date": (base + datetime.timedelta(days=3)).isoformat()},
+        {"op": "create", "title": "Later", "description": "", "due_date": (base + datetime.timedelta(days=4)).isoformat()},
+        {"op": "update", "uuid": first["uuid"], "done": False},
+    ]
+    response = client.post(f"/api/list/{list_uuid}/task/batch", json={"operations": operations}, headers=headers)
+    assert response.status_code == 200
+    assert list_summary(client, headers, list_uuid) == (4, 1, base.isoformat())
+
+    operations = [{"op": "delete", "uuid": first["uuid"]}, {"op": "update", "uuid": first["uuid"], "done": True}]
+    response = client.post(f"/api/list/{list_uuid}/task/batch", json={"operations": operations}, headers=headers)
+    assert response.status_code == 200
+    assert list_summary(client, headers, list_uuid) == (3, 1, (base + datetime.timedelta(days=3)).isoformat())
+
+# Test: Rebuilding summaries from the task table gives the maintained values
+def test_rebuild_list_summaries(client, access_token, session):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    list_uuid = create_list(client, headers)
+    base = datetime.datetime(2025, 1, 1)
+    create_task(client, headers, list_uuid, "Open", base)
+    create_task(client, headers, list_uuid, "Done", base - datetime.timedelta(days=1), done=True)
+    maintained = list_summary(client, headers, list_uuid)
+
+    session.exec(delete(ListSummary))
+    session.commit()
+    assert list_summary(client, headers, list_uuid) == (0, 0, None)
+
+    assert rebuild_list_summaries(session) == 1
+    session.commit()
+    assert list_summary(client, headers, list_uuid) == maintained == (2, 1, base.isoformat())
+
+# Test: Reads carry a weak ETag and answer a matching If-None-Match with 304
+def test_conditional_get(client, access_token):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    list_uuid = create_list(client, headers)
+    task = create_task(client, headers, list_uuid, "Task", datetime.datetime(2025, 1, 1))
+
+    for path in ("/api/list/", f"/api/list/{list_uuid}", f"/api/list/{list_uuid}/task/"):
+        response = client.get(path, headers=headers)
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+        assert etag.startswith('W/"')
+
+        response = client.get(path, headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+        assert response.content == b""
+
+        # Strong and weak forms of the same tag both match
+        response = client.get(path, headers={**headers, "If-None-Match": f'"other", {etag[2:]}'})
+        assert response.status_code == 304
+
+    # Any write to the list or its tasks changes every tag
+    etags = {path: client.get(path, headers=headers).headers["ETag"] for path in ("/api/list/", f"/api/list/{list_uuid}", f"/api/list/{list_uuid}/task/")}
+    response = client.put(f"/api/list/{list_uuid}/task/{task['uuid']}", json={"title": "Renamed"}, headers=headers)
+    assert response.status_code == 200
+    for path, etag in etags.items():
+        response = client.get(path, headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
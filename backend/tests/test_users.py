@@ -0,0 +1,137 @@
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine
+from ..config import settings
+from ..database import to_async_url
+from ..models.outbox import OutboxEmail
+from ..models.user import User
+from ..utils.email import FakeTransport, send_due_emails
+from ..utils.password import hash_password, verify_password
+import asyncio
+import bcrypt
+import datetime
+import uuid
+
+def create_user(test_engine, email, password):
+    with Session(test_engine) as session:
+        user = User(
+            uuid=uuid.uuid4(),
+            email=email,
+            password=bcrypt.hashpw(password.encode(), bcrypt.gensalt(4)).decode(),
+            first_name="Login",
+            last_name="User",
+            created_at=datetime.datetime.now()
+        )
+        session.add(user)
+        session.commit()
+
+def test_hash_and_verify_password(monkeypatch):
+    monkeypatch.setattr(settings, "bcrypt_rounds", 4)
+
+    async def roundtrip():
+        hashed = await hash_password("hunter2")
+        return hashed, await verify_password("hunter2", hashed), await verify_password("wrong", hashed)
+
+    hashed, good, bad = asyncio.run(roundtrip())
+    assert hashed.startswith("$2b$04$")
+    assert good and not bad
+
+def test_login(client, test_engine):
+    create_user(test_engine, "login@example.com", "correct horse")
+
+    response = client.post("/api/user/login", json={"email": "login@example.com", "password": "correct horse"})
+    assert response.status_code == 200
+    assert response.json().keys() == {"access_token", "refresh_token"}
+
+    response = client.post("/api/user/login", json={"email": "login@example.com", "password": "battery staple"})
+    assert response.status_code == 401
+
+def test_login_rejected_when_password_pool_is_full(client, test_engine, monkeypatch):
+    create_user(test_engine, "login@example.com", "correct horse")
+    monkeypatch.setattr(settings, "password_max_pending", 0)
+
+    response = client.post("/api/user/login", json={"email": "login@example.com", "password": "correct horse"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == str(settings.password_retry_after_seconds)
+
+def test_email_lookups_ignore_case(client, test_engine):
+    create_user(test_engine, "login@example.com", "correct horse")
+
+    response = client.post("/api/user/login", json={"email": " Login@Example.COM", "password": "correct horse"})
+    assert response.status_code == 200
+
+    # Signing up again with the same address in another case is a conflict
+    response = client.post("/api/user/create", json={"email": "LOGIN@example.com", "password": "x", "first_name": "A", "last_name": "B"})
+    assert response.status_code == 409
+
+def test_signup_queues_confirmation_email(client, session, monkeypatch):
+    # Registration tokens are encrypted with A256GCM, which needs a 32-byte key
+    monkeypatch.setenv("SECRET_KEY", "0123456789abcdef0123456789abcdef")
+    response = client.post("/api/user/create", json={"email": "New@Example.com", "password": "x", "first_name": "A", "last_name": "B"})
+    assert response.status_code == 200
+
+    row = session.exec(select(OutboxEmail)).one()
+    assert row.to == "new@example.com"
+    assert "https://todoapp.reesenorr.is/api/user/confirm/" in row.html
+
+def send_outbox(test_engine, transport, now):
+    async def run():
+        engine = create_async_engine(to_async_url(str(test_engine.url)))
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            picked = await send_due_emails(session, transport, now)
+        await engine.dispose()
+        return picked
+    return asyncio.run(run())
+
+def test_outbox_batches_and_retries(test_engine, session, monkeypatch):
+    monkeypatch.setattr(settings, "email_batch_size", 2)
+    monkeypatch.setattr(settings, "email_max_attempts", 2)
+    now = datetime.datetime.now()
+    for i in range(3):
+        session.add(OutboxEmail(to=f"user{i}@example.com", subject="Hi", html="<p>Hi</p>", created_at=now, next_attempt_at=now))
+    session.commit()
+    transport = FakeTransport()
+
+    # A failed batch is rescheduled with backoff rather than retried straight
+    # away (the batch call, then each of its two messages on their own)
+    transport.fail_next = 3
+    assert send_outbox(test_engine, transport, now) == 2
+    assert transport.sent == []
+    failed = session.exec(select(OutboxEmail).where(OutboxEmail.attempts == 1)).all()
+    assert len(failed) == 2
+    assert all(row.next_attempt_at > now and "fake transport failure" in row.last_error for row in failed)
+
+    # The untouched row goes first, then the retries once they are due
+    assert send_outbox(test_engine, transport, now) == 1
+    later = now + datetime.timedelta(seconds=settings.email_backoff_base_seconds)
+    assert send_outbox(test_engine, transport, later) == 2
+    assert sorted(message["to"][0] for message in transport.sent) == ["user0@example.com", "user1@example.com", "user2@example.com"]
+    assert session.exec(select(OutboxEmail)).all() == []
+
+    # After email_max_attempts failures the row is kept but no longer picked up
+    session.expunge_all()
+    session.add(OutboxEmail(to="dead@example.com", subject="Hi", html="", created_at=now, next_attempt_at=now))
+    session.commit()
+    transport.fail_next = 2
+    send_outbox(test_engine, transport, now)
+    send_outbox(test_engine, transport, later)
+    session.expire_all()
+    dead = session.exec(select(OutboxEmail)).one()
+    assert dead.attempts == 2 and dead.next_attempt_at is None
+    assert send_outbox(test_engine, transport, later + datetime.timedelta(days=1)) == 0
+
+# Test: One rejected recipient does not take the rest of its batch down with it
+def test_outbox_charges_a_rejected_message_only_to_its_row(test_engine, session, monkeypatch):
+    monkeypatch.setattr(settings, "email_max_attempts", 1)
+    now = datetime.datetime.now()
+    for to in ("good1@example.com", "bad@example.com", "good2@example.com"):
+        session.add(OutboxEmail(to=to, subject="Hi", html="<p>Hi</p>", created_at=now, next_attempt_at=now))
+    session.commit()
+    transport = FakeTransport()
+    transport.rejected.add("bad@example.com")
+
+    assert send_outbox(test_engine, transport, now) == 3
+    assert sorted(message["to"][0] for message in transport.sent) == ["good1@example.com", "good2@example.com"]
+    bad = session.exec(select(OutboxEmail)).one()
+    assert bad.to == "bad@example.com" and bad.attempts == 1 and bad.next_attempt_at is None
+    assert "invalid recipient" in bad.last_error
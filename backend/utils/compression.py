@@ -0,0 +1,151 @@
+"""Response compression with zstd, brotli or gzip, whichever the client prefers.
+
+Task and list JSON repeats the same keys, uuids and timestamp prefixes on
+every row, so it shrinks several times over. Bodies under
+compression_min_size are sent as they are: the headers cost more than the
+bytes saved. Streamed bodies are compressed chunk by chunk as they go out, so
+a large export is never held in memory; event streams are left alone, since a
+compressor would hold events back until its buffer filled.
+"""
+import functools
+import zlib
+
+import brotli
+import zstandard
+from starlette.datastructures import MutableHeaders
+
+from ..config import settings
+
+# Content types worth compressing; everything else (images, already
+# compressed archives) goes out untouched
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+NEVER_COMPRESSED = "text/event-stream"
+
+def _zstd():
+    compressor = zstandard.ZstdCompressor(level=settings.compression_zstd_level).compressobj()
+    return compressor.compress, compressor.flush
+
+def _brotli():
+    compressor = brotli.Compressor(quality=settings.compression_brotli_quality)
+    return compressor.process, compressor.finish
+
+def _gzip():
+    compressor = zlib.compressobj(settings.compression_gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress, compressor.flush
+
+# Content-Encoding -> factory for a new stream's (compress, finish) functions.
+# When a client accepts several equally, the first wins: zstd compresses about
+# as well as brotli at this level, for less CPU.
+ENCODERS = {"zstd": _zstd, "br": _brotli, "gzip": _gzip}
+
+@functools.lru_cache(maxsize=256)
+def negotiate(accept_encoding: str) -> str | None:
+    """The encoding to answer an Accept-Encoding header with, None for uncompressed.
+
+    Cached, since each kind of client sends the same header on every request.
+    """
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        weight = 1.0
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+    best, best_weight = None, 0.0
+    for name in ENCODERS:
+        weight = weights.get(name, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = name, weight
+    return best
+
+def compressible(headers: MutableHeaders) -> bool:
+    content_type = headers.get("content-type", "")
+    return ("content-encoding" not in headers and content_type.startswith(COMPRESSIBLE_TYPES)
+            and not content_type.startswith(NEVER_COMPRESSED))
+
+class CompressionMiddleware:
+    """Compress response bodies in the encoding negotiated from Accept-Encoding.
+
+    The response start is held back until the first body chunk arrives, which
+    decides it: a whole body under the threshold goes out unchanged, anything
+    else gets a Content-Encoding header and runs through one compressor for
+    the rest of the response. Every response of a compressible type gets
+    Vary: Accept-Encoding, compressed or not.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.compression_enabled:
+            await self.app(scope, receive, send)
+            return
+        encoding = None
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                encoding = negotiate(value.decode("latin-1"))
+                break
+
+        start = None
+        compress = finish = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, compress, finish, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if not compressible(headers):
+                    passthrough = True
+                    await send(message)
+                    return
+                # Whether this response came out compressed or not, the next
+                # one for the same URL may differ by Accept-Encoding, so caches
+                # must key on it either way
+                headers.add_vary_header("Accept-Encoding")
+                length = headers.get("content-length")
+                if (encoding is None or message["status"] in (204, 304)
+                        or (length is not None and int(length) < settings.compression_min_size)):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body, more_body = message.get("body", b""), message.get("more_body", False)
+            if start is not None:
+                if not more_body and len(body) < settings.compression_min_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                headers = MutableHeaders(scope=start)
+                headers["Content-Encoding"] = encoding
+                del headers["Content-Length"]
+                compress, finish = ENCODERS[encoding]()
+                body = compress(body)
+                if not more_body:
+                    body += finish()
+                    headers["Content-Length"] = str(len(body))
+                await send(start)
+                start = None
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+                return
+
+            body = compress(body)
+            if not more_body:
+                body += finish()
+            # The compressor often keeps small chunks until it has a block's worth
+            if body or not more_body:
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
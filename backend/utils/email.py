@@ -1,22 +1,158 @@
+import functools
+import logging
 import os
-import resend
-from fastapi import HTTPException
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
 
-def send_confirmation_email(email: str, reg_token_ciphertext: str):
-    """Send a confirmation email with a link containing the registration token."""
+from sqlalchemy import delete
+from sqlmodel import select
+from starlette.concurrency import run_in_threadpool
+
+from ..config import settings
+from ..models.outbox import OutboxEmail
+from .worker import BackgroundWorker
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_PATH = Path(__file__).resolve().parent.parent / "email_template.html"
+
+# How long a worker owns the rows it picked up. Another worker retries them
+# after this if the first one dies before recording the outcome.
+LEASE = timedelta(minutes=5)
+
+@functools.cache
+def confirmation_template() -> str:
+    """The confirmation email body, read once. Called at startup so a missing file fails the boot."""
+    return TEMPLATE_PATH.read_text()
+
+class ResendTransport:
+    """Send through Resend's batch endpoint. Blocking; the worker calls it on the threadpool."""
+
+    # Resend accepts at most 100 emails per batch call
+    MAX_BATCH = 100
+
+    def send(self, messages: list[dict]):
+        # Imported on first send: it is slow to import, and tests and local runs never need it
+        import resend
+
+        resend.api_key = os.environ["RESEND_API_KEY"]
+        for start in range(0, len(messages), self.MAX_BATCH):
+            resend.Batch.send(messages[start:start + self.MAX_BATCH])
+
+class FakeTransport:
+    """Keep sent messages in memory, for tests and local runs.
+
+    Set `fail_next` to make the next sends raise, or add addresses to
+    `rejected` to make any send including them raise, as a batch API does.
+    """
+
+    def __init__(self):
+        self.sent: list[dict] = []
+        self.fail_next = 0
+        self.rejected: set[str] = set()
+
+    def send(self, messages: list[dict]):
+        if self.fail_next:
+            self.fail_next -= 1
+            raise RuntimeError("fake transport failure")
+        for message in messages:
+            if self.rejected.intersection(message["to"]):
+                raise ValueError(f"invalid recipient {message['to']}")
+        self.sent.extend(messages)
+
+def create_transport():
+    if settings.email_transport == "fake":
+        return FakeTransport()
+    return ResendTransport()
+
+def queue_email(session, to: str, subject: str, html: str):
+    """Add an email to the outbox. It goes out once the caller's transaction commits."""
+    now = datetime.now()
+    session.add(OutboxEmail(to=to, subject=subject, html=html, created_at=now, next_attempt_at=now))
+
+def queue_confirmation_email(session, email: str, reg_token_ciphertext: str):
+    """Queue the signup confirmation email with a link containing the registration token."""
+    queue_email(session, email, "Confirm your email", confirmation_template().format(reg_token_ciphertext))
+
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff with jitter, so a provider outage does not end in a thundering herd."""
+    delay = min(settings.email_backoff_base_seconds * 2 ** (attempts - 1), settings.email_backoff_max_seconds)
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+async def send_due_emails(session, transport, now: datetime = None) -> int:
+    """Send one batch of due outbox rows. Returns how many rows it picked up."""
+    now = now or datetime.now()
+    # SKIP LOCKED lets several workers take disjoint batches on Postgres; SQLite ignores it
+    rows = (await session.exec(select(OutboxEmail).where(
+        OutboxEmail.next_attempt_at <= now
+    ).order_by(OutboxEmail.next_attempt_at).limit(settings.email_batch_size).with_for_update(skip_locked=True))).all()
+    if not rows:
+        return 0
+    for row in rows:
+        row.next_attempt_at = now + LEASE
+        session.add(row)
+    # Commit the lease before sending, so no lock or connection is held during the HTTP call
+    await session.commit()
+
+    messages = [{"from": settings.email_from, "to": [row.to], "subject": row.subject, "html": row.html} for row in rows]
+    # row id -> the exception its send raised
+    failures = {}
     try:
-        with open("email_template.html", "r") as email_template:
-            formatted_email_str = email_template.read().format(reg_token_ciphertext)
-    except FileNotFoundError:
-        raise HTTPException(status_code=500, detail="Email template not found")
-
-    params: resend.Emails.SendParams = {
-        "from": "noreply@resend.reesenorr.is",
-        "to": [email],
-        "subject": "Confirm your email",
-        "html": formatted_email_str,
-    }
-    resend.api_key = os.environ["RESEND_API_KEY"]
-    resend.Emails.send(params)
-
-    return
\ No newline at end of file
+        await run_in_threadpool(transport.send, messages)
+    except Exception as exc:
+        if len(rows) == 1:
+            failures[rows[0].id] = exc
+        else:
+            # One bad message (an invalid recipient, say) fails the whole batch
+            # call, so send them one by one to charge the failure to that row only
+            logger.warning("Sending %d outbox emails as a batch failed (%r), sending them one at a time", len(rows), exc)
+            for row, message in zip(rows, messages):
+                try:
+                    await run_in_threadpool(transport.send, [message])
+                except Exception as error:
+                    failures[row.id] = error
+
+    for row in rows:
+        exc = failures.get(row.id)
+        if exc is None:
+            continue
+        logger.warning("Sending outbox email %d to %s failed: %r", row.id, row.to, exc)
+        row.attempts += 1
+        row.last_error = repr(exc)[:1000]
+        if row.attempts >= settings.email_max_attempts:
+            # Leave it in the table for someone to look at
+            row.next_attempt_at = None
+            logger.error("Giving up on outbox email %d to %s after %d attempts", row.id, row.to, row.attempts)
+        else:
+            row.next_attempt_at = now + retry_delay(row.attempts)
+        session.add(row)
+    sent = [row.id for row in rows if row.id not in failures]
+    if sent:
+        await session.exec(delete(OutboxEmail).where(OutboxEmail.id.in_(sent)))
+    await session.commit()
+    return len(rows)
+
+class OutboxWorker(BackgroundWorker):
+    """Background task draining the outbox in batches.
+
+    It runs when woken after a request queues an email, and every
+    email_poll_seconds otherwise, which picks up retries and rows queued by
+    other workers.
+    """
+
+    name = "Outbox worker"
+
+    def __init__(self, transport):
+        super().__init__()
+        self.transport = transport
+
+    @property
+    def poll_seconds(self) -> float:
+        return settings.email_poll_seconds
+
+    async def run_chunk(self, session) -> bool:
+        # A full batch means there may be more due right now
+        return await send_due_emails(session, self.transport) == settings.email_batch_size
+
+outbox_worker = OutboxWorker(create_transport())
@@ -0,0 +1,50 @@
+import hashlib
+import uuid
+
+from fastapi import Request, Response
+from sqlalchemy import update
+
+from ..models.list import List
+from .revision import next_revision
+
+# Clients revalidate on every read; the ETag makes an unchanged answer a 304
+CACHE_CONTROL = "private, no-cache"
+
+async def touch_list(session, list_uuid: uuid.UUID, list_changed: bool = False) -> int:
+    """Bump a list's version in the caller's transaction. Every write to a list or its tasks calls this.
+
+    Returns the write's sync revision, which the caller stamps on the rows it
+    changes. Writes to the list row or its sharing pass list_changed, which
+    stamps the list too; task writes leave it alone, so a sync after one
+    sends only the tasks.
+    """
+    revision = await next_revision(session)
+    values = {"version": List.version + 1}
+    if list_changed:
+        values["revision"] = revision
+    await session.exec(
+        update(List).where(List.uuid == list_uuid).values(values)
+        .execution_options(synchronize_session=False)
+    )
+    return revision
+
+def weak_etag(*parts) -> str:
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+def not_modified(request: Request, etag: str) -> bool:
+    """Whether If-None-Match already names this ETag, using the weak comparison."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag.removeprefix("W/") in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+def conditional(request: Request, response: Response, etag: str) -> Response | None:
+    """Return a 304 if the client already has this version, otherwise tag the response and return None."""
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
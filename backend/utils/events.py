@@ -0,0 +1,186 @@
+import asyncio
+import contextlib
+import json
+import logging
+import uuid
+
+from sqlalchemy.engine import make_url
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Sent instead of an event a subscriber could not receive, telling it to refetch
+RESYNC = json.dumps({"type": "resync"})
+
+class MemoryBroadcaster:
+    """Fan messages out to subscribers in this process, one bounded queue per subscriber.
+
+    Enough for a single worker. A subscriber that falls behind has its queue
+    replaced by a single resync message rather than holding up publishers.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._subscribers: dict[str, set[asyncio.Queue]] = {}
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    @contextlib.contextmanager
+    def subscribe(self, channel: str):
+        queue = asyncio.Queue(self.queue_size)
+        self._subscribers.setdefault(channel, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            subscribers = self._subscribers.get(channel)
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[channel]
+
+    def subscriber_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def _deliver(self, channel: str, message: str):
+        for queue in self._subscribers.get(channel, ()):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
+
+    async def publish(self, channel: str, message: str):
+        self._deliver(channel, message)
+
+class PostgresBroadcaster(MemoryBroadcaster):
+    """Relay messages between workers through Postgres LISTEN/NOTIFY.
+
+    Every worker LISTENs on one connection and delivers notifications to its
+    own subscribers, including the ones for messages it published itself.
+    When that connection drops, whether Postgres says so or a periodic check
+    finds it dead, it is reopened, and every subscriber is sent a resync for
+    the events published in the meantime.
+    """
+
+    PG_CHANNEL = "todo_events"
+    # NOTIFY payloads are limited to 8000 bytes
+    MAX_PAYLOAD = 7900
+    # Backoff between attempts to reopen the LISTEN connection
+    RECONNECT_MIN_SECONDS = 0.5
+    RECONNECT_MAX_SECONDS = 10.0
+
+    def __init__(self, database_url: str, queue_size: int, health_check_seconds: float = 15.0):
+        super().__init__(queue_size)
+        self._dsn = make_url(database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self._health_check_seconds = health_check_seconds
+        self._listener = None
+        self._publishers = None
+        self._stopping = False
+        self._health_task = None
+        self._reconnect_task = None
+
+    async def start(self):
+        import asyncpg
+
+        self._stopping = False
+        self._listener = await self._listen()
+        self._publishers = await asyncpg.create_pool(self._dsn, min_size=1, max_size=2)
+        self._health_task = asyncio.create_task(self._check_health())
+
+    async def stop(self):
+        self._stopping = True
+        for task in (self._health_task, self._reconnect_task):
+            if task is not None:
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+        self._health_task = self._reconnect_task = None
+        if self._listener is not None:
+            await self._listener.close()
+            self._listener = None
+        if self._publishers is not None:
+            await self._publishers.close()
+
+    async def _listen(self):
+        import asyncpg
+
+        connection = await asyncpg.connect(self._dsn)
+        await connection.add_listener(self.PG_CHANNEL, self._on_notify)
+        connection.add_termination_listener(self._on_terminated)
+        return connection
+
+    def _on_terminated(self, connection):
+        if connection is self._listener:
+            self._connection_lost()
+
+    def _connection_lost(self):
+        if self._stopping or self._reconnect_task is not None:
+            return
+        logger.warning("Event LISTEN connection lost, reconnecting")
+        listener, self._listener = self._listener, None
+        if listener is not None and not listener.is_closed():
+            listener.terminate()
+        self._reconnect_task = asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self):
+        delay = self.RECONNECT_MIN_SECONDS
+        while not self._stopping:
+            try:
+                self._listener = await self._listen()
+                break
+            except Exception as exc:
+                logger.warning("Reopening the event LISTEN connection failed, retrying in %.1fs: %r", delay, exc)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.RECONNECT_MAX_SECONDS)
+        self._reconnect_task = None
+        if self._listener is None:
+            return
+        logger.info("Event LISTEN connection reopened")
+        # Whatever was published while nobody listened is gone; have every stream refetch
+        for channel in list(self._subscribers):
+            self._deliver(channel, RESYNC)
+
+    async def _check_health(self):
+        # A connection that died without a FIN (a failover, a dropped NAT entry)
+        # never reports termination, so ask it something now and then
+        while True:
+            await asyncio.sleep(self._health_check_seconds)
+            listener = self._listener
+            if listener is None:
+                continue
+            try:
+                await asyncio.wait_for(listener.fetchval("SELECT 1"), self._health_check_seconds)
+            except Exception:
+                if listener is self._listener:
+                    self._connection_lost()
+
+    def _on_notify(self, connection, pid, pg_channel, payload):
+        channel, _, message = payload.partition("\n")
+        self._deliver(channel, message)
+
+    async def publish(self, channel: str, message: str):
+        payload = f"{channel}\n{message}"
+        if len(payload.encode()) > self.MAX_PAYLOAD:
+            payload = f"{channel}\n{RESYNC}"
+        try:
+            await self._publishers.execute("SELECT pg_notify($1, $2)", self.PG_CHANNEL, payload)
+        except Exception:
+            # The write already committed, so only the live update is lost
+            logger.exception("Failed to publish event on %s", channel)
+
+def create_broadcaster():
+    if settings.event_broadcaster == "postgres":
+        from ..database import database_url
+        return PostgresBroadcaster(database_url(), settings.event_queue_size, settings.event_health_check_seconds)
+    return MemoryBroadcaster(settings.event_queue_size)
+
+broadcaster = create_broadcaster()
+
+async def publish_list_event(list_uuid: uuid.UUID, event_type: str, **data):
+    """Tell everyone watching a list what changed. Call after the change commits."""
+    await broadcaster.publish(str(list_uuid), json.dumps({"type": event_type, "list_uuid": str(list_uuid), **data}))
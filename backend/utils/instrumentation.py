@@ -0,0 +1,210 @@
+import asyncio
+import bisect
+import contextvars
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+
+from ..config import settings
+from .profiling import sampler
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+ROW_BUCKETS = (0, 1, 10, 100, 1_000, 10_000, 100_000)
+
+class RequestStats:
+    """Database work done on behalf of one request."""
+    __slots__ = ("db_seconds", "statements", "rows")
+
+    def __init__(self):
+        self.db_seconds = 0.0
+        self.statements = 0
+        self.rows = 0
+
+    def server_timing(self, app_seconds: float) -> str:
+        return (f'db;dur={self.db_seconds * 1000:.1f};desc="{self.statements} statements, {self.rows} rows", '
+                f'app;dur={app_seconds * 1000:.1f}')
+
+# Set by the middleware for the duration of a request. Starlette's threadpool
+# and SQLAlchemy's async greenlets both run in a copy of the caller's context,
+# so the engine events below see it in either DB_MODE.
+current_request: contextvars.ContextVar[RequestStats | None] = contextvars.ContextVar("current_request", default=None)
+
+class _CountingCursor:
+    """DBAPI cursor wrapper counting the rows fetched through it."""
+    __slots__ = ("_cursor", "_stats")
+
+    def __init__(self, cursor, stats: RequestStats):
+        object.__setattr__(self, "_cursor", cursor)
+        object.__setattr__(self, "_stats", stats)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._stats.rows += 1
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._stats.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._stats.rows += len(rows)
+        return rows
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cursor, name, value)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_request.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_request.get()
+    if stats is None:
+        return
+    stats.db_seconds += time.perf_counter() - conn.info["query_start"].pop()
+    stats.statements += 1
+    # The result is built from context.cursor right after this event, so
+    # swapping in the wrapper counts whatever the caller goes on to fetch
+    if cursor.description is not None and context is not None and context.cursor is cursor:
+        context.cursor = _CountingCursor(cursor, stats)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Histogram:
+    """A Prometheus-style histogram per label set: cumulative bucket counts, sum and count."""
+
+    def __init__(self, name: str, help: str, buckets: tuple):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, labels: tuple, value: float):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self, label_names: tuple) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self._series.items()):
+            base = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(label_names, labels))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {total}")
+            lines.append(f"{self.name}_count{{{base}}} {cumulative}")
+        return lines
+
+class RequestMetrics:
+    """Per-route request histograms, rendered in the Prometheus text format."""
+
+    LABELS = ("method", "route")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.duration = Histogram("http_request_duration_seconds", "Wall time per request.", DURATION_BUCKETS)
+        self.db_duration = Histogram("http_request_db_seconds", "Time spent in SQL statements per request.", DURATION_BUCKETS)
+        self.statements = Histogram("http_request_db_statements", "SQL statements executed per request.", STATEMENT_BUCKETS)
+        self.rows = Histogram("http_request_db_rows", "Rows fetched from the database per request.", ROW_BUCKETS)
+        # (method, route, status) -> count
+        self.responses: dict[tuple, int] = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        labels = (method, route)
+        with self._lock:
+            self.duration.observe(labels, seconds)
+            self.db_duration.observe(labels, stats.db_seconds)
+            self.statements.observe(labels, stats.statements)
+            self.rows.observe(labels, stats.rows)
+            self._count(method, route, status)
+
+    def observe_stream(self, method: str, route: str, status: int):
+        """Count a long-lived stream's response without timing it."""
+        with self._lock:
+            self._count(method, route, status)
+
+    def _count(self, method: str, route: str, status: int):
+        key = (method, route, str(status))
+        self.responses[key] = self.responses.get(key, 0) + 1
+
+    def render(self) -> str:
+        with self._lock:
+            lines = ["# HELP http_responses_total Responses sent, by status code.", "# TYPE http_responses_total counter"]
+            for (method, route, status), count in sorted(self.responses.items()):
+                lines.append(f'http_responses_total{{method="{method}",route="{_escape(route)}",status="{status}"}} {count}')
+            for histogram in (self.duration, self.db_duration, self.statements, self.rows):
+                lines.extend(histogram.render(self.LABELS))
+        return "\n".join(lines) + "\n"
+
+request_metrics = RequestMetrics()
+
+class InstrumentationMiddleware:
+    """Time every HTTP request and the SQL it runs.
+
+    Results go into `request_metrics`, labelled with the route template
+    (so /api/list/{list_uuid} is one series, not one per list), and into a
+    Server-Timing header the browser devtools show. With the sampling
+    profiler on, requests slower than the threshold also leave a flame graph.
+
+    Event streams are only counted: they stay open for as long as the client
+    watches, so their duration says nothing about the server and would fill
+    the top bucket and the profiler's output.
+    """
+
+    def __init__(self, app, metrics: RequestMetrics = request_metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        start = time.perf_counter()
+        status = 500
+        stream = False
+
+        async def send_with_timing(message):
+            nonlocal status, stream
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                stream = headers.get("content-type", "").startswith("text/event-stream")
+                if settings.server_timing_header and not stream:
+                    headers.append("Server-Timing", stats.server_timing(time.perf_counter() - start))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_request.reset(token)
+            elapsed = time.perf_counter() - start
+            # Set by the router on a match; anything else shares one series
+            route = scope.get("route")
+            route_path = route.path if route is not None else "unmatched"
+            if stream:
+                self.metrics.observe_stream(scope["method"], route_path, status)
+            else:
+                self.metrics.observe(scope["method"], route_path, status, elapsed, stats)
+            if not stream and sampler.running and elapsed * 1000 >= settings.profiler_threshold_ms:
+                await run_in_threadpool(sampler.dump, f"{scope['method']} {route_path}", asyncio.current_task(), start, elapsed)
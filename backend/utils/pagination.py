@@ -0,0 +1,53 @@
+import base64
+from datetime import datetime
+from typing import Callable, Sequence
+from uuid import UUID
+
+from fastapi import Response
+
+
+def encode_cursor(due_date: datetime, task_uuid: UUID) -> str:
+    """Encode a (due_date, uuid) keyset position as an opaque URL-safe string."""
+    raw = f"{due_date.isoformat()}|{task_uuid}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    """Decode a cursor produced by encode_cursor. Raises ValueError if it is malformed."""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        due_date, task_uuid = raw.split("|", 1)
+        return datetime.fromisoformat(due_date), UUID(task_uuid)
+    except (UnicodeError, ValueError) as e:
+        raise ValueError("invalid cursor") from e
+
+
+def encode_rank_cursor(rank: float, task_uuid: UUID) -> str:
+    """Encode a (rank, uuid) keyset position in ranked search results. repr keeps the float exact."""
+    raw = f"{rank!r}|{task_uuid}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_rank_cursor(cursor: str) -> tuple[float, UUID]:
+    """Decode a cursor produced by encode_rank_cursor. Raises ValueError if it is malformed."""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        rank, task_uuid = raw.split("|", 1)
+        return float(rank), UUID(task_uuid)
+    except (UnicodeError, ValueError) as e:
+        raise ValueError("invalid cursor") from e
+
+
+def take_page(rows: Sequence, limit: int, response: Response, next_cursor: Callable[[object], str]) -> Sequence:
+    """The first `limit` of `rows`, which the caller fetched with limit + 1.
+
+    The extra row only says whether another page exists; if it does, the
+    cursor for it, next_cursor(last row of this page), goes in the
+    X-Next-Cursor header.
+    """
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = next_cursor(rows[-1])
+    return rows
@@ -0,0 +1,65 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+from fastapi import HTTPException
+
+from ..config import settings
+
+# bcrypt holds the GIL for most of its run, so hashing on the threadpool still
+# starves the event loop. Hashes run in a small process pool instead, and
+# requests beyond what the pool can work through promptly are turned away.
+_executor: ProcessPoolExecutor | None = None
+_pending = 0
+
+def _lower_priority():
+    # Let the web process win the CPU when both are busy
+    os.nice(settings.password_worker_nice)
+
+def _hash(plaintext: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(plaintext, bcrypt.gensalt(rounds))
+
+def _check(plaintext: bytes, hashed: bytes) -> bool:
+    return bcrypt.checkpw(plaintext, hashed)
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn, not fork: the parent has threads and open database connections
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.password_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_lower_priority,
+        )
+    return _executor
+
+async def _submit(fn, *args):
+    global _pending
+    if _pending >= settings.password_max_pending:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many login attempts in progress, try again shortly",
+            headers={"Retry-After": str(settings.password_retry_after_seconds)},
+        )
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), fn, *args)
+    finally:
+        _pending -= 1
+
+async def hash_password(plaintext: str) -> str:
+    """Hash a password with the configured bcrypt cost factor."""
+    return (await _submit(_hash, plaintext.encode(), settings.bcrypt_rounds)).decode("utf-8")
+
+async def verify_password(plaintext: str, hashed: str) -> bool:
+    """Check a password against a stored bcrypt hash."""
+    return await _submit(_check, plaintext.encode(), hashed.encode())
+
+def shutdown_password_pool():
+    """Stop the worker processes. The pool is recreated on next use."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
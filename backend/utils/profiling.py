@@ -0,0 +1,108 @@
+import asyncio
+import collections
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Innermost frames of a thread with nothing to do: the event loop waiting in
+# select, or a threadpool worker waiting for its next job
+IDLE_FILES = ("selectors.py", "threading.py", "queue.py")
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def fold(frame) -> str:
+    """A stack as one line of `outer;...;inner` frames, the input format of flamegraph.pl and speedscope."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+class StackSampler:
+    """Opt-in sampling profiler for finding out why a request was slow.
+
+    A daemon thread snapshots every thread's stack every
+    `profiler_interval_ms` and keeps the last `window_seconds` of samples.
+    When a slow request finishes, the middleware asks for the samples taken
+    while it ran: event-loop samples are kept only if that request's task was
+    the one running, threadpool samples are kept whole (they may belong to
+    a concurrent request, so read them with that in mind).
+    """
+
+    def __init__(self, window_seconds: float = 60.0):
+        self.window_seconds = window_seconds
+        self.running = False
+        # (perf_counter, id of the running asyncio task or None, folded stack)
+        self._samples = collections.deque()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self, interval_seconds: float, output_dir: str):
+        self.interval = interval_seconds
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        self.running = True
+
+    def stop(self):
+        if self._thread:
+            self.running = False
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            with self._lock:
+                self._samples.clear()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            task = asyncio.current_task(self._loop)
+            samples = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or os.path.basename(frame.f_code.co_filename) in IDLE_FILES:
+                    continue
+                if thread_id == self._loop_thread:
+                    samples.append((now, id(task) if task else None, fold(frame)))
+                else:
+                    samples.append((now, None, "[threadpool];" + fold(frame)))
+            with self._lock:
+                self._samples.extend(samples)
+                while self._samples and self._samples[0][0] < now - self.window_seconds:
+                    self._samples.popleft()
+
+    def collect(self, task, start: float, end: float) -> collections.Counter:
+        """Folded stacks sampled between start and end (perf_counter) that belong to a request's task."""
+        with self._lock:
+            samples = [s for s in self._samples if start <= s[0] <= end]
+        counts = collections.Counter()
+        task_id = id(task) if task else None
+        for _, sample_task, stack in samples:
+            if sample_task is None or sample_task == task_id:
+                counts[stack] += 1
+        return counts
+
+    def dump(self, label: str, task, start: float, elapsed: float) -> Path | None:
+        """Write the samples for a finished request to `<output_dir>/<time>-<label>-<ms>ms.folded`."""
+        counts = self.collect(task, start, start + elapsed)
+        if not counts:
+            return None
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", label).strip("-")
+        path = self.output_dir / f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}-{elapsed * 1000:.0f}ms.folded"
+        path.write_text("".join(f"{stack} {count}\n" for stack, count in counts.most_common()))
+        logger.warning("Slow request %s took %.0f ms; profile written to %s", label, elapsed * 1000, path)
+        return path
+
+sampler = StackSampler()
@@ -0,0 +1,67 @@
+import logging
+
+from sqlalchemy import delete, exists
+from sqlmodel import select
+
+from ..config import settings
+from ..models.list import List
+from ..models.list_access import ListAccess
+from ..models.list_summary import ListSummary
+from ..models.task import Task
+from .worker import BackgroundWorker
+
+logger = logging.getLogger(__name__)
+
+# Rows that hang off a list, with the key each is deleted by, in purge order
+LIST_ROWS = ((Task, Task.uuid), (ListAccess, ListAccess.uuid), (ListSummary, ListSummary.list_uuid))
+
+def delete_chunk(model, key, condition, chunk_size: int):
+    """DELETE at most chunk_size rows of a table matching condition, so no single statement runs long."""
+    return delete(model).where(key.in_(select(key).where(condition).limit(chunk_size))).execution_options(synchronize_session=False)
+
+def orphaned_list_uuids(model):
+    """Lists that rows of model still point at but that no longer exist, left by the old hard delete."""
+    return select(model.list_uuid).where(~exists().where(List.uuid == model.list_uuid)).distinct()
+
+async def purge_chunk(session, chunk_size: int) -> bool:
+    """Delete one chunk of the oldest deleted list and commit. Returns False when no deleted list is left.
+
+    Tasks and access rows go a chunk per call; once the list has none left
+    its summary and the list row itself go. Each call is its own short
+    transaction, so purging a huge list never holds locks for long.
+    """
+    list_uuid = (await session.exec(select(List.uuid).where(List.deleted_at != None).order_by(List.deleted_at).limit(1))).first()
+    if list_uuid is None:
+        return False
+    for model, key in LIST_ROWS[:2]:
+        if (await session.exec(delete_chunk(model, key, model.list_uuid == list_uuid, chunk_size))).rowcount:
+            await session.commit()
+            return True
+    await session.exec(delete(ListSummary).where(ListSummary.list_uuid == list_uuid))
+    await session.exec(delete(List).where(List.uuid == list_uuid))
+    await session.commit()
+    logger.info("Purged deleted list %s", list_uuid)
+    return True
+
+class PurgeWorker(BackgroundWorker):
+    """Background task removing what deleted lists leave behind, a chunk at a time.
+
+    It runs when woken after a list is deleted, and every purge_poll_seconds
+    otherwise, which picks up lists deleted on other workers. Between chunks
+    it pauses briefly so request traffic gets the database in between.
+    """
+
+    name = "List purge"
+
+    @property
+    def poll_seconds(self) -> float:
+        return settings.purge_poll_seconds
+
+    @property
+    def pause_seconds(self) -> float:
+        return settings.purge_pause_seconds
+
+    async def run_chunk(self, session) -> bool:
+        return await purge_chunk(session, settings.purge_chunk_size)
+
+purge_worker = PurgeWorker()
@@ -0,0 +1,196 @@
+"""Token-bucket rate limiting per client and route, applied before routing.
+
+A budget of "<requests>/<seconds>" lets a client make <requests> requests at
+once, then refills evenly over <seconds>. Each bucket is kept as GCRA state:
+the single timestamp at which it will be full again, so a decision is one
+lookup, one comparison and one store.
+"""
+import math
+import time
+
+from sqlalchemy import case, delete
+from sqlalchemy.dialects import postgresql, sqlite
+from starlette.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
+
+from ..config import settings
+from ..database import get_async_engine, get_engine
+from ..models.rate_limit import RateLimitBucket
+from ..routes.middleware import verify_token
+
+# Slack for the rounding in the sums of intervals, so the last request of a
+# full burst is not turned away by a few ulps
+EPSILON = 1e-9
+
+class Budget:
+    __slots__ = ("requests", "seconds", "interval", "window")
+
+    def __init__(self, requests: int, seconds: float):
+        self.requests = requests
+        self.seconds = seconds
+        # Each request pushes the full-again time out by one interval; once it
+        # is more than `window` ahead, the bucket is empty
+        self.interval = seconds / requests
+        self.window = seconds - self.interval
+
+    @classmethod
+    def parse(cls, spec: str) -> "Budget":
+        requests, seconds = spec.split("/")
+        return cls(int(requests), float(seconds))
+
+class Rule:
+    """Requests whose method (None for any) and path prefix match draw on `budget`."""
+    __slots__ = ("method", "prefix", "budget", "name")
+
+    def __init__(self, method: str | None, prefix: str, budget: Budget):
+        self.method = method
+        self.prefix = prefix
+        self.budget = budget
+        self.name = f"{method or '*'} {prefix}"
+
+class MemoryRateLimitStore:
+    """Buckets in a dict, private to this worker.
+
+    Only the event loop touches it, so it needs no lock. Buckets that have
+    refilled are dropped every `sweep_seconds`, which bounds the dict by the
+    clients seen recently.
+    """
+
+    def __init__(self, clock=time.monotonic, sweep_seconds: float = 60.0):
+        self._clock = clock
+        self._sweep_seconds = sweep_seconds
+        self._next_sweep = clock() + sweep_seconds
+        self._tats: dict[str, float] = {}
+
+    async def take(self, key: str, budget: Budget) -> float:
+        """Count a request against the bucket: 0 if it may go ahead, else the seconds until it could."""
+        now = self._clock()
+        if now >= self._next_sweep:
+            self._sweep(now)
+        tat = self._tats.get(key, now)
+        if tat < now:
+            tat = now
+        wait = tat - now - budget.window
+        if wait > EPSILON:
+            return wait
+        self._tats[key] = tat + budget.interval
+        return 0.0
+
+    def _sweep(self, now: float):
+        # A full bucket is the same as none at all
+        self._tats = {key: tat for key, tat in self._tats.items() if tat > now}
+        self._next_sweep = now + self._sweep_seconds
+
+    def __len__(self):
+        return len(self._tats)
+
+class DatabaseRateLimitStore:
+    """Buckets in the rate_limit_bucket table, shared by every worker on the database.
+
+    Each decision is one upsert, so it costs a round trip rather than a dict
+    lookup, and the clock is the workers' wall clock rather than a monotonic one.
+    """
+
+    def __init__(self, clock=time.time, sweep_seconds: float = 60.0):
+        self._clock = clock
+        self._sweep_seconds = sweep_seconds
+        self._next_sweep = clock() + sweep_seconds
+
+    async def take(self, key: str, budget: Budget) -> float:
+        if settings.db_mode == "async":
+            async with get_async_engine().begin() as conn:
+                return await conn.run_sync(self._take, key, budget)
+        return await run_in_threadpool(self._take_sync, key, budget)
+
+    def _take_sync(self, key: str, budget: Budget) -> float:
+        with get_engine().begin() as conn:
+            return self._take(conn, key, budget)
+
+    def _take(self, conn, key: str, budget: Budget) -> float:
+        now = self._clock()
+        table = RateLimitBucket.__table__
+        if now >= self._next_sweep:
+            self._next_sweep = now + self._sweep_seconds
+            conn.execute(delete(table).where(table.c.tat <= now))
+        insert = postgresql.insert if conn.dialect.name == "postgresql" else sqlite.insert
+        # The same decision as MemoryRateLimitStore.take, made in the upsert so
+        # that concurrent workers see each other's requests
+        tat = case((table.c.tat > now, table.c.tat), else_=now)
+        allowed = tat - now <= budget.window + EPSILON
+        statement = insert(table).values(key=key, tat=now + budget.interval, allowed=True)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.key],
+            set_={"allowed": allowed, "tat": case((allowed, tat + budget.interval), else_=table.c.tat)},
+        ).returning(table.c.tat, table.c.allowed)
+        new_tat, was_allowed = conn.execute(statement).one()
+        return 0.0 if was_allowed else new_tat - now - budget.window
+
+def client_identity(scope) -> str:
+    """The user in a valid bearer token, else the client address (already the X-Forwarded-For one behind a trusted proxy)."""
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                claims = verify_token(token)
+                if claims is not None:
+                    return claims.uuid.hex
+            break
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+class RateLimiter:
+    """Picks the first rule matching a request and charges the client's bucket for it in `store`."""
+
+    def __init__(self, rules: list[Rule], store):
+        self.rules = rules
+        self.store = store
+
+    async def check(self, scope) -> float:
+        """Seconds the client has to wait before this request would be allowed; 0 lets it through now."""
+        method, path = scope["method"], scope["path"]
+        for rule in self.rules:
+            if path.startswith(rule.prefix) and (rule.method is None or rule.method == method):
+                return await self.store.take(f"{rule.name}:{client_identity(scope)}", rule.budget)
+        return 0.0
+
+def default_rules() -> list[Rule]:
+    auth = Budget.parse(settings.rate_limit_auth)
+    return [
+        # bcrypt-bound, or sending an email
+        Rule("POST", "/api/user/login", auth),
+        Rule("POST", "/api/user/create", auth),
+        Rule("POST", "/api/user/refresh", auth),
+        Rule(None, "/api/", Budget.parse(settings.rate_limit_api)),
+    ]
+
+def create_rate_limit_store():
+    if settings.rate_limit_store == "database":
+        return DatabaseRateLimitStore()
+    return MemoryRateLimitStore()
+
+rate_limiter = RateLimiter(default_rules(), create_rate_limit_store())
+
+class RateLimitMiddleware:
+    """Answer requests over their client's budget with a 429 and a Retry-After header.
+
+    Runs before routing, so a rejected request never reaches a handler, a
+    dependency or the database. Paths outside /api (metrics, the root) are
+    not limited.
+    """
+
+    def __init__(self, app, limiter: RateLimiter = rate_limiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and settings.rate_limit_enabled:
+            wait = await self.limiter.check(scope)
+            if wait:
+                response = ORJSONResponse(
+                    {"detail": "Too many requests, try again later"},
+                    status_code=429,
+                    headers={"Retry-After": str(math.ceil(wait))},
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
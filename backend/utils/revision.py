@@ -0,0 +1,50 @@
+import uuid
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import case, delete, func, insert, update
+from sqlmodel import Session, select
+
+from ..models.revision import Revision
+from ..models.tombstone import Tombstone
+
+async def next_revision(session) -> int:
+    """Take the next revision in the caller's transaction. Holds the counter row until commit.
+
+    Every writer takes this lock first, before any write (or autoflushed
+    delete) locks a task, list, access or summary row. The counter is one row
+    all writes share, so taking it after another row lets two writers each
+    hold what the other waits for, which Postgres resolves by aborting one.
+    Call this, or touch_list, before session.delete and the other writes.
+    """
+    result = await session.exec(
+        update(Revision.__table__).where(Revision.__table__.c.id == 1)
+        .values(value=Revision.__table__.c.value + 1)
+        .returning(Revision.__table__.c.value)
+    )
+    return result.scalar_one()
+
+async def add_tombstones(session, revision: int, kind: str, list_uuid: uuid.UUID, entity_uuids: Iterable[uuid.UUID] = (), user_uuids: Iterable[Optional[uuid.UUID]] = (None,)):
+    """Record deleted tasks, or a list removed from some users, at the given revision."""
+    now = datetime.now()
+    rows = [
+        {"revision": revision, "kind": kind, "entity_uuid": entity_uuid, "list_uuid": list_uuid, "user_uuid": user_uuid, "deleted_at": now}
+        for entity_uuid in entity_uuids for user_uuid in user_uuids
+    ]
+    if rows:
+        await session.exec(insert(Tombstone.__table__), params=rows)
+
+def prune_tombstones(session: Session, older_than: datetime) -> int:
+    """Delete tombstones recorded before a cutoff. Returns how many were deleted.
+
+    Clients that last synced before the newest pruned revision get a full sync.
+    """
+    revision = session.exec(select(func.max(Tombstone.revision)).where(Tombstone.deleted_at < older_than)).one()
+    if revision is None:
+        return 0
+    deleted = session.exec(delete(Tombstone).where(Tombstone.revision <= revision)).rowcount
+    session.exec(
+        update(Revision.__table__).where(Revision.__table__.c.id == 1)
+        .values(pruned_through=case((Revision.__table__.c.pruned_through < revision, revision), else_=Revision.__table__.c.pruned_through))
+    )
+    return deleted
@@ -0,0 +1,56 @@
+import re
+from uuid import UUID
+
+from sqlalchemy import and_, func, literal_column, or_, table, column
+from sqlalchemy.orm import aliased
+from sqlmodel import select
+
+from ..models.list_access import ListAccess
+from ..models.task import Task
+
+# Column and table the SEARCH_DDL in models/task.py creates outside the model
+search_vector = literal_column("task.search_vector")
+task_fts = table("task_fts", column("rowid"))
+
+def search_terms(q: str) -> list[str]:
+    """The words in user input. A query without any matches nothing."""
+    return re.findall(r"\w+", q)
+
+def fts5_query(q: str) -> str:
+    """Quote each word of user input, so FTS5 reads it as terms that must all match, never as query syntax."""
+    return " ".join(f'"{word}"' for word in search_terms(q))
+
+def search_tasks_statement(dialect: str, user_uuid: UUID, q: str, after: tuple[float, UUID] | None = None):
+    """Tasks in the user's lists matching `q`, best first, as (Task, rank) rows.
+
+    Ranks are higher-is-better on both backends, so (rank, uuid) from the
+    last row of a page is the keyset for the next one.
+    """
+    if dialect == "postgresql":
+        # Same AND-of-words reading of user input as fts5_query, with quotes and -negation on top.
+        # The planner picks between the GIN index and checking the stored vector of each of the
+        # user's tasks, whichever is cheaper for the terms.
+        query = func.websearch_to_tsquery(literal_column("'english'::regconfig"), q)
+        rank = func.ts_rank(search_vector, query)
+        matches = select(Task, rank.label("rank")).join(
+            ListAccess, ListAccess.list_uuid == Task.list_uuid
+        ).where(ListAccess.owner_uuid == user_uuid, search_vector.op("@@")(query))
+    else:
+        # Start from the user's tasks and look each one up in the index, so the cost follows
+        # the size of the user's lists rather than how many tasks anywhere contain the terms.
+        # bm25 is lower-is-better; title hits count double, like the title weight on Postgres.
+        accessible = select(literal_column("task.rowid")).select_from(Task).join(
+            ListAccess, ListAccess.list_uuid == Task.list_uuid
+        ).where(ListAccess.owner_uuid == user_uuid)
+        rank = -func.bm25(literal_column("task_fts"), 2.0, 1.0)
+        matches = select(Task, rank.label("rank")).select_from(task_fts).join(
+            Task, literal_column("task.rowid") == task_fts.c.rowid
+        ).where(literal_column("task_fts").op("MATCH")(fts5_query(q)), task_fts.c.rowid.in_(accessible))
+
+    ranked = matches.subquery()
+    task = aliased(Task, ranked)
+    statement = select(task, ranked.c.rank)
+    if after is not None:
+        after_rank, after_uuid = after
+        statement = statement.where(or_(ranked.c.rank < after_rank, and_(ranked.c.rank == after_rank, ranked.c.uuid > after_uuid)))
+    return statement.order_by(ranked.c.rank.desc(), ranked.c.uuid)
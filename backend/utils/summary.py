@@ -0,0 +1,74 @@
+import uuid
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import case, delete, func, insert, update
+from sqlmodel import Session, select
+
+from ..models.list import List
+from ..models.list_summary import ListSummary
+from ..models.task import Task
+
+# A task as the summary sees it
+TaskState = tuple[bool, datetime]  # (done, due_date)
+
+def _earliest_open_due_date(list_uuid: uuid.UUID):
+    # Served by the (list_uuid, due_date, uuid) index: the scan stops at the first open task
+    return select(func.min(Task.due_date)).where(Task.list_uuid == list_uuid, Task.done == False).scalar_subquery()
+
+async def apply_task_changes(session, list_uuid: uuid.UUID, removed: Iterable[TaskState] = (), added: Iterable[TaskState] = ()):
+    """Fold tasks leaving and entering a list into its summary row, in the caller's transaction.
+
+    An update is a removal of the old state plus an addition of the new one.
+    Counts are adjusted in place, so concurrent writers to the same list do not
+    lose each other's changes. The earliest open due date only needs a lookup
+    when an open task goes away.
+    """
+    removed, added = list(removed), list(added)
+    values = {}
+    total_delta = len(added) - len(removed)
+    completed_delta = sum(done for done, _ in added) - sum(done for done, _ in removed)
+    if total_delta:
+        values["total_tasks"] = ListSummary.total_tasks + total_delta
+    if completed_delta:
+        values["tasks_completed"] = ListSummary.tasks_completed + completed_delta
+
+    open_added = [due for done, due in added if not done]
+    if any(not done for done, _ in removed):
+        values["earliest_open_due_date"] = _earliest_open_due_date(list_uuid)
+    elif open_added:
+        earliest = min(open_added)
+        values["earliest_open_due_date"] = case(
+            (ListSummary.earliest_open_due_date == None, earliest),
+            (ListSummary.earliest_open_due_date > earliest, earliest),
+            else_=ListSummary.earliest_open_due_date,
+        )
+
+    if values:
+        await session.exec(
+            update(ListSummary).where(ListSummary.list_uuid == list_uuid).values(values)
+            .execution_options(synchronize_session=False)
+        )
+
+def rebuild_list_summaries(session: Session) -> int:
+    """Recompute every list's summary from its tasks. Returns the number of lists.
+
+    Runs as one delete plus one INSERT ... SELECT, so readers see either the old
+    or the new summaries. Task writes made while it runs may be lost, so run it
+    with writes stopped (e.g. right after deploying the table).
+    """
+    session.exec(delete(ListSummary))
+    session.exec(insert_summaries())
+    return session.exec(select(func.count()).select_from(ListSummary)).one()
+
+def insert_summaries(where=None):
+    """INSERT ... SELECT of summaries computed from the tasks of the lists matching `where`, or of every list."""
+    lists = select(
+        List.uuid,
+        func.count(Task.uuid),
+        func.coalesce(func.sum(case((Task.done == True, 1), else_=0)), 0),
+        func.min(case((Task.done == False, Task.due_date))),
+    ).outerjoin(Task, List.uuid == Task.list_uuid).group_by(List.uuid)
+    if where is not None:
+        lists = lists.where(where)
+    return insert(ListSummary).from_select(["list_uuid", "total_tasks", "tasks_completed", "earliest_open_due_date"], lists)
@@ -1,3 +1,4 @@
+import functools
 import json
 import os
 import jwt
@@ -36,27 +37,34 @@ def generate_jwt_token(user: User, expires_delta: timedelta, token_type: str) ->
     # Add expiry time
     data['exp'] = datetime.now(timezone.utc) + expires_delta
 
-    secret_key = os.getenv("SECRET_KEY")
-    encoded_jwt = jwt.encode(data, secret_key, algorithm="HS256")
+    encoded_jwt = jwt.encode(data, jwt_secret_key(), algorithm="HS256")
 
     return encoded_jwt
 
+@functools.cache
+def jwt_secret_key() -> bytes:
+    """The HS256 signing key, read from SECRET_KEY once per process."""
+    return os.environ["SECRET_KEY"].encode("utf-8")
+
 class TokenClaims:
-    token_type: str
-    uuid: UUID
-    email: str
-    first_name: str
-    last_name: str
+    __slots__ = ("token_type", "uuid", "email", "first_name", "last_name", "exp")
 
-def parse_jwt_token(raw_token: str) -> TokenClaims:
-    secret_key = os.getenv("SECRET_KEY")
-    token = jwt.decode(raw_token, secret_key, algorithms=["HS256"])
+    def __init__(self, token_type: str, uuid: UUID, email: str, first_name: str, last_name: str, exp: int):
+        self.token_type = token_type
+        self.uuid = uuid
+        self.email = email
+        self.first_name = first_name
+        self.last_name = last_name
+        self.exp = exp
 
-    claims = TokenClaims()
-    claims.token_type = token['token_type']
-    claims.uuid = UUID(token['uuid'])
-    claims.email = token['email']
-    claims.first_name = token['first_name']
-    claims.last_name = token['last_name']
+def parse_jwt_token(raw_token: str) -> TokenClaims:
+    token = jwt.decode(raw_token, jwt_secret_key(), algorithms=["HS256"])
 
-    return claims
+    return TokenClaims(
+        token_type=token['token_type'],
+        uuid=UUID(token['uuid']),
+        email=token['email'],
+        first_name=token['first_name'],
+        last_name=token['last_name'],
+        exp=token['exp'],
+    )
@@ -0,0 +1,65 @@
+import asyncio
+import contextlib
+import logging
+
+from ..database import open_session
+
+logger = logging.getLogger(__name__)
+
+class BackgroundWorker:
+    """Background task doing its work a chunk at a time, in passes.
+
+    A pass runs when the worker is woken, and every poll_seconds otherwise,
+    which picks up work queued by other workers. It opens a session and calls
+    run_chunk until that reports nothing left, pausing pause_seconds between
+    chunks. Subclasses provide run_chunk and the two intervals.
+    """
+
+    name = "Background worker"
+
+    def __init__(self):
+        self._wakeup = None
+        self._task = None
+        self._running = False
+
+    @property
+    def poll_seconds(self) -> float:
+        raise NotImplementedError
+
+    @property
+    def pause_seconds(self) -> float:
+        return 0.0
+
+    async def run_chunk(self, session) -> bool:
+        """Do one chunk of work in `session`. True if there may be more to do right away."""
+        raise NotImplementedError
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        self._running = True
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Let a chunk in flight finish and record its outcome rather than
+        # cancelling it; cancellation does not reach a threadpool call anyway
+        if self._task:
+            self._running = False
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+    def wake(self):
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def _run(self):
+        while self._running:
+            self._wakeup.clear()
+            try:
+                async with open_session() as session:
+                    while self._running and await self.run_chunk(session):
+                        await asyncio.sleep(self.pause_seconds)
+            except Exception:
+                logger.exception("%s pass failed", self.name)
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)